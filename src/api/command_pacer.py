@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Dict
+
+# 同一デバイスへ連続してコマンドを送る際の最小間隔（秒）
+DEVICE_COMMAND_INTERVAL = 0.5
+# 同一デバイスへ待ち時間なしで送れるコマンド数
+DEVICE_COMMAND_BURST = 1
+# クラウド全体で許容するコマンド送信レート（回/秒）とバースト数
+CLOUD_COMMAND_RATE = 10.0
+CLOUD_COMMAND_BURST = 10
+
+
+class TokenBucket:
+    """
+    トークンバケット方式で送信間隔を制御するクラス。
+
+    トークンが足りない場合は前借りして、補充されるまでの待ち時間を呼び出し側に返します。
+    予約した順に送信時刻が決まるため、複数スレッドから呼ばれても順序が保たれます。
+
+    Attributes:
+        rate (float): 1秒あたりに補充されるトークン数。
+        capacity (float): バケットに貯められるトークンの上限。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        トークンを1つ予約します。
+
+        Returns:
+            float: 予約したトークンが使えるようになるまでの待ち時間（秒）。すぐに使える場合は0。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class CommandPacer:
+    """
+    デバイスごとのトークンバケットでコマンド送信の間隔を制御するクラス。
+
+    同じデバイスへの連続したコマンドだけが待たされ、異なるデバイス（エアコンとサーキュレーターなど）への
+    コマンドは互いの待ち時間の影響を受けません。クラウド全体のレートはデバイス共通のバケットで制御します。
+
+    Attributes:
+        device_interval (float): 同一デバイスへのコマンドの最小間隔（秒）。
+        device_burst (int): 同一デバイスへ待ち時間なしで送れるコマンド数。
+    """
+
+    def __init__(
+        self,
+        device_interval: float = DEVICE_COMMAND_INTERVAL,
+        device_burst: int = DEVICE_COMMAND_BURST,
+        cloud_rate: float = CLOUD_COMMAND_RATE,
+        cloud_burst: int = CLOUD_COMMAND_BURST,
+    ):
+        self.device_interval = device_interval
+        self.device_burst = device_burst
+        self._cloud_bucket = TokenBucket(cloud_rate, cloud_burst)
+        self._device_buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _get_device_bucket(self, device_id: str) -> TokenBucket:
+        """
+        指定したデバイスのトークンバケットを取得します。存在しない場合は新たに生成します。
+
+        Args:
+            device_id (str): デバイスID
+
+        Returns:
+            TokenBucket: デバイスのトークンバケット
+        """
+        with self._lock:
+            bucket = self._device_buckets.get(device_id)
+            if bucket is None:
+                bucket = TokenBucket(1 / self.device_interval, self.device_burst)
+                self._device_buckets[device_id] = bucket
+            return bucket
+
+    def acquire(self, device_id: str) -> float:
+        """
+        指定したデバイスへコマンドを送信できるようになるまで待機します。
+
+        Args:
+            device_id (str): デバイスID
+
+        Returns:
+            float: 実際に待機した時間（秒）
+        """
+        delay = max(self._get_device_bucket(device_id).reserve(), self._cloud_bucket.reserve())
+        if delay > 0:
+            time.sleep(delay)
+        return delay
@@ -1,17 +1,8 @@
 # -*- coding:utf-8 -*-
-import os
-import requests
 import json
 from datetime import datetime
-from dotenv import load_dotenv
 from typing import Optional
-
-# 環境変数の読み込み
-load_dotenv(".env")
-
-# 環境変数からエリア名とコードを取得
-AREA_NAME = os.environ["JMA_AREA_NAME"]
-AREA_CODE = os.environ["JMA_AREA_CODE"]
+from common.config import Config
 
 class WeatherData:
     @staticmethod
@@ -22,8 +13,15 @@ class WeatherData:
         :param target_date: 取得したい日付（フォーマット: 'YYYY-MM-DD'）
         :return: 最大気温 (度) または None
         """
+        # 気象庁の予報を使う場合のみ必要なため、ここで読み込む
+        import requests
+
+        # 環境変数からエリア名とコードを取得
+        area_name = Config.get("JMA_AREA_NAME")
+        area_code = Config.get("JMA_AREA_CODE")
+
         # 気象庁データの取得
-        jma_url = f"https://www.jma.go.jp/bosai/forecast/data/forecast/{AREA_CODE}.json"
+        jma_url = f"https://www.jma.go.jp/bosai/forecast/data/forecast/{area_code}.json"
         jma_json = requests.get(jma_url).json()
 
         # 指定された日付の指定エリアの最大気温を取得
@@ -38,7 +36,7 @@ class WeatherData:
                 continue
 
             for area_data in areas:
-                if area_data["area"]["name"] == AREA_NAME:  # 環境変数から取得したエリア名に基づく
+                if area_data["area"]["name"] == area_name:  # 環境変数から取得したエリア名に基づく
                     temps = area_data.get("temps", [])
                     
                     if temps:  # tempsデータがある場合
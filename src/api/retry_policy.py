@@ -0,0 +1,122 @@
+import dataclasses
+import random
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+class SensorTimeoutError(RuntimeError):
+    """
+    ティックの時間予算内にセンサーの値を取得できなかったことを表す例外。
+
+    Attributes:
+        sensors (List[str]): 時間切れになったセンサー名のリスト。
+    """
+
+    def __init__(self, sensors: List[str]):
+        self.sensors = sensors
+        super().__init__(f"Sensor acquisition timed out: {', '.join(sensors)}")
+
+
+@dataclasses.dataclass
+class RetryPolicy:
+    """
+    リトライの方針を表すデータクラス。
+
+    Attributes:
+        max_attempts (int): 最大試行回数。
+        base_delay (float): 1回目のリトライまでの待ち時間（秒）。以降は指数的に増加します。
+        max_delay (float): リトライ間の待ち時間の上限（秒）。
+        jitter (float): 待ち時間をランダムに短縮する割合（0〜1）。
+        request_timeout (Tuple[float, float]): 1リクエストあたりの接続・読み込みタイムアウト（秒）。
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 8.0
+    jitter: float = 0.5
+    request_timeout: Tuple[float, float] = (5.0, 10.0)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        指定した試行の後に待つ時間を計算します。
+
+        Args:
+            attempt (int): 0始まりの試行回数
+
+        Returns:
+            float: 次の試行までの待ち時間（秒）
+        """
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return delay * (1 - self.jitter * random.random())
+
+    def timeout_within(self, budget: Optional["TickBudget"]) -> Tuple[float, float]:
+        """
+        時間予算の残りを超えないようにリクエストのタイムアウトを切り詰めます。
+
+        Args:
+            budget (Optional[TickBudget]): ティックの時間予算
+
+        Returns:
+            Tuple[float, float]: 接続・読み込みタイムアウト（秒）
+        """
+        if budget is None:
+            return self.request_timeout
+        remaining = budget.remaining()
+        connect, read = self.request_timeout
+        return (min(connect, remaining), min(read, remaining))
+
+
+class TickBudget:
+    """
+    1回の制御ティックで使える時間の予算を管理するクラス。
+
+    複数のスレッドから共有され、予算を使い切ったセンサーを記録します。
+
+    Attributes:
+        seconds (float): 予算の総量（秒）。
+        deadline (float): 予算が尽きる時刻（time.monotonic基準）。
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+        self._timed_out: List[str] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """
+        残りの予算を取得します。
+
+        Returns:
+            float: 残り時間（秒）。使い切っている場合は0。
+        """
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        """
+        予算を使い切ったかどうかを判定します。
+
+        Returns:
+            bool: 使い切っている場合はTrue
+        """
+        return self.remaining() <= 0
+
+    def record_timeout(self, sensor: str) -> None:
+        """
+        予算内に取得できなかったセンサーを記録します。
+
+        Args:
+            sensor (str): センサー名
+        """
+        with self._lock:
+            if sensor not in self._timed_out:
+                self._timed_out.append(sensor)
+
+    @property
+    def timed_out(self) -> List[str]:
+        """
+        予算内に取得できなかったセンサー名のリスト。
+        """
+        with self._lock:
+            return list(self._timed_out)
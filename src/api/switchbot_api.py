@@ -1,36 +1,166 @@
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Optional, Tuple
 import base64
 import hashlib
 import hmac
 import json
-import os
+import threading
 import time
 import requests
-from dotenv import load_dotenv
-from common.data_types import AirconSetting, CO2SensorData, TemperatureHumidity
+from requests.adapters import HTTPAdapter
+from api.command_pacer import CommandPacer
+from api.retry_policy import RetryPolicy, SensorTimeoutError, TickBudget
+from api.switchbot_quota import NON_ESSENTIAL_SENSORS, QuotaBudgeter, QuotaMode
+from api.switchbot_webhook import LatestStateTable
+from common.config import Config
+from common.data_types import AirconSetting, CO2SensorData, SensorSnapshot, TemperatureHumidity
+from util.clock import Clock, current_time
 
 # ロギング用のライブラリ
 from util.logger import logger
+from util.sensor_cache import SensorCache
 
 # 定数を管理するファイル
 import common.constants as constants
 
-# 環境変数の読み込み
-load_dotenv(".env")
+# センサー名とデバイスIDの環境変数名の対応
+SENSOR_DEVICE_ID_ENV = {
+    "ceiling": "SWITCHBOT_CEILING_DEVICE_ID",
+    "floor": "SWITCHBOT_FLOOR_DEVICE_ID",
+    "study": "SWITCHBOT_STUDY_DEVICE_ID",
+    "outdoor": "SWITCHBOT_OUTDOOR_DEVICE_ID",
+    "bedroom": "SWITCHBOT_CO2_BEDROOM_DEVICE_ID",
+}
 
-ACCESS_TOKEN = os.environ["SWITCHBOT_ACCESS_TOKEN"]
-SECRET = os.environ["SWITCHBOT_SECRET"]
-CIRCULATOR_DEVICE_ID = os.environ["SWITCHBOT_CIRCULATOR_DEVICE_ID"]
-CEILING_DEVICE_ID = os.environ["SWITCHBOT_CEILING_DEVICE_ID"]
-FLOOR_DEVICE_ID = os.environ["SWITCHBOT_FLOOR_DEVICE_ID"]
-OUTDOOR_DEVICE_ID = os.environ["SWITCHBOT_OUTDOOR_DEVICE_ID"]
-STUDY_DEVICE_ID = os.environ["SWITCHBOT_STUDY_DEVICE_ID"]
-CO2_BEDROOM_DEVICE_ID = os.environ["SWITCHBOT_CO2_BEDROOM_DEVICE_ID"]
-AIR_CONDITIONER_DEVICE_ID = os.environ["SWITCHBOT_AIR_CONDITIONER_DEVICE_ID"]
-AIR_CONDITIONER_SUPPORT_DEVICE_ID = os.environ["SWITCHBOT_AIR_CONDITIONER_SUPPORT_DEVICE_ID"]
+# HTTP接続プールの大きさ（同時に保持するKeep-Alive接続数）の既定値。SWITCHBOT_HTTP_POOL_SIZEで変更できる
+DEFAULT_HTTP_POOL_SIZE = 10
+# HTTP接続・読み込みのタイムアウト（秒）の既定値。SWITCHBOT_HTTP_CONNECT_TIMEOUT、SWITCHBOT_HTTP_READ_TIMEOUTで変更できる
+DEFAULT_HTTP_CONNECT_TIMEOUT = 5.0
+DEFAULT_HTTP_READ_TIMEOUT = 15.0
 
-# APIのベースURL
-API_BASE_URL = os.environ["SWITCHBOT_BASE_URL"]
+# コマンド送信の間隔をデバイスごとに制御する
+command_pacer = CommandPacer()
+
+# 全センサーを一括取得する際の1ティックあたりの締め切り（秒）
+SENSOR_FETCH_DEADLINE = 40
+
+
+class SwitchBotTransport:
+    """
+    SwitchBot APIとの通信に使うHTTPセッションを管理するクラス。
+
+    セッションはプロセス内で共有され、Keep-Alive接続をプールして再利用します。
+    これにより、ステータス取得やコマンド送信のたびにTCP接続とTLSハンドシェイクを行う必要がなくなります。
+
+    接続プールの大きさとタイムアウトは、最初に使う時点で環境変数（.envを含む）から取得します。
+
+    Attributes:
+        _session (requests.Session or None): 共有セッション。初回の取得時に生成されます。
+        _pool_size (int or None): 接続プールの大きさ。
+        _timeout (tuple[float, float] or None): 接続・読み込みのタイムアウト（秒）。
+    """
+
+    _session = None
+    _lock = threading.Lock()
+    _pool_size = None
+    _timeout = None
+
+    @staticmethod
+    def _resolve_settings() -> None:
+        """
+        接続プールの大きさとタイムアウトが未設定の場合は環境変数から取得します。ロックを確保して呼び出します。
+        """
+        if SwitchBotTransport._pool_size is None:
+            SwitchBotTransport._pool_size = Config.get_int("SWITCHBOT_HTTP_POOL_SIZE", DEFAULT_HTTP_POOL_SIZE)
+        if SwitchBotTransport._timeout is None:
+            SwitchBotTransport._timeout = (
+                Config.get_float("SWITCHBOT_HTTP_CONNECT_TIMEOUT", DEFAULT_HTTP_CONNECT_TIMEOUT),
+                Config.get_float("SWITCHBOT_HTTP_READ_TIMEOUT", DEFAULT_HTTP_READ_TIMEOUT),
+            )
+
+    @staticmethod
+    def timeout() -> Tuple[float, float]:
+        """
+        接続・読み込みのタイムアウトを取得します。
+
+        Returns:
+            Tuple[float, float]: 接続・読み込みのタイムアウト（秒）
+        """
+        with SwitchBotTransport._lock:
+            SwitchBotTransport._resolve_settings()
+            return SwitchBotTransport._timeout
+
+    @staticmethod
+    def configure(pool_size: int = None, connect_timeout: float = None, read_timeout: float = None) -> None:
+        """
+        接続プールの大きさとタイムアウトを変更します。既存のセッションは閉じられ、次回の通信時に再生成されます。
+
+        Args:
+            pool_size (int, optional): 接続プールの大きさ
+            connect_timeout (float, optional): 接続タイムアウト（秒）
+            read_timeout (float, optional): 読み込みタイムアウト（秒）
+        """
+        with SwitchBotTransport._lock:
+            SwitchBotTransport._resolve_settings()
+            if pool_size is not None:
+                SwitchBotTransport._pool_size = pool_size
+            connect, read = SwitchBotTransport._timeout
+            SwitchBotTransport._timeout = (
+                connect if connect_timeout is None else connect_timeout,
+                read if read_timeout is None else read_timeout,
+            )
+        SwitchBotTransport.close()
+
+    @staticmethod
+    def get_session() -> requests.Session:
+        """
+        共有セッションを取得します。存在しない場合は新たに生成します。
+
+        Returns:
+            requests.Session: 接続プールを持つ共有セッション
+        """
+        with SwitchBotTransport._lock:
+            if SwitchBotTransport._session is None:
+                SwitchBotTransport._resolve_settings()
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=SwitchBotTransport._pool_size, pool_maxsize=SwitchBotTransport._pool_size
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                SwitchBotTransport._session = session
+            return SwitchBotTransport._session
+
+    @staticmethod
+    def request(method: str, path: str, clock: Optional[Clock] = None, **kwargs) -> requests.Response:
+        """
+        共有セッションを使ってSwitchBot APIへリクエストを送信します。
+
+        Args:
+            method (str): HTTPメソッド
+            path (str): APIのパス（例: "/v1.1/devices"）
+            clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
+            **kwargs: requests.Session.requestに渡す追加の引数
+
+        Returns:
+            requests.Response: レスポンス
+        """
+        kwargs.setdefault("timeout", SwitchBotTransport.timeout())
+        # 1日の呼び出し回数の上限に備えて記録する
+        QuotaBudgeter.record_call("command" if method == "POST" else "status", current_time(clock))
+        return SwitchBotTransport.get_session().request(
+            method, f"{Config.get('SWITCHBOT_BASE_URL')}{path}", headers=generate_swt_header(), **kwargs
+        )
+
+    @staticmethod
+    def close() -> None:
+        """
+        共有セッションを閉じ、プールしている接続を解放します。
+        """
+        with SwitchBotTransport._lock:
+            if SwitchBotTransport._session is not None:
+                SwitchBotTransport._session.close()
+                SwitchBotTransport._session = None
 
 
 def generate_swt_header() -> Dict[str, str]:
@@ -41,12 +171,13 @@ def generate_swt_header() -> Dict[str, str]:
         headers (Dict[str, str]): 生成されたヘッダー。
     """
     # ACCESS_TOKENとSECRETを使用して署名を生成します
-    t, sign, nonce = generate_sign(ACCESS_TOKEN, SECRET)
+    access_token = Config.get("SWITCHBOT_ACCESS_TOKEN")
+    t, sign, nonce = generate_sign(access_token, Config.get("SWITCHBOT_SECRET"))
 
     # ヘッダーの辞書を作成します
     headers = {
         "Content-Type": "application/json; charset: utf8",
-        "Authorization": ACCESS_TOKEN,
+        "Authorization": access_token,
         "t": t,
         "sign": sign,
         "nonce": nonce,
@@ -74,99 +205,134 @@ def generate_sign(token: str, secret: str, nonce: str = "") -> tuple[str, str, s
     return (str(t), str(sign, "utf-8"), nonce)
 
 
-# def get_temperature_and_humidity(device_id: str) -> TemperatureHumidity:
-#     """
-#     指定したデバイスの温度と湿度を取得し、TemperatureHumidityオブジェクトを返します。
+def retry_policy(fallback: bool = False) -> RetryPolicy:
+    """
+    ステータス取得のリトライ方針を取得します。タイムアウトはSwitchBotTransportの設定に合わせます。
 
-#     Args:
-#         device_id (str): デバイスID
+    Args:
+        fallback (bool, optional): キャッシュで代用できるセンサーの場合はTrue（リトライせずにキャッシュを使う）
 
-#     Returns:
-#         TemperatureHumidity: 温度と湿度を格納したTemperatureHumidityオブジェクト
-#     """
-#     url = f"{API_BASE_URL}/v1.1/devices/{device_id}/status"
-#     try:
-#         with requests.Session() as session:
-#             response = session.get(url, headers=generate_swt_header())
-#             response.raise_for_status()
-#             data = response.json()
-#             temperature = data["body"]["temperature"]
-#             humidity = data["body"]["humidity"]
-#             return TemperatureHumidity(temperature, humidity)
-#     except requests.exceptions.RequestException as e:
-#         logger.error(e)
+    Returns:
+        RetryPolicy: リトライ方針
+    """
+    if fallback:
+        return RetryPolicy(max_attempts=1, request_timeout=SwitchBotTransport.timeout())
+    return RetryPolicy(request_timeout=SwitchBotTransport.timeout())
+
+
+def get_device_status(
+    device_id: str,
+    sensor: str = "",
+    budget: Optional[TickBudget] = None,
+    policy: Optional[RetryPolicy] = None,
+    clock: Optional[Clock] = None,
+) -> Dict:
+    """
+    指定したデバイスのステータスを取得します。失敗した場合はリトライ方針に従って再試行します。
 
+    Args:
+        device_id (str): デバイスID
+        sensor (str, optional): ログや時間切れの報告に使うセンサー名（デフォルトはデバイスID）
+        budget (Optional[TickBudget], optional): ティックの時間予算。使い切った時点でリトライを打ち切る
+        policy (Optional[RetryPolicy], optional): リトライ方針（デフォルトはretry_policy()）
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
 
+    Returns:
+        Dict: レスポンスのbody部分
 
-def get_temperature_and_humidity(device_id: str) -> TemperatureHumidity:
+    Raises:
+        SensorTimeoutError: 時間予算内に取得できなかった場合
+        RuntimeError: 最大試行回数までリトライしても取得できなかった場合
+    """
+    sensor = sensor or device_id
+    policy = policy or retry_policy()
+    path = f"/v1.1/devices/{device_id}/status"
+    out_of_budget = False
+    for attempt in range(policy.max_attempts):
+        if budget is not None and budget.expired():
+            out_of_budget = True
+            break
+        try:
+            response = SwitchBotTransport.request("GET", path, clock, timeout=policy.timeout_within(budget))
+            response.raise_for_status()
+            return response.json()["body"]
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error occurred ({sensor}): {e}")
+            if attempt + 1 >= policy.max_attempts:
+                break
+            retry_delay = policy.backoff(attempt)
+            if budget is not None and retry_delay >= budget.remaining():
+                # 待っている間に予算が尽きるのでリトライしない
+                out_of_budget = True
+                break
+            logger.info(f"Retrying in {retry_delay:.1f} seconds...")
+            time.sleep(retry_delay)
+
+    if out_of_budget or (budget is not None and budget.expired()):
+        budget.record_timeout(sensor)
+        raise SensorTimeoutError([sensor])
+
+    # リトライ後も成功しない場合はエラーを発生させる
+    raise RuntimeError(f"Failed to retrieve the status of {sensor} after multiple retries.")
+
+
+def get_temperature_and_humidity(
+    device_id: str,
+    sensor: str = "",
+    budget: Optional[TickBudget] = None,
+    policy: Optional[RetryPolicy] = None,
+    clock: Optional[Clock] = None,
+) -> TemperatureHumidity:
     """
     指定したデバイスの温度と湿度を取得し、TemperatureHumidityオブジェクトを返します。
 
     Args:
         device_id (str): デバイスID
+        sensor (str, optional): ログや時間切れの報告に使うセンサー名
+        budget (Optional[TickBudget], optional): ティックの時間予算
+        policy (Optional[RetryPolicy], optional): リトライ方針
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
 
     Returns:
         TemperatureHumidity: 温度と湿度を格納したTemperatureHumidityオブジェクト
     """
-    retry_count = 3  # リトライの試行回数
-    retry_delay = 5  # リトライ間の遅延（秒）
+    body = get_device_status(device_id, sensor, budget, policy, clock)
+    return TemperatureHumidity(body["temperature"], body["humidity"])
 
-    url = f"{API_BASE_URL}/v1.1/devices/{device_id}/status"
-    for _ in range(retry_count):
-        try:
-            with requests.Session() as session:
-                response = session.get(url, headers=generate_swt_header())
-                response.raise_for_status()
-                data = response.json()
-                temperature = data["body"]["temperature"]
-                humidity = data["body"]["humidity"]
-                return TemperatureHumidity(temperature, humidity)
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error occurred: {e}")
-            logger.info(f"Retrying in {retry_delay} seconds...")
-            time.sleep(retry_delay)
-    
-    # リトライ後も成功しない場合はエラーを発生させる
-    raise RuntimeError("Failed to retrieve temperature and humidity after multiple retries.")
 
-def get_co2_sensor_data(device_id: str) -> CO2SensorData:
+def get_co2_sensor_data(
+    device_id: str,
+    sensor: str = "",
+    budget: Optional[TickBudget] = None,
+    policy: Optional[RetryPolicy] = None,
+    clock: Optional[Clock] = None,
+) -> CO2SensorData:
     """
     指定したCO2センサーの温度、湿度、CO2を取得し、CO2SensorDataオブジェクトを返します。
 
     Args:
         device_id (str): デバイスID
+        sensor (str, optional): ログや時間切れの報告に使うセンサー名
+        budget (Optional[TickBudget], optional): ティックの時間予算
+        policy (Optional[RetryPolicy], optional): リトライ方針
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
 
     Returns:
         CO2SensorData: 温度、湿度、CO2を格納したCO2SensorDataオブジェクト
     """
-    retry_count = 3  # リトライの試行回数
-    retry_delay = 5  # リトライ間の遅延（秒）
+    body = get_device_status(device_id, sensor, budget, policy, clock)
 
-    url = f"{API_BASE_URL}/v1.1/devices/{device_id}/status"
-    for _ in range(retry_count):
-        try:
-            with requests.Session() as session:
-                response = session.get(url, headers=generate_swt_header())
-                response.raise_for_status()
-                data = response.json()
-                temperature = data["body"]["temperature"]
-                humidity = data["body"]["humidity"]
-                co2 = data["body"]["CO2"]
-
-                # TemperatureHumidityのインスタンスを作成
-                temperature_humidity = TemperatureHumidity(temperature=temperature, humidity=humidity)
-                return CO2SensorData(temperature_humidity=temperature_humidity, co2=co2)
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error occurred: {e}")
-            logger.info(f"Retrying in {retry_delay} seconds...")
-            time.sleep(retry_delay)
-    
-    # リトライ後も成功しない場合はエラーを発生させる
-    raise RuntimeError("Failed to retrieve CO2 sensor data after multiple retries.")
+    # TemperatureHumidityのインスタンスを作成
+    temperature_humidity = TemperatureHumidity(temperature=body["temperature"], humidity=body["humidity"])
+    return CO2SensorData(temperature_humidity=temperature_humidity, co2=body["CO2"])
 
 
 def post_command(
-    device_id: str, command: str, parameter: str = "default", command_type: str = "command"
+    device_id: str,
+    command: str,
+    parameter: str = "default",
+    command_type: str = "command",
+    clock: Optional[Clock] = None,
 ) -> requests.Response:
     """
     指定したデバイスにコマンドを送信し、その結果を取得します。
@@ -176,18 +342,18 @@ def post_command(
         command (str): 送信するコマンド
         parameter (str, optional): コマンドのパラメータ（デフォルトは"default"）
         command_type (str, optional): コマンドの種類（デフォルトは"command"）
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
 
     Returns:
         requests.Response: コマンドの実行結果を表すResponseオブジェクト
     """
-    url = f"{API_BASE_URL}/v1.1/devices/{device_id}/commands"
+    path = f"/v1.1/devices/{device_id}/commands"
     body = {"command": command, "parameter": parameter, "commandType": command_type}
     data = json.dumps(body)
     try:
-        # コマンド送信前に一時停止（例: 0.5秒待つ）
-        time.sleep(0.5)
-        with requests.Session() as session:
-            response = session.post(url, data=data, headers=generate_swt_header())
+        # 同じデバイスへの直前のコマンドから間隔が空いていない場合のみ待つ
+        command_pacer.acquire(device_id)
+        response = SwitchBotTransport.request("POST", path, clock, data=data)
         return response
     except requests.exceptions.RequestException as e:
         # エラーログを出力します
@@ -196,43 +362,71 @@ def post_command(
 
 
 
-def increase_air_volume() -> requests.Response:
+def increase_air_volume(clock: Optional[Clock] = None) -> requests.Response:
     """
     スイッチボットに風量を増加させるコマンドを送信します。
 
+    Args:
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
+
     Returns:
         requests.Response: コマンドの実行結果を表すResponseオブジェクト
     """
-    return post_command(CIRCULATOR_DEVICE_ID, constants.CirculatorFanSpeed.UP.value, "default", "customize")
+    return post_command(
+        Config.get("SWITCHBOT_CIRCULATOR_DEVICE_ID"),
+        constants.CirculatorFanSpeed.UP.value,
+        "default",
+        "customize",
+        clock,
+    )
 
 
-def decrease_air_volume() -> requests.Response:
+def decrease_air_volume(clock: Optional[Clock] = None) -> requests.Response:
     """
     スイッチボットに風量を減少させるコマンドを送信します。
 
+    Args:
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
+
     Returns:
         requests.Response: コマンドの実行結果を表すResponseオブジェクト
     """
-    return post_command(CIRCULATOR_DEVICE_ID, constants.CirculatorFanSpeed.DOWN.value, "default", "customize")
+    return post_command(
+        Config.get("SWITCHBOT_CIRCULATOR_DEVICE_ID"),
+        constants.CirculatorFanSpeed.DOWN.value,
+        "default",
+        "customize",
+        clock,
+    )
 
 
-def power_on_off() -> requests.Response:
+def power_on_off(clock: Optional[Clock] = None) -> requests.Response:
     """
     スイッチボットに電源をオン/オフするコマンドを送信します。
 
+    Args:
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
+
     Returns:
         requests.Response: コマンドの実行結果を表すResponseオブジェクト
     """
-    return post_command(CIRCULATOR_DEVICE_ID, constants.CirculatorPower.ON.id, "default", "customize")
+    return post_command(
+        Config.get("SWITCHBOT_CIRCULATOR_DEVICE_ID"),
+        constants.CirculatorPower.ON.id,
+        "default",
+        "customize",
+        clock,
+    )
 
 
 
-def aircon(settings: AirconSetting) -> requests.Response:
+def aircon(settings: AirconSetting, clock: Optional[Clock] = None) -> requests.Response:
     """
     エアコンの設定を変更するコマンドを送信します。
 
     Args:
         settings (AirconSetting): エアコンの設定を含むオブジェクト
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
 
     Returns:
         requests.Response: コマンドの実行結果を表すResponseオブジェクト
@@ -240,66 +434,217 @@ def aircon(settings: AirconSetting) -> requests.Response:
     if settings.mode_setting.id == constants.AirconMode.POWERFUL_COOLING.id:
         # パワフルモードは通常のエアコン設定では行えないため、別のデバイスIDで送信する
         return post_command(
-            AIR_CONDITIONER_SUPPORT_DEVICE_ID, constants.AirconMode.POWERFUL_COOLING.description, "default", "customize"
+            Config.get("SWITCHBOT_AIR_CONDITIONER_SUPPORT_DEVICE_ID"),
+            constants.AirconMode.POWERFUL_COOLING.description,
+            "default",
+            "customize",
+            clock,
         )
 
     if settings.mode_setting.id == constants.AirconMode.POWERFUL_HEATING.id:
         # パワフルモードは通常のエアコン設定では行えないため、別のデバイスIDで送信する
         return post_command(
-            AIR_CONDITIONER_SUPPORT_DEVICE_ID, constants.AirconMode.POWERFUL_HEATING.description, "default", "customize"
+            Config.get("SWITCHBOT_AIR_CONDITIONER_SUPPORT_DEVICE_ID"),
+            constants.AirconMode.POWERFUL_HEATING.description,
+            "default",
+            "customize",
+            clock,
         )
 
     return post_command(
-        AIR_CONDITIONER_DEVICE_ID,
+        Config.get("SWITCHBOT_AIR_CONDITIONER_DEVICE_ID"),
         "setAll",
         f"{settings.temp_setting},{settings.mode_setting.id},{settings.fan_speed_setting.id},{settings.power_setting.id}",
         "command",
+        clock,
     )
 
-def get_ceiling_temperature() -> TemperatureHumidity:
+def get_ceiling_temperature(
+    budget: Optional[TickBudget] = None, policy: Optional[RetryPolicy] = None, clock: Optional[Clock] = None
+) -> TemperatureHumidity:
     """
     天井の温度と湿度を取得します。
 
+    Args:
+        budget (Optional[TickBudget], optional): ティックの時間予算
+        policy (Optional[RetryPolicy], optional): リトライ方針
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
+
     Returns:
         TemperatureHumidity: 温度と湿度を表すオブジェクト
     """
-    return get_temperature_and_humidity(CEILING_DEVICE_ID)
+    return get_temperature_and_humidity(Config.get("SWITCHBOT_CEILING_DEVICE_ID"), "ceiling", budget, policy, clock)
 
 
-def get_floor_temperature() -> TemperatureHumidity:
+def get_floor_temperature(
+    budget: Optional[TickBudget] = None, policy: Optional[RetryPolicy] = None, clock: Optional[Clock] = None
+) -> TemperatureHumidity:
     """
     床の温度と湿度を取得するします。
 
+    Args:
+        budget (Optional[TickBudget], optional): ティックの時間予算
+        policy (Optional[RetryPolicy], optional): リトライ方針
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
+
     Returns:
         TemperatureHumidity: 温度と湿度を表すオブジェクト
     """
-    return get_temperature_and_humidity(FLOOR_DEVICE_ID)
+    return get_temperature_and_humidity(Config.get("SWITCHBOT_FLOOR_DEVICE_ID"), "floor", budget, policy, clock)
 
 
-def get_outdoor_temperature() -> TemperatureHumidity:
+def get_outdoor_temperature(
+    budget: Optional[TickBudget] = None, policy: Optional[RetryPolicy] = None, clock: Optional[Clock] = None
+) -> TemperatureHumidity:
     """
     屋外の温度と湿度を取得するします。
 
+    Args:
+        budget (Optional[TickBudget], optional): ティックの時間予算
+        policy (Optional[RetryPolicy], optional): リトライ方針
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
+
     Returns:
         TemperatureHumidity: 温度と湿度を表すオブジェクト
     """
-    return get_temperature_and_humidity(OUTDOOR_DEVICE_ID)
+    return get_temperature_and_humidity(Config.get("SWITCHBOT_OUTDOOR_DEVICE_ID"), "outdoor", budget, policy, clock)
 
 
-def get_study_temperature() -> TemperatureHumidity:
+def get_study_temperature(
+    budget: Optional[TickBudget] = None, policy: Optional[RetryPolicy] = None, clock: Optional[Clock] = None
+) -> TemperatureHumidity:
     """
     書斎の温度と湿度を取得するします。
 
+    Args:
+        budget (Optional[TickBudget], optional): ティックの時間予算
+        policy (Optional[RetryPolicy], optional): リトライ方針
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
+
     Returns:
         TemperatureHumidity: 温度と湿度を表すオブジェクト
     """
-    return get_temperature_and_humidity(STUDY_DEVICE_ID)
+    return get_temperature_and_humidity(Config.get("SWITCHBOT_STUDY_DEVICE_ID"), "study", budget, policy, clock)
 
-def get_co2_bedroom_data() -> CO2SensorData:
+def get_co2_bedroom_data(
+    budget: Optional[TickBudget] = None, policy: Optional[RetryPolicy] = None, clock: Optional[Clock] = None
+) -> CO2SensorData:
     """
     寝室のCO2センサーから温度、湿度、CO2濃度を取得します。
 
+    Args:
+        budget (Optional[TickBudget], optional): ティックの時間予算
+        policy (Optional[RetryPolicy], optional): リトライ方針
+        clock (Optional[Clock], optional): APIの使用量の記録に使う時計（デフォルトはTimeUtilの現在時刻）
+
     Returns:
         CO2SensorData: 温度、湿度、CO2濃度を表すオブジェクト
     """
-    return get_co2_sensor_data(CO2_BEDROOM_DEVICE_ID)
\ No newline at end of file
+    return get_co2_sensor_data(Config.get("SWITCHBOT_CO2_BEDROOM_DEVICE_ID"), "bedroom", budget, policy, clock)
+
+
+def setup_webhook(url: str) -> requests.Response:
+    """
+    全デバイスの状態変化を指定したURLへ通知するようにWebhookを登録します。
+
+    Args:
+        url (str): 通知先のURL
+
+    Returns:
+        requests.Response: 登録結果を表すResponseオブジェクト
+    """
+    body = {"action": "setupWebhook", "url": url, "deviceList": "ALL"}
+    return SwitchBotTransport.request("POST", "/v1.1/webhook/setupWebhook", data=json.dumps(body))
+
+
+def get_all_sensor_data(
+    deadline: float = SENSOR_FETCH_DEADLINE,
+    state_table: Optional[LatestStateTable] = None,
+    clock: Optional[Clock] = None,
+) -> SensorSnapshot:
+    """
+    全センサーの値を並列に取得します。
+
+    各センサーの取得はスレッドプールで同時に行うため、所要時間は全センサーの合計ではなく
+    最も遅いセンサーで決まります。リトライは全センサーで共有する時間予算の範囲内でのみ行います。
+    最大経過時間内のキャッシュがあるセンサーはリトライせず、取得に失敗した場合はキャッシュの値で代用します。
+    APIの使用量が1日の上限に近づいている場合、必須でないセンサーはキャッシュがあれば取得自体を省略します。
+    Webhookの最新値テーブルが与えられた場合、新しい値が通知されているセンサーはAPIを呼ばずにその値を使います。
+
+    Args:
+        deadline (float, optional): 全センサー取得の時間予算（秒）
+        state_table (Optional[LatestStateTable], optional): Webhookで受信した最新値テーブル
+        clock (Optional[Clock], optional): キャッシュの鮮度の判定とAPIの使用量の記録に使う時計
+            （デフォルトはTimeUtilの現在時刻）
+
+    Returns:
+        SensorSnapshot: 全センサーの値をまとめたオブジェクト
+
+    Raises:
+        SensorTimeoutError: 時間予算内に取得できず、代用できるキャッシュもないセンサーがある場合
+    """
+    budget = TickBudget(deadline)
+    now = current_time(clock)
+    cached = SensorCache.load_fresh(now)
+    fetchers = {
+        "ceiling": get_ceiling_temperature,
+        "floor": get_floor_temperature,
+        "study": get_study_temperature,
+        "outdoor": get_outdoor_temperature,
+        "bedroom": get_co2_bedroom_data,
+    }
+    readings, degraded, timed_out = {}, {}, []
+    if state_table is not None:
+        # Webhookで通知された値があるセンサーはAPIを呼ばない
+        for name in list(fetchers):
+            reading = state_table.get(Config.get(SENSOR_DEVICE_ID_ENV[name]), now)
+            expected_type = CO2SensorData if name == "bedroom" else TemperatureHumidity
+            if isinstance(reading, expected_type):
+                readings[name] = reading
+                del fetchers[name]
+
+    if QuotaBudgeter.mode(now) != QuotaMode.NORMAL:
+        # APIの使用量を節約するため、必須でないセンサーはキャッシュで代用する
+        for name in NON_ESSENTIAL_SENSORS:
+            if name in cached and name in fetchers:
+                readings[name], degraded[name] = cached[name]
+                del fetchers[name]
+                logger.info(f"API使用量を節約するため、{name}の取得を省略します")
+
+    futures, not_done = {}, set()
+    # 全てのセンサーをWebhookやキャッシュの値で賄える場合はAPIを呼ばない
+    if fetchers:
+        executor = ThreadPoolExecutor(max_workers=len(fetchers), thread_name_prefix="sensor")
+        futures = {
+            name: executor.submit(fetcher, budget, retry_policy(fallback=True) if name in cached else None, clock)
+            for name, fetcher in fetchers.items()
+        }
+        _, not_done = wait(futures.values(), timeout=budget.remaining())
+        # 予算を過ぎたセンサーの完了は待たない
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for name, future in futures.items():
+        error = None
+        if future in not_done:
+            budget.record_timeout(name)
+        else:
+            error = future.exception()
+            if error is None:
+                readings[name] = future.result()
+                continue
+
+        if name in cached:
+            # 最後に取得できた値で代用する
+            readings[name], degraded[name] = cached[name]
+            logger.warning(f"{name}の取得に失敗したため、{degraded[name]:.0f}秒前の値で代用します: {error}")
+        elif error is None or isinstance(error, SensorTimeoutError):
+            timed_out.append(name)
+        else:
+            raise error
+
+    if timed_out:
+        logger.error(f"時間予算{deadline}秒内に取得できなかったセンサー: {', '.join(timed_out)}")
+        raise SensorTimeoutError(timed_out)
+
+    SensorCache.store({name: reading for name, reading in readings.items() if name not in degraded}, now)
+    return SensorSnapshot(**readings, degraded=degraded)
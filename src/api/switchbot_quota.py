@@ -0,0 +1,170 @@
+import atexit
+import datetime
+import threading
+from enum import Enum
+from typing import Dict
+
+from common.config import Config
+from util.local_state import load_json, save_json
+from util.logger import logger
+
+# SwitchBot APIの1日あたりのリクエスト上限の既定値。SWITCHBOT_DAILY_REQUEST_LIMITで変更できる
+DEFAULT_DAILY_REQUEST_LIMIT = 10000
+# 1日の終わりの予測使用量が上限に対してこの割合を超えたら、必須でないセンサーの取得を省略する
+CONSERVE_THRESHOLD = 0.8
+# 1日の終わりの予測使用量が上限に対してこの割合を超えたら、制御ティックの頻度を下げる
+THROTTLE_THRESHOLD = 0.95
+# 頻度を下げた時に実行するティックの間隔（N回に1回実行）
+THROTTLED_TICK_INTERVAL = 2
+# cronで実行される制御ティックの間隔（分）
+TICK_INTERVAL_MINUTES = 10
+# 使用量の予測に使う最短の経過時間（日の始めの少ない実績から過大に予測しないため）
+MIN_PROJECTION_WINDOW = datetime.timedelta(hours=1)
+
+# 予算が厳しい時に取得を省略してよいセンサー（PMVの計算に使わないもの）
+NON_ESSENTIAL_SENSORS = ("study", "bedroom")
+
+
+def daily_request_limit() -> int:
+    """
+    SwitchBot APIの1日あたりのリクエスト上限を取得します。
+
+    Returns:
+        int: リクエスト上限
+    """
+    return Config.get_int("SWITCHBOT_DAILY_REQUEST_LIMIT", DEFAULT_DAILY_REQUEST_LIMIT)
+
+
+class QuotaMode(Enum):
+    """
+    APIの使用量に応じた動作モードを表すEnumクラス。
+    """
+
+    NORMAL = "通常"  # 通常: 全てのセンサーを毎ティック取得する
+    CONSERVE = "節約"  # 節約: 必須でないセンサーはキャッシュで代用する
+    THROTTLE = "間引き"  # 間引き: 制御ティックの頻度を下げる
+
+
+class QuotaBudgeter:
+    """
+    SwitchBot APIの呼び出し回数を日毎に集計し、1日の上限に収まるように動作モードを決めるクラス。
+
+    呼び出し回数はローカル状態ファイルに保存され、実行をまたいで累積されます。
+
+    Attributes:
+        _state (Dict or None): 当日の集計（日付、種類ごとの回数）。初回の利用時に読み込まれます。
+    """
+
+    FILE_NAME = "switchbot_quota.json"
+
+    _state = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _load(today: str) -> Dict:
+        """
+        当日の集計を取得します。日付が変わっている場合は集計をリセットします。
+        ロックを取得した状態で呼び出してください。
+
+        Args:
+            today (str): YYYY-MM-DD形式の日付
+
+        Returns:
+            Dict: 当日の集計
+        """
+        if QuotaBudgeter._state is None:
+            QuotaBudgeter._state = load_json(QuotaBudgeter.FILE_NAME, {})
+            atexit.register(QuotaBudgeter.flush)
+        if QuotaBudgeter._state.get("date") != today:
+            QuotaBudgeter._state = {"date": today, "calls": {}}
+        return QuotaBudgeter._state
+
+    @staticmethod
+    def record_call(kind: str, now: datetime.datetime) -> None:
+        """
+        APIの呼び出しを1回記録します。
+
+        Args:
+            kind (str): 呼び出しの種類（"status"、"command"など）
+            now (datetime.datetime): 呼び出し日時
+        """
+        with QuotaBudgeter._lock:
+            calls = QuotaBudgeter._load(now.date().isoformat())["calls"]
+            calls[kind] = calls.get(kind, 0) + 1
+
+    @staticmethod
+    def used(now: datetime.datetime) -> int:
+        """
+        当日の呼び出し回数の合計を取得します。
+
+        Args:
+            now (datetime.datetime): 現在日時
+
+        Returns:
+            int: 当日の呼び出し回数
+        """
+        with QuotaBudgeter._lock:
+            return sum(QuotaBudgeter._load(now.date().isoformat())["calls"].values())
+
+    @staticmethod
+    def projected_usage(now: datetime.datetime) -> float:
+        """
+        これまでのペースが続いた場合の1日の終わりの呼び出し回数を予測します。
+
+        Args:
+            now (datetime.datetime): 現在日時
+
+        Returns:
+            float: 1日の終わりの予測呼び出し回数
+        """
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        elapsed = max(now - start_of_day, MIN_PROJECTION_WINDOW)
+        return QuotaBudgeter.used(now) * (datetime.timedelta(days=1) / elapsed)
+
+    @staticmethod
+    def mode(now: datetime.datetime) -> QuotaMode:
+        """
+        予測使用量から現在の動作モードを決めます。
+
+        Args:
+            now (datetime.datetime): 現在日時
+
+        Returns:
+            QuotaMode: 動作モード
+        """
+        ratio = QuotaBudgeter.projected_usage(now) / daily_request_limit()
+        if ratio >= THROTTLE_THRESHOLD:
+            return QuotaMode.THROTTLE
+        if ratio >= CONSERVE_THRESHOLD:
+            return QuotaMode.CONSERVE
+        return QuotaMode.NORMAL
+
+    @staticmethod
+    def should_run_tick(now: datetime.datetime) -> bool:
+        """
+        今回の制御ティックを実行するかどうかを判断します。間引きモードではN回に1回だけ実行します。
+
+        Args:
+            now (datetime.datetime): 現在日時
+
+        Returns:
+            bool: 実行する場合はTrue
+        """
+        mode = QuotaBudgeter.mode(now)
+        if mode != QuotaMode.THROTTLE:
+            return True
+        tick_index = (now.hour * 60 + now.minute) // TICK_INTERVAL_MINUTES
+        run = tick_index % THROTTLED_TICK_INTERVAL == 0
+        logger.info(
+            f"API使用量の予測: {QuotaBudgeter.projected_usage(now):.0f}/{daily_request_limit()}回 ({mode.value}モード)"
+        )
+        return run
+
+    @staticmethod
+    def flush() -> None:
+        """
+        集計をローカル状態ファイルに保存します。
+        """
+        with QuotaBudgeter._lock:
+            if QuotaBudgeter._state is not None:
+                save_json(QuotaBudgeter.FILE_NAME, QuotaBudgeter._state)
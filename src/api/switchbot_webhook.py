@@ -0,0 +1,244 @@
+import datetime
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+
+from common.config import Config
+from common.data_types import CO2SensorData, TemperatureHumidity
+from util.logger import logger
+from util.time import TimeUtil
+
+SensorReading = Union[TemperatureHumidity, CO2SensorData]
+
+# Webhookを受信するポート番号の既定値。SWITCHBOT_WEBHOOK_PORTで変更できる
+DEFAULT_WEBHOOK_PORT = 8080
+# Webhookを待ち受けるアドレスの既定値。外部からはリバースプロキシやトンネルを経由して受信する
+DEFAULT_WEBHOOK_HOST = "127.0.0.1"
+# 通知先URLのクエリで受け取るトークンのパラメータ名
+TOKEN_PARAMETER = "token"
+# 受信した値を使ってよい最大経過時間（これより古い場合はポーリングで取得する）
+WEBHOOK_MAX_AGE = datetime.timedelta(minutes=15)
+
+
+def normalize_device_id(device_mac: str) -> str:
+    """
+    WebhookのdeviceMacをAPIのデバイスIDの形式（コロンなしの大文字）に変換します。
+
+    Args:
+        device_mac (str): Webhookで通知されたデバイスのMACアドレス
+
+    Returns:
+        str: デバイスID
+    """
+    return device_mac.replace(":", "").upper()
+
+
+class LatestStateTable:
+    """
+    Webhookで通知されたデバイスごとの最新の値を保持するクラス。
+
+    受信スレッドと制御ループから同時に参照されるため、操作はロックで保護されます。
+    """
+
+    def __init__(self):
+        self._states: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def update(self, device_id: str, reading: SensorReading, received_at: datetime.datetime) -> None:
+        """
+        デバイスの最新の値を更新します。
+
+        Args:
+            device_id (str): デバイスID
+            reading (SensorReading): 通知された値
+            received_at (datetime.datetime): 受信日時
+        """
+        with self._lock:
+            self._states[device_id] = {"reading": reading, "received_at": received_at}
+
+    def latest_received_at(self, device_id: str) -> Optional[datetime.datetime]:
+        """
+        デバイスの値を最後に受信した日時を取得します。
+
+        Args:
+            device_id (str): デバイスID
+
+        Returns:
+            Optional[datetime.datetime]: 最後に受信した日時。未受信の場合はNone。
+        """
+        with self._lock:
+            state = self._states.get(device_id)
+        return None if state is None else state["received_at"]
+
+    def get(
+        self, device_id: str, now: datetime.datetime, max_age: datetime.timedelta = WEBHOOK_MAX_AGE
+    ) -> Optional[SensorReading]:
+        """
+        デバイスの最新の値を取得します。
+
+        Args:
+            device_id (str): デバイスID
+            now (datetime.datetime): 現在日時
+            max_age (datetime.timedelta, optional): 値を使ってよい最大経過時間
+
+        Returns:
+            Optional[SensorReading]: 最新の値。未受信か古すぎる場合はNone。
+        """
+        with self._lock:
+            state = self._states.get(device_id)
+        if state is None or now - state["received_at"] > max_age:
+            return None
+        return state["reading"]
+
+
+def ingest_event(table: LatestStateTable, payload: Dict, received_at: datetime.datetime) -> bool:
+    """
+    Webhookで通知されたイベントを最新値テーブルに取り込みます。
+
+    温湿度計（温度・湿度）とCO2センサー（温度・湿度・CO2）のイベントのみを対象とします。
+
+    Args:
+        table (LatestStateTable): 最新値テーブル
+        payload (Dict): 通知されたJSON
+        received_at (datetime.datetime): 受信日時
+
+    Returns:
+        bool: 取り込んだ場合はTrue、対象外のイベントの場合はFalse
+    """
+    context = payload.get("context") if isinstance(payload, dict) else None
+    if not isinstance(context, dict):
+        return False
+    if "deviceMac" not in context or "temperature" not in context or "humidity" not in context:
+        return False
+
+    temperature_humidity = TemperatureHumidity(temperature=context["temperature"], humidity=context["humidity"])
+    if "CO2" in context:
+        reading = CO2SensorData(temperature_humidity=temperature_humidity, co2=context["CO2"])
+    else:
+        reading = temperature_humidity
+    table.update(normalize_device_id(context["deviceMac"]), reading, received_at)
+    return True
+
+
+class WebhookServer:
+    """
+    SwitchBotのWebhookを受信するローカルHTTPサーバーを管理するクラス。
+
+    受信したイベントは最新値テーブルに取り込まれ、制御ループはネットワークを介さずに参照できます。
+    受信したイベントはエアコンの制御に使われるため、通知先URLのクエリ（?token=...）に
+    SWITCHBOT_WEBHOOK_TOKENと一致するトークンがない要求は403で拒否します。
+
+    Attributes:
+        table (LatestStateTable): 最新値テーブル。
+        record_path (Optional[str]): 受信したJSONを1行ずつ追記するファイル。再生による検証に使います。
+    """
+
+    def __init__(
+        self,
+        table: LatestStateTable,
+        port: Optional[int] = None,
+        record_path: Optional[str] = None,
+        host: Optional[str] = None,
+        token: Optional[str] = None,
+    ):
+        """
+        Args:
+            table (LatestStateTable): 最新値テーブル
+            port (Optional[int]): 待ち受けるポート番号。Noneの場合はSWITCHBOT_WEBHOOK_PORT（既定は8080）
+            record_path (Optional[str]): 受信したJSONを追記するファイル
+            host (Optional[str]): 待ち受けるアドレス。Noneの場合はSWITCHBOT_WEBHOOK_HOST（既定は127.0.0.1）
+            token (Optional[str]): 受け付けるトークン。Noneの場合はSWITCHBOT_WEBHOOK_TOKEN（必須）
+
+        Raises:
+            ConfigError: トークンが指定されず、SWITCHBOT_WEBHOOK_TOKENも設定されていない場合
+        """
+        self.table = table
+        self.record_path = record_path
+        self._token = token if token is not None else Config.get("SWITCHBOT_WEBHOOK_TOKEN")
+        self._record_lock = threading.Lock()
+        host = host if host is not None else Config.get("SWITCHBOT_WEBHOOK_HOST", DEFAULT_WEBHOOK_HOST)
+        port = port if port is not None else Config.get_int("SWITCHBOT_WEBHOOK_PORT", DEFAULT_WEBHOOK_PORT)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        """
+        待ち受けているポート番号。
+        """
+        return self._server.server_address[1]
+
+    def is_authorized(self, path: str) -> bool:
+        """
+        要求のパスのクエリに正しいトークンが含まれているかどうかを判定します。
+
+        Args:
+            path (str): 要求のパス（クエリを含む）
+
+        Returns:
+            bool: トークンが一致する場合はTrue
+        """
+        tokens = parse_qs(urlsplit(path).query).get(TOKEN_PARAMETER, [])
+        return len(tokens) == 1 and hmac.compare_digest(tokens[0].encode(), self._token.encode())
+
+    def _make_handler(self):
+        server = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not server.is_authorized(self.path):
+                    self.send_response(403)
+                    self.end_headers()
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length))
+                except ValueError:
+                    payload = None
+                # イベントはJSONのオブジェクトのみを受け付ける
+                if not isinstance(payload, dict):
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                server.handle_payload(payload)
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                # アクセスログは出力しない
+                pass
+
+        return WebhookHandler
+
+    def handle_payload(self, payload: Dict) -> None:
+        """
+        受信したJSONを記録し、最新値テーブルに取り込みます。
+
+        Args:
+            payload (Dict): 受信したJSON
+        """
+        if self.record_path is not None:
+            with self._record_lock, open(self.record_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        if not ingest_event(self.table, payload, datetime.datetime.now(TimeUtil.timezone())):
+            logger.info(f"対象外のWebhookイベントを無視しました: {payload.get('context', {}).get('deviceType')}")
+
+    def start(self) -> None:
+        """
+        バックグラウンドのスレッドで受信を開始します。
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="webhook", daemon=True)
+        self._thread.start()
+        logger.info(f"Webhookの受信を開始しました（ポート{self.port}）")
+
+    def stop(self) -> None:
+        """
+        受信を停止します。
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,17 @@
+import argparse
+import time
+
+from util.archive import TABLE_SCHEMAS, HistoryArchive
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Supabaseのセンサー・制御履歴をローカルのアーカイブに取り込みます")
+    parser.add_argument(
+        "--tables", nargs="+", choices=sorted(TABLE_SCHEMAS), default=list(TABLE_SCHEMAS), help="取り込むテーブル"
+    )
+    args = parser.parse_args()
+
+    archive = HistoryArchive()
+    for table in args.tables:
+        started = time.perf_counter()
+        added = archive.ingest(table)
+        print(f"{table}: {added}行を追加しました（{time.perf_counter() - started:.1f}秒）")
@@ -0,0 +1,84 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 計測するモジュール（制御ループが最初のセンサー取得までに読み込むもの）
+MODULES = [
+    "common.config",
+    "util.supabase_client",
+    "api.jma_forecast",
+    "api.switchbot_api",
+    "util.analytics",
+    "home_climate_control",
+]
+
+# 読み込み時間を計測して出力する子プロセスのコード
+IMPORT_SCRIPT = """
+import importlib, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(time.perf_counter() - start)
+print(" ".join(name for name in ("requests", "supabase", "numpy", "dotenv") if name in sys.modules))
+"""
+
+
+def measure(module: str, runs: int) -> tuple:
+    """
+    新しいPythonプロセスでモジュールを読み込み、読み込み時間とプロセス全体の所要時間を計測します。
+
+    .envの内容に左右されないよう、環境変数が設定されていない状態で計測します。
+
+    Args:
+        module (str): モジュール名
+        runs (int): 計測回数
+
+    Returns:
+        tuple: 読み込み時間の中央値（秒）、プロセス全体の所要時間の中央値（秒）、読み込まれた重いライブラリ
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": src_dir, "SWITCHBOT_STATE_DIR": tempfile.mkdtemp()}
+    imports, totals, loaded = [], [], ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT, module],
+            cwd=src_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        totals.append(time.perf_counter() - start)
+        lines = result.stdout.splitlines()
+        imports.append(float(lines[0]))
+        loaded = lines[1] if len(lines) > 1 else ""
+    return statistics.median(imports), statistics.median(totals), loaded.strip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="制御ループのモジュールの読み込み時間を計測します")
+    parser.add_argument("--runs", type=int, default=10, help="モジュールごとの計測回数")
+    parser.add_argument(
+        "--max-median",
+        type=float,
+        default=None,
+        help="home_climate_controlの読み込み時間の中央値がこの秒数を超えたら終了コード1で終了する",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for module in MODULES:
+        import_time, total_time, loaded = measure(module, args.runs)
+        results[module] = import_time
+        print(
+            f"{module}: 読み込み {import_time * 1000:.1f}ms / プロセス全体 {total_time * 1000:.1f}ms"
+            f"（読み込まれたライブラリ: {loaded or 'なし'}）"
+        )
+
+    if args.max_median is not None and results["home_climate_control"] > args.max_median:
+        print(f"読み込み時間の中央値が上限 {args.max_median}秒を超えました")
+        sys.exit(1)
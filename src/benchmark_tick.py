@@ -0,0 +1,118 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from simulator.switchbot_cloud import LatencyModel, SwitchBotCloudSimulator, ThermalModel
+
+# シミュレーターに登録するデバイスの環境変数名と役割
+DEVICE_ROLES = {
+    "SWITCHBOT_CEILING_DEVICE_ID": "ceiling",
+    "SWITCHBOT_FLOOR_DEVICE_ID": "floor",
+    "SWITCHBOT_STUDY_DEVICE_ID": "study",
+    "SWITCHBOT_OUTDOOR_DEVICE_ID": "outdoor",
+    "SWITCHBOT_CO2_BEDROOM_DEVICE_ID": "bedroom",
+    "SWITCHBOT_AIR_CONDITIONER_DEVICE_ID": "aircon",
+    "SWITCHBOT_AIR_CONDITIONER_SUPPORT_DEVICE_ID": "aircon_support",
+    "SWITCHBOT_CIRCULATOR_DEVICE_ID": "circulator",
+}
+
+
+def start_simulator(args) -> SwitchBotCloudSimulator:
+    """
+    シミュレーターを起動し、switchbot_apiがシミュレーターへ接続するように環境変数を設定します。
+    switchbot_apiはインポート時に環境変数を読むため、インポートより前に呼び出してください。
+
+    Args:
+        args: コマンドライン引数
+
+    Returns:
+        SwitchBotCloudSimulator: 起動したシミュレーター
+    """
+    devices = {}
+    for env_name, role in DEVICE_ROLES.items():
+        device_id = os.environ.setdefault(env_name, f"SIM{role.upper()}")
+        devices[device_id] = role
+
+    latency = LatencyModel(
+        median=args.median_latency,
+        sigma=args.sigma,
+        spike_rate=args.spike_rate,
+        spike_latency=args.spike_latency,
+        error_rate=args.error_rate,
+    )
+    simulator = SwitchBotCloudSimulator(devices, latency, ThermalModel(time_scale=args.time_scale), seed=args.seed)
+    simulator.start()
+
+    os.environ["SWITCHBOT_BASE_URL"] = simulator.base_url
+    os.environ.setdefault("SWITCHBOT_ACCESS_TOKEN", "simulator")
+    os.environ.setdefault("SWITCHBOT_SECRET", "simulator")
+    # 計測中にAPI使用量の節約モードに入らないようにする
+    os.environ["SWITCHBOT_DAILY_REQUEST_LIMIT"] = str(10**9)
+    os.environ["SWITCHBOT_STATE_DIR"] = tempfile.mkdtemp(prefix="switchbot-benchmark-")
+    return simulator
+
+
+def run_benchmark(ticks: int) -> list:
+    """
+    センサー取得、エアコン設定、サーキュレーター設定からなる制御ティックのI/O経路を繰り返し実行します。
+
+    Args:
+        ticks (int): 実行するティック数
+
+    Returns:
+        list: ティックごとの所要時間（秒）
+    """
+    import api.switchbot_api as switchbot_api
+    import common.constants as constants
+    from common.data_types import AirconSetting
+    from util.aircon import Aircon
+    from util.circulator import Circulator
+
+    setting = AirconSetting("26", constants.AirconMode.COOLING, constants.AirconFanSpeed.AUTO, constants.AirconPower.ON)
+    power, fan_speed = constants.CirculatorPower.OFF.description, 0
+    durations = []
+    for i in range(ticks):
+        target_fan_speed = 2 if i % 2 == 0 else 0
+        start = time.perf_counter()
+        switchbot_api.get_all_sensor_data()
+        Aircon.update_aircon_settings(setting)
+        power = Circulator.set_circulator(power, fan_speed, target_fan_speed)
+        fan_speed = target_fan_speed
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SwitchBotクラウドのシミュレーターで制御ティックのI/O経路を計測します")
+    parser.add_argument("--ticks", type=int, default=50, help="実行するティック数")
+    parser.add_argument("--median-latency", type=float, default=0.15, help="応答遅延の中央値（秒）")
+    parser.add_argument("--sigma", type=float, default=0.5, help="応答遅延の対数正規分布の形状パラメータ")
+    parser.add_argument("--spike-rate", type=float, default=0.0, help="遅延スパイクの発生確率")
+    parser.add_argument("--spike-latency", type=float, default=5.0, help="遅延スパイクの大きさ（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500を返す確率")
+    parser.add_argument("--time-scale", type=float, default=60.0, help="実時間1秒あたりに進めるシミュレーション時間（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--max-p95", type=float, default=None, help="p95がこの秒数を超えたら終了コード1で終了する")
+    args = parser.parse_args()
+
+    simulator = start_simulator(args)
+    try:
+        durations = run_benchmark(args.ticks)
+    finally:
+        simulator.stop()
+
+    total = sum(durations)
+    percentiles = statistics.quantiles(durations, n=100, method="inclusive")
+    print(f"ticks: {len(durations)}, requests: {simulator.request_count}")
+    print(f"throughput: {len(durations) / total:.2f} ticks/s")
+    print(
+        f"latency: p50={percentiles[49]:.3f}s p95={percentiles[94]:.3f}s "
+        f"p99={percentiles[98]:.3f}s max={max(durations):.3f}s"
+    )
+
+    if args.max_p95 is not None and percentiles[94] > args.max_p95:
+        print(f"p95 {percentiles[94]:.3f}s exceeds the limit of {args.max_p95}s")
+        sys.exit(1)
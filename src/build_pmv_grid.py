@@ -0,0 +1,18 @@
+import argparse
+import sys
+import time
+
+from util.pmv_grid import build_grid
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="制御ループで補間に使うPMVの格子を作成します")
+    parser.add_argument("path", help="格子を保存するディレクトリ（PMV_GRID_PATHに指定する）")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        meta = build_grid(args.path)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"{args.path} に格子を作成しました（{time.perf_counter() - started:.1f}秒）")
+    print(f"補間の誤差: 最大 {meta['max_error']:.4f}, 99パーセンタイル {meta['p99_error']:.4f}")
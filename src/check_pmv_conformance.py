@@ -0,0 +1,106 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+import util.heat_comfort_calculator as heat_comfort_calculator
+from util.pmv_grid import PMV_GRID_PATH_ENV, PMVGrid, build_grid
+
+# 比較の許容誤差（丸めの境界での差を許容する）
+PMV_TOLERANCE = 0.01
+PPD_TOLERANCE = 0.1
+
+# 格子を使う場合に確認するスカラーの入力（tdb, tr, vr, rh, met, clo）
+GRID_SCALAR_INPUTS = [
+    (25.0, 26.0, 0.15, 50.0, 1.1, 0.6),  # 格子の範囲内
+    (35.0, 30.0, 0.15, 50.0, 1.1, 0.6),  # 乾球温度が格子の範囲外
+    (10.2, 10.5, 0.05, 50.0, 0.9, 0.05),  # 補間に適用範囲外の格子点を含む
+]
+
+
+def random_inputs(count: int, seed: int) -> dict:
+    """
+    ISO 7730の適用範囲の内外にわたる入力を乱数で生成します。
+
+    Args:
+        count (int): 入力の数
+        seed (int): 乱数のシード
+
+    Returns:
+        dict: 引数名と値の配列の辞書
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        "tdb": rng.uniform(5, 35, count),
+        "tr": rng.uniform(5, 45, count),
+        "v": rng.uniform(0, 1.2, count),
+        "rh": rng.uniform(0, 100, count),
+        "met": rng.uniform(0.7, 2.5, count),
+        "clo": rng.uniform(0, 2.2, count),
+    }
+
+
+def compare(name: str, actual: np.ndarray, expected: np.ndarray, tolerance: float) -> bool:
+    """
+    2つの配列がNaNの位置も含めて許容誤差内で一致するかを比較し、結果を出力します。
+    """
+    same_nan = np.isnan(actual) == np.isnan(expected)
+    finite = ~np.isnan(actual) & ~np.isnan(expected)
+    error = np.abs(actual[finite] - expected[finite])
+    ok = bool(same_nan.all() and (error <= tolerance).all())
+    max_error = float(error.max()) if error.size else 0.0
+    print(f"{name}: {'OK' if ok else 'NG'}（最大誤差 {max_error:.4f}, NaNの不一致 {int((~same_nan).sum())}件）")
+    return ok
+
+
+def check_grid_scalars() -> bool:
+    """
+    一時ディレクトリに作成した格子をPMV_GRID_PATHに設定し、スカラーの入力に対するcalculate_pmv_ppdの結果が
+    スカラーのまま返り、格子を使わない計算と許容誤差内で一致するかを確認します。
+    """
+    with tempfile.TemporaryDirectory() as path:
+        build_grid(path)
+        os.environ[PMV_GRID_PATH_ENV] = path
+        grid = PMVGrid.get_grid()
+        pmv, expected_pmv = [], []
+        for inputs in GRID_SCALAR_INPUTS:
+            actual = heat_comfort_calculator.calculate_pmv_ppd(*inputs)
+            if any(np.shape(value) != () for value in actual):
+                print(f"grid_scalar: NG（{inputs} の結果がスカラーではありません）")
+                return False
+            pmv.append(actual[0])
+            expected_pmv.append(heat_comfort_calculator.pmv_ppd_iso(*inputs)[0])
+        tolerance = grid.max_error + PMV_TOLERANCE
+        return compare("grid_scalar_pmv", np.array(pmv), np.array(expected_pmv), tolerance)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="heat_comfort_calculatorのPMV/PPDの計算がpythermalcomfort 2.7と一致するかを確認します"
+    )
+    parser.add_argument("--count", type=int, default=100000, help="比較する入力の数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    args = parser.parse_args()
+
+    # 比較対象は確認時のみ必要なため、ここで読み込む（pip install -r requirements-dev.txt）
+    from pythermalcomfort.models import pmv_ppd
+    from pythermalcomfort.utilities import clo_dynamic, v_relative
+
+    inputs = random_inputs(args.count, args.seed)
+    vr = heat_comfort_calculator.v_relative(inputs["v"], inputs["met"])
+    clo = heat_comfort_calculator.clo_dynamic(inputs["clo"], inputs["met"])
+    pmv, ppd = heat_comfort_calculator.pmv_ppd_iso(inputs["tdb"], inputs["tr"], vr, inputs["rh"], inputs["met"], clo)
+    expected = pmv_ppd(
+        tdb=inputs["tdb"], tr=inputs["tr"], vr=vr, rh=inputs["rh"], met=inputs["met"], clo=clo, standard="ISO"
+    )
+
+    results = [
+        compare("v_relative", vr, v_relative(v=inputs["v"], met=inputs["met"]), 0),
+        compare("clo_dynamic", clo, clo_dynamic(clo=inputs["clo"], met=inputs["met"]), 0),
+        compare("pmv", pmv, np.asarray(expected["pmv"], dtype="float64"), PMV_TOLERANCE),
+        compare("ppd", ppd, np.asarray(expected["ppd"], dtype="float64"), PPD_TOLERANCE),
+        check_grid_scalars(),
+    ]
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,71 @@
+import os
+from typing import Optional
+
+# 環境変数を読み込む.envファイル
+ENV_FILE = ".env"
+
+
+class ConfigError(KeyError):
+    """
+    必要な環境変数が設定されていない場合の例外。
+    """
+
+
+class Config:
+    """
+    環境変数から設定を取得するクラス。
+
+    .envファイルは最初に設定を取得した時点で一度だけ読み込みます。必須の設定が欠けていても
+    モジュールの読み込み時には失敗せず、その設定を実際に使う時点でConfigErrorを送出します。
+
+    Attributes:
+        _loaded (bool): .envファイルを読み込んだかどうか。
+    """
+
+    _loaded = False
+
+    @staticmethod
+    def load() -> None:
+        """
+        .envファイルを読み込みます。既に読み込んでいる場合は何もしません。
+        """
+        if not Config._loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv(ENV_FILE)
+            Config._loaded = True
+
+    @staticmethod
+    def get(name: str, default: Optional[str] = None) -> str:
+        """
+        設定を取得します。
+
+        Args:
+            name (str): 環境変数名
+            default (Optional[str]): 設定されていない場合の値。Noneの場合は必須の設定として扱う
+
+        Returns:
+            str: 設定値
+
+        Raises:
+            ConfigError: 必須の設定が設定されていない場合
+        """
+        Config.load()
+        value = os.environ.get(name, default)
+        if value is None:
+            raise ConfigError(f"環境変数 {name} が設定されていません")
+        return value
+
+    @staticmethod
+    def get_int(name: str, default: Optional[int] = None) -> int:
+        """
+        設定を整数として取得します。引数はgetと同じです。
+        """
+        return int(Config.get(name, None if default is None else str(default)))
+
+    @staticmethod
+    def get_float(name: str, default: Optional[float] = None) -> float:
+        """
+        設定を小数として取得します。引数はgetと同じです。
+        """
+        return float(Config.get(name, None if default is None else str(default)))
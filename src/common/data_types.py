@@ -1,5 +1,9 @@
 import dataclasses
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Optional
+
+# numpyはPMVBatchの型注釈のみに使うため、このモジュールを読み込むだけでnumpyを読み込まないようにする
+if TYPE_CHECKING:
+    import numpy as np
 
 # 定数を管理するファイル
 import common.constants as constants
@@ -39,6 +43,36 @@ class PMVCalculation:
     dynamic_clothing_insulation: float
 
 
+@dataclasses.dataclass
+class PMVBatch:
+    """
+    複数の時点のPMV計算結果をまとめて表すデータクラス。各属性は時点ごとの値の配列です。
+
+    Attributes:
+        pmv (np.ndarray): PMV値（快適度指数）。
+        ppd (np.ndarray): PPD値（不快指数）。
+        clo (np.ndarray): 動的な衣服の断熱性。
+        air (np.ndarray): 相対風速。
+        met (np.ndarray): MET値（代謝当量）。
+        wall (np.ndarray): 壁表面温度。
+        ceiling (np.ndarray): 天井表面温度。
+        floor (np.ndarray): 床表面温度。
+        mean_radiant_temperature (np.ndarray): 平均放射温度。
+        dry_bulb_temperature (np.ndarray): 乾球温度。
+    """
+
+    pmv: "np.ndarray"
+    ppd: "np.ndarray"
+    clo: "np.ndarray"
+    air: "np.ndarray"
+    met: "np.ndarray"
+    wall: "np.ndarray"
+    ceiling: "np.ndarray"
+    floor: "np.ndarray"
+    mean_radiant_temperature: "np.ndarray"
+    dry_bulb_temperature: "np.ndarray"
+
+
 @dataclasses.dataclass
 class AirconSetting:
     """
@@ -102,4 +136,26 @@ class CO2SensorData:
         co2 (int): CO2濃度値。
     """
     temperature_humidity: TemperatureHumidity
-    co2: int
\ No newline at end of file
+    co2: int
+
+
+@dataclasses.dataclass
+class SensorSnapshot:
+    """
+    1回の制御ティックで取得した全センサーの値を表すデータクラス。
+
+    Attributes:
+        ceiling (TemperatureHumidity): 天井の温度と湿度データ。
+        floor (TemperatureHumidity): 床の温度と湿度データ。
+        study (TemperatureHumidity): 書斎の温度と湿度データ。
+        outdoor (TemperatureHumidity): 外部の温度と湿度データ。
+        bedroom (CO2SensorData): 寝室のCO2センサーのデータ。
+        degraded (Dict[str, float]): 取得に失敗し、キャッシュの値で代用したセンサー名と値の経過秒数。
+    """
+
+    ceiling: TemperatureHumidity
+    floor: TemperatureHumidity
+    study: TemperatureHumidity
+    outdoor: TemperatureHumidity
+    bedroom: CO2SensorData
+    degraded: Dict[str, float] = dataclasses.field(default_factory=dict)
@@ -2,19 +2,17 @@ import base64
 import hashlib
 import hmac
 import json
-import os
 import time
 
 import requests
-from dotenv import load_dotenv
 
-load_dotenv(".env")
+from common.config import Config
 
 # APIのベースURL
-API_BASE_URL = os.environ["SWITCHBOT_BASE_URL"]
+API_BASE_URL = Config.get("SWITCHBOT_BASE_URL")
 
-ACCESS_TOKEN: str = os.environ["SWITCHBOT_ACCESS_TOKEN"]
-SECRET: str = os.environ["SWITCHBOT_SECRET"]
+ACCESS_TOKEN: str = Config.get("SWITCHBOT_ACCESS_TOKEN")
+SECRET: str = Config.get("SWITCHBOT_SECRET")
 
 
 def generate_sign(token: str, secret: str, nonce: str = "") -> tuple[str, str, str]:
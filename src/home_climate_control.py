@@ -1,17 +1,24 @@
 import datetime
 import statistics
+from typing import Optional
 from util.aircon import Aircon
 from util.circulator import Circulator
+from util.clock import Clock, ManualClock, current_time
 from util.logger import LoggerUtil
+from util.tick_scheduler import tick_lock
 from util.time import TimeUtil
+from util.write_behind import WriteBehindQueue
 import util.analytics as analytics
 import util.heat_comfort_calculator as heat_comfort_calculator
+import util.scenario_evaluator as scenario_evaluator
 import api.switchbot_api as switchbot_api
+from api.switchbot_quota import QuotaBudgeter
+from api.switchbot_webhook import LatestStateTable
 import common.constants as constants
 
 
-def calculate_met_icl(outdoor_temperature: float, max_temp: int, bedtime: bool):
-    now = TimeUtil.get_current_time()
+def calculate_met_icl(outdoor_temperature: float, max_temp: int, bedtime: bool, clock: Optional[Clock] = None):
+    now = current_time(clock)
     # 現在の曜日を取得
     current_day = now.weekday()  # 0:月曜, 1:火曜, ..., 6:日曜
     ot = outdoor_temperature
@@ -54,18 +61,27 @@ def calculate_met_icl(outdoor_temperature: float, max_temp: int, bedtime: bool):
 
 
 # メイン関数
-def main():
-    # 温度と湿度の取得
-    ceiling = switchbot_api.get_ceiling_temperature()
-    floor = switchbot_api.get_floor_temperature()
-    study = switchbot_api.get_study_temperature()
-    outdoor = switchbot_api.get_outdoor_temperature()
-    bedroom = switchbot_api.get_co2_bedroom_data()
+def main(state_table: Optional[LatestStateTable] = None, clock: Optional[Clock] = None):
+    # ティック中の判定と記録が同じ時刻を使うよう、ティックの開始時刻で止めた時計を各処理に明示的に渡す
+    tick_clock = ManualClock(current_time(clock))
+
+    # APIの使用量が上限に近い場合はティックを間引く
+    if not QuotaBudgeter.should_run_tick(tick_clock.now()):
+        LoggerUtil.log_skipped_tick()
+        return False
+
+    # 温度と湿度の取得（全センサーを並列に取得）
+    snapshot = switchbot_api.get_all_sensor_data(state_table=state_table, clock=tick_clock)
+    ceiling = snapshot.ceiling
+    floor = snapshot.floor
+    study = snapshot.study
+    outdoor = snapshot.outdoor
+    bedroom = snapshot.bedroom
     # 天気予報を取得
-    max_temp = analytics.get_or_insert_max_temperature()
+    max_temp = analytics.get_or_insert_max_temperature(clock=tick_clock)
 
     # サーキュレーターの起動・停止時間の設定
-    now = TimeUtil.get_current_time()
+    now = tick_clock.now()
     on_time = TimeUtil.timezone().localize(datetime.datetime(now.year, now.month, now.day, 5, 0, 0, 0))
     off_time = TimeUtil.timezone().localize(datetime.datetime(now.year, now.month, now.day, 22, 50, 0, 0))
     # 寝る時間かどうかを判断（起動時間内ならばFalse,それ以外はTrue）
@@ -107,46 +123,50 @@ def main():
         outdoor_absolute_humidity,
         dew_point,
         max_temp,
-        TimeUtil.get_current_time(),
+        now,
     )
+    # キャッシュで代用したセンサーがあればログに出力
+    LoggerUtil.log_degraded_sensors(snapshot.degraded)
     # METとICLの値を計算
-    met, icl = calculate_met_icl(outdoor.temperature, max_temp, bedtime)
-
-    # PMV値を計算
-    pmv = heat_comfort_calculator.calculate_pmv(ceiling, floor, outdoor, study, met, icl)
-
-    # 夏の間
-    circulator_on = False
-    circulator_on_spped = 0
-    if 6 <= now.month <= 9:
-        circulator_on = True
-        # pmvが0以上か、湿度が13以上の場合はサーキュレーターを起動
-        if pmv.pmv >= 0 or absolute_humidity >= 13:
-            # サーキュレーターを稼働する
-            circulator_on_spped = 2
-        else:
-            # サーキュレーターを停止する
-            circulator_on_spped = 0
-
-    # 風量を増やしてPMV値を再計算
-    if circulator_on:
-        pmv = heat_comfort_calculator.calculate_pmv(ceiling, floor, outdoor, study, met, icl, wind_speed=0.3)
+    met, icl = calculate_met_icl(outdoor.temperature, max_temp, bedtime, clock=tick_clock)
+
+    # 夏の間はサーキュレーターの風量を候補に含める（寝る時間はサーキュレーターを止めるため含めない）
+    circulator_on = 6 <= now.month <= 9
+    circulator_speeds = (0,)
+    if circulator_on and not bedtime:
+        # 湿度が13以上の場合はサーキュレーターを稼働する
+        circulator_speeds = (2,) if absolute_humidity >= 13 else (0, 2)
+
+    # 候補ごとのPMV値とエアコンの設定をまとめて計算し、快適な範囲でエアコンの強度が最も低い操作を選ぶ
+    results = scenario_evaluator.evaluate_scenarios(
+        scenario_evaluator.build_scenarios(met, icl, circulator_speeds),
+        ceiling,
+        floor,
+        outdoor,
+        study,
+        now,
+        absolute_humidity,
+        dew_point,
+    )
+    evaluation = scenario_evaluator.choose_lowest_intensity(results)
+    pmv = evaluation.pmv
+    circulator_on_spped = evaluation.scenario.circulator_speed
+    LoggerUtil.log_scenario_choice(len(results), circulator_on_spped, evaluation.intensity)
 
     # 結果をログに出力
     LoggerUtil.log_pmv_results(pmv, met, icl)
 
     # 前回のサーキュレーターの設定を取得
-    current_fan_power, current_fan_speed = analytics.get_latest_circulator_setting()
+    current_fan_power, current_fan_speed = analytics.get_current_circulator_setting(tick_clock)
     # 前回のエアコンの設定を取得
-    current_aircon_setting, aircon_last_setting_time = analytics.get_latest_aircon_setting()
+    current_aircon_setting, aircon_last_setting_time = analytics.get_current_aircon_setting(tick_clock)
     # 前回のエアコン設定からの経過時間を計算
-    hours, minutes = TimeUtil.calculate_elapsed_time(aircon_last_setting_time)
+    hours, minutes = TimeUtil.calculate_elapsed_time(aircon_last_setting_time, clock=tick_clock)
     LoggerUtil.log_elapsed_time(hours, minutes)
 
     # PMVを元にエアコンの設定を更新
-    aircon_setting = Aircon.set_aircon(
-        pmv, floor.temperature, study.temperature, outdoor.temperature, absolute_humidity, dew_point
-    )
+    aircon_setting = evaluation.aircon_setting
+    LoggerUtil.log_aircon_reasons(evaluation.reasons)
 
     # 寝る時間の送風はLOWにする
     if bedtime == True and aircon_setting.mode_setting.id == constants.AirconMode.FAN.id:
@@ -154,7 +174,7 @@ def main():
 
     # エアコンの設定を更新
     ac_settings_changed = Aircon.update_aircon_if_necessary(
-        aircon_setting, current_aircon_setting, aircon_last_setting_time
+        aircon_setting, current_aircon_setting, aircon_last_setting_time, clock=tick_clock
     )
 
     # エアコンの設定をログに出力
@@ -163,39 +183,65 @@ def main():
     # 操作時間外なら風量を0に設定して終了
     power, fan_speed = None, None
     if bedtime:
-        power = Circulator.set_circulator(current_fan_power, current_fan_speed, 0)
+        power = Circulator.set_circulator(current_fan_power, current_fan_speed, 0, clock=tick_clock)
         fan_speed = 0
     else:
         # 送風で節電
         if circulator_on:
-            power = Circulator.set_circulator(current_fan_power, current_fan_speed, circulator_on_spped)
+            power = Circulator.set_circulator(
+                current_fan_power, current_fan_speed, circulator_on_spped, clock=tick_clock
+            )
             fan_speed = circulator_on_spped
         else:
             # 温度差に基づいてサーキュレーターを設定
             power, fan_speed = Circulator.set_fan_speed_based_on_temperature_diff(
-                outdoor.temperature, ceiling.temperature - floor.temperature, current_fan_power, current_fan_speed
+                outdoor.temperature,
+                ceiling.temperature - floor.temperature,
+                current_fan_power,
+                current_fan_speed,
+                clock=tick_clock,
             )
 
     # ログ出力
     LoggerUtil.log_circulator_setting(current_fan_power, current_fan_speed, fan_speed)
-    LoggerUtil.log_aircon_scores(analytics.get_aircon_intensity_scores(now))
+    LoggerUtil.log_aircon_scores(analytics.get_aircon_intensity_scores(now, tick_clock))
 
-    # 結果を保存
-    analytics.insert_temperature_humidity(ceiling, floor, outdoor, study, bedroom.temperature_humidity)
-    analytics.insert_co2_sensor_data(bedroom)
-    analytics.insert_surface_temperature(pmv.wall, pmv.ceiling, pmv.floor)
-    analytics.insert_pmv(pmv.pmv, pmv.met, pmv.clo, pmv.air)
+    # 結果を保存（デバイスの操作が済んでから、アウトボックスを経由してテーブルごとにまとめて書き込む）
+    queue = WriteBehindQueue()
+    # キャッシュで代用した値は取得済みのため記録しない
+    analytics.insert_temperature_humidity(
+        ceiling,
+        floor,
+        outdoor,
+        study,
+        bedroom.temperature_humidity,
+        queue=queue,
+        clock=tick_clock,
+        degraded=snapshot.degraded,
+    )
+    if "bedroom" not in snapshot.degraded:
+        analytics.insert_co2_sensor_data(bedroom, queue=queue, clock=tick_clock)
+    analytics.insert_surface_temperature(pmv.wall, pmv.ceiling, pmv.floor, queue=queue, clock=tick_clock)
+    analytics.insert_pmv(pmv.pmv, pmv.met, pmv.clo, pmv.air, queue=queue, clock=tick_clock)
     if ac_settings_changed:
-        analytics.insert_aircon_setting(aircon_setting)
+        analytics.insert_aircon_setting(aircon_setting, queue=queue, clock=tick_clock)
     else:
-        analytics.insert_aircon_setting(aircon_setting, aircon_last_setting_time)
-    analytics.insert_circulator_setting(fan_speed, power)
-    analytics.register_yesterday_intensity_score()
-    # analytics.register_last_month_intensity_scores()
+        analytics.insert_aircon_setting(aircon_setting, aircon_last_setting_time, queue=queue, clock=tick_clock)
+    analytics.insert_circulator_setting(fan_speed, power, queue=queue, clock=tick_clock)
+    queue.defer("aircon_intensity_scores", lambda: analytics.register_yesterday_intensity_score(tick_clock))
+    LoggerUtil.log_staging_latencies(queue.flush(analytics.stage_rows))
+    LoggerUtil.log_write_latencies(analytics.sync_outbox())
+    QuotaBudgeter.flush()
+    # analytics.register_last_month_intensity_scores(tick_clock)
 
     return True
 
 
 # メイン関数を呼び出す
 if __name__ == "__main__":
-    main()
+    # 常駐実行（home_climate_daemon.py）とティックが重ならないよう、同じロックを取得してから実行する
+    with tick_lock() as acquired:
+        if acquired:
+            main()
+        else:
+            LoggerUtil.log_locked_tick()
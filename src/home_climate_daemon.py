@@ -0,0 +1,65 @@
+import argparse
+import signal
+
+from api.switchbot_api import SwitchBotTransport
+from api.switchbot_quota import QuotaBudgeter
+from api.switchbot_webhook import LatestStateTable, WebhookServer
+from common.config import Config
+from util.logger import logger
+from util.clock import SystemClock
+from util.tick_scheduler import TickScheduler
+import home_climate_control
+
+# 制御ループの実行間隔の既定値（秒）。cronの「*/10」に合わせて10分。HOME_CLIMATE_TICK_INTERVALで変更できる
+DEFAULT_TICK_INTERVAL = 600
+
+SYSTEM_CLOCK = SystemClock()
+
+
+def run_tick(state_table=None) -> None:
+    """
+    制御ループを1回実行します。現在時刻はティックごとに取り直します。
+
+    Args:
+        state_table (Optional[LatestStateTable]): Webhookで受信したセンサーの最新値
+    """
+    home_climate_control.main(state_table=state_table, clock=SYSTEM_CLOCK)
+
+
+def main() -> None:
+    """
+    制御ループを常駐して一定の間隔で実行します。
+    """
+    parser = argparse.ArgumentParser(description="制御ループを常駐して一定の間隔で実行します")
+    tick_interval = Config.get_int("HOME_CLIMATE_TICK_INTERVAL", DEFAULT_TICK_INTERVAL)
+    parser.add_argument("--interval", type=float, default=tick_interval, help="ティックの間隔（秒）")
+    parser.add_argument("--no-align", action="store_true", help="予定を時刻の区切りに揃えず、起動直後から実行する")
+    parser.add_argument("--webhook-port", type=int, default=None, help="指定した場合、このポートでWebhookを受信する")
+    parser.add_argument("--max-ticks", type=int, default=None, help="実行するティックの最大数")
+    args = parser.parse_args()
+
+    state_table = None
+    webhook_server = None
+    if args.webhook_port is not None:
+        state_table = LatestStateTable()
+        webhook_server = WebhookServer(state_table, port=args.webhook_port)
+        webhook_server.start()
+
+    scheduler = TickScheduler(lambda: run_tick(state_table), args.interval, align=not args.no_align)
+    # 停止のシグナルを受けたら、実行中のティックを終えてから終了する
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+    signal.signal(signal.SIGINT, lambda *_: scheduler.stop())
+
+    logger.info(f"制御ループを{args.interval:.0f}秒間隔で常駐実行します")
+    try:
+        scheduler.run(max_ticks=args.max_ticks)
+    finally:
+        if webhook_server is not None:
+            webhook_server.stop()
+        SwitchBotTransport.close()
+        QuotaBudgeter.flush()
+        logger.info(f"制御ループを終了しました（超過 {scheduler.overruns}回、見送り {scheduler.skipped}回）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import secrets
+import time
+
+import requests
+
+from api.switchbot_webhook import LatestStateTable, WebhookServer
+
+
+def load_payloads(path: str) -> list:
+    """
+    記録したWebhookのJSONを1行ずつ読み込みます。
+
+    Args:
+        path (str): WebhookServerのrecord_pathで記録したファイル
+
+    Returns:
+        list: 記録されたJSONのリスト
+    """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(path: str, interval: float = 0.0) -> LatestStateTable:
+    """
+    記録したWebhookをローカルのWebhookServerへ再送し、取り込み後の最新値テーブルを返します。
+
+    実際のSwitchBotクラウドの代わりに、HTTPを介して受信から取り込みまでを検証するために使います。
+
+    Args:
+        path (str): 記録したWebhookのファイル
+        interval (float, optional): 再送の間隔（秒）
+
+    Returns:
+        LatestStateTable: 取り込み後の最新値テーブル
+    """
+    table = LatestStateTable()
+    token = secrets.token_urlsafe()
+    server = WebhookServer(table, port=0, host="127.0.0.1", token=token)
+    server.start()
+    try:
+        with requests.Session() as session:
+            for payload in load_payloads(path):
+                response = session.post(f"http://127.0.0.1:{server.port}/", params={"token": token}, json=payload)
+                response.raise_for_status()
+                time.sleep(interval)
+    finally:
+        server.stop()
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="記録したSwitchBotのWebhookを再送します")
+    parser.add_argument("path", help="WebhookServerで記録したJSON Linesファイル")
+    parser.add_argument("--interval", type=float, default=0.0, help="再送の間隔（秒）")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.path)
+    table = replay(args.path, args.interval)
+    for device_mac in sorted({p.get("context", {}).get("deviceMac", "") for p in payloads} - {""}):
+        device_id = device_mac.replace(":", "").upper()
+        print(f"{device_id}: {table.get(device_id, table.latest_received_at(device_id))}")
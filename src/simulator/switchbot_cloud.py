@@ -0,0 +1,296 @@
+import dataclasses
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import common.constants as constants
+
+# 1秒の実時間で進めるシミュレーション上の時間（秒）
+DEFAULT_TIME_SCALE = 60.0
+
+
+@dataclasses.dataclass
+class LatencyModel:
+    """
+    応答遅延の分布を表すデータクラス。
+
+    遅延は対数正規分布に従い、一定の確率で大きな遅延（スパイク）が発生します。
+
+    Attributes:
+        median (float): 遅延の中央値（秒）。
+        sigma (float): 対数正規分布の形状パラメータ。大きいほど裾が長くなります。
+        spike_rate (float): スパイクが発生する確率（0〜1）。
+        spike_latency (float): スパイク時の遅延（秒）。
+        error_rate (float): HTTP 500を返す確率（0〜1）。
+    """
+
+    median: float = 0.15
+    sigma: float = 0.5
+    spike_rate: float = 0.0
+    spike_latency: float = 5.0
+    error_rate: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        遅延を1つ生成します。
+
+        Args:
+            rng (random.Random): 乱数生成器
+
+        Returns:
+            float: 遅延（秒）
+        """
+        if rng.random() < self.spike_rate:
+            return self.spike_latency
+        return self.median * math.exp(rng.gauss(0, self.sigma))
+
+
+@dataclasses.dataclass
+class RoomState:
+    """
+    シミュレーション上の部屋の状態を表すデータクラス。
+
+    Attributes:
+        temperature (float): 室温。
+        humidity (float): 相対湿度。
+        co2 (float): CO2濃度（ppm）。
+    """
+
+    temperature: float
+    humidity: float
+    co2: float = 600.0
+
+
+class ThermalModel:
+    """
+    室温、外気温、エアコン、サーキュレーターの状態を簡易的に模擬するクラス。
+
+    室温は外気温に向かって緩やかに変化し、エアコンが冷房・暖房の場合は設定温度に向かって変化します。
+    天井と床の温度差はサーキュレーターの風量が大きいほど小さくなります。
+    """
+
+    # 外気への熱損失係数（1/時間）
+    LOSS_COEFFICIENT = 0.1
+    # エアコンによる温度変化係数（1/時間）
+    AIRCON_COEFFICIENT = 0.8
+    # サーキュレーター停止時の天井と床の温度差
+    STRATIFICATION = 3.0
+
+    def __init__(self, time_scale: float = DEFAULT_TIME_SCALE, outdoor_mean: float = 28.0, seed: int = 0):
+        self.time_scale = time_scale
+        self.outdoor_mean = outdoor_mean
+        self.room = RoomState(temperature=27.0, humidity=60.0)
+        self.aircon = {"temperature": 26.0, "mode": constants.AirconMode.FAN.id, "power": "off", "powerful": False}
+        self.circulator = {"power": "off", "speed": 0}
+        self._sim_seconds = 0.0
+        self._updated = time.monotonic()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _advance(self) -> None:
+        """
+        前回の更新からの経過時間だけ状態を進めます。ロックを取得した状態で呼び出してください。
+        """
+        now = time.monotonic()
+        hours = (now - self._updated) * self.time_scale / 3600
+        self._updated = now
+        self._sim_seconds += hours * 3600
+
+        self.room.temperature += (self.outdoor_temperature() - self.room.temperature) * self.LOSS_COEFFICIENT * hours
+        if self.aircon["power"] == "on" and self.aircon["mode"] in (
+            constants.AirconMode.COOLING.id,
+            constants.AirconMode.HEATING.id,
+        ):
+            coefficient = self.AIRCON_COEFFICIENT * (2 if self.aircon["powerful"] else 1)
+            self.room.temperature += (self.aircon["temperature"] - self.room.temperature) * coefficient * hours
+        self.room.co2 += (420 - self.room.co2) * 0.2 * hours + self._rng.gauss(0, 5)
+
+    def outdoor_temperature(self) -> float:
+        """
+        外気温を取得します。1日周期で変化し、15時頃に最高になります。
+
+        Returns:
+            float: 外気温
+        """
+        hour = (self._sim_seconds / 3600 + 12) % 24
+        return self.outdoor_mean + 5 * math.cos((hour - 15) / 24 * 2 * math.pi)
+
+    def read(self, role: str) -> Dict:
+        """
+        指定した役割のセンサーの値を取得します。
+
+        Args:
+            role (str): センサーの役割（"ceiling"、"floor"、"study"、"outdoor"、"bedroom"）
+
+        Returns:
+            Dict: ステータスAPIのbody部分
+        """
+        with self._lock:
+            self._advance()
+            spread = self.STRATIFICATION / (1 + self.circulator["speed"])
+            temperature = {
+                "ceiling": self.room.temperature + spread / 2,
+                "floor": self.room.temperature - spread / 2,
+                "study": self.room.temperature + 0.5,
+                "bedroom": self.room.temperature - 0.3,
+                "outdoor": self.outdoor_temperature(),
+            }[role]
+            body = {
+                "temperature": round(temperature + self._rng.gauss(0, 0.1), 1),
+                "humidity": round(self.room.humidity + self._rng.gauss(0, 1)),
+            }
+            if role == "bedroom":
+                body["CO2"] = int(self.room.co2)
+            return body
+
+    def command(self, role: str, command: str, parameter: str) -> None:
+        """
+        指定した役割のデバイスへのコマンドを状態に反映します。
+
+        Args:
+            role (str): デバイスの役割（"aircon"、"aircon_support"、"circulator"）
+            command (str): コマンド
+            parameter (str): コマンドのパラメータ
+        """
+        with self._lock:
+            self._advance()
+            if role == "aircon" and command == "setAll":
+                temperature, mode, _, power = parameter.split(",")
+                self.aircon.update(temperature=float(temperature), mode=mode, power=power, powerful=False)
+            elif role == "aircon_support":
+                cooling = command == constants.AirconMode.POWERFUL_COOLING.description
+                self.aircon.update(
+                    mode=constants.AirconMode.COOLING.id if cooling else constants.AirconMode.HEATING.id,
+                    temperature=22.0 if cooling else 29.0,
+                    power="on",
+                    powerful=True,
+                )
+            elif role == "circulator":
+                if command == constants.CirculatorPower.ON.id:
+                    on = self.circulator["power"] == "off"
+                    self.circulator.update(power="on" if on else "off", speed=self.circulator["speed"] if on else 0)
+                elif command == constants.CirculatorFanSpeed.UP.value:
+                    self.circulator["speed"] += 1
+                elif command == constants.CirculatorFanSpeed.DOWN.value:
+                    self.circulator["speed"] = max(0, self.circulator["speed"] - 1)
+
+
+class SwitchBotCloudSimulator:
+    """
+    SwitchBotクラウドの/v1.1/devicesのステータス取得とコマンド送信を模擬するローカルHTTPサーバー。
+
+    実機なしでswitchbot_apiやAircon、Circulatorを動かし、I/O経路のスループットや遅延の裾を計測するために使います。
+
+    Attributes:
+        devices (Dict[str, str]): デバイスIDと役割の対応。
+        latency (LatencyModel): 応答遅延の分布。
+        thermal (ThermalModel): 部屋とデバイスの状態。
+        request_count (int): 受け付けたリクエスト数。
+    """
+
+    _PATH = re.compile(r"^/v1\.1/devices/([^/]+)/(status|commands)$")
+
+    def __init__(
+        self,
+        devices: Dict[str, str],
+        latency: Optional[LatencyModel] = None,
+        thermal: Optional[ThermalModel] = None,
+        port: int = 0,
+        seed: int = 0,
+    ):
+        self.devices = devices
+        self.latency = latency or LatencyModel()
+        self.thermal = thermal or ThermalModel(seed=seed)
+        self.request_count = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """
+        シミュレーターのベースURL（SWITCHBOT_BASE_URLに設定する値）。
+        """
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        simulator = self
+
+        class SimulatorHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, status: int, body: Dict) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, kind: str, payload: Optional[Dict]) -> None:
+                match = SwitchBotCloudSimulator._PATH.match(self.path)
+                role = simulator.devices.get(match.group(1)) if match else None
+                if match is None or match.group(2) != kind or role is None:
+                    self._respond(404, {"statusCode": 152, "message": "device not found"})
+                    return
+
+                delay, failed = simulator._sample()
+                time.sleep(delay)
+                if failed:
+                    self._respond(500, {"statusCode": 500, "message": "simulated error"})
+                    return
+
+                if kind == "status":
+                    body = simulator.thermal.read(role)
+                else:
+                    simulator.thermal.command(role, payload.get("command", ""), payload.get("parameter", ""))
+                    body = {}
+                self._respond(200, {"statusCode": 100, "body": body, "message": "success"})
+
+            def do_GET(self):
+                self._handle("status", None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self._handle("commands", json.loads(self.rfile.read(length) or b"{}"))
+
+            def log_message(self, format, *args):
+                # アクセスログは出力しない
+                pass
+
+        return SimulatorHandler
+
+    def _sample(self):
+        """
+        1リクエスト分の遅延とエラーの有無を生成します。
+
+        Returns:
+            Tuple[float, bool]: 遅延（秒）とエラーにするかどうか
+        """
+        with self._lock:
+            self.request_count += 1
+            return self.latency.sample(self._rng), self._rng.random() < self.latency.error_rate
+
+    def start(self) -> None:
+        """
+        バックグラウンドのスレッドで待ち受けを開始します。
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="switchbot-simulator", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        待ち受けを停止します。
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
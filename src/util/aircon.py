@@ -1,6 +1,8 @@
 import datetime
+from typing import List, Optional, Tuple
 from common.data_types import AirconSetting, PMVCalculation, TemperatureHumidity
 import common.constants as constants
+from util.clock import Clock, current_time
 from util.time import TimeUtil
 from util.logger import logger
 import api.switchbot_api as switchbot_api
@@ -18,6 +20,25 @@ class Aircon:
         absolute_humidity: float,
         dew_point: float,
     ):
+        setting, reasons = Aircon.decide_aircon_setting(
+            pmvCalculation, floor_temperature, study_temperature, outdoor_temperature, absolute_humidity, dew_point
+        )
+        for reason in reasons:
+            logger.info(reason)
+        return setting
+
+    # エアコンの設定を決める関数（ログを出力しないため、適用しない候補の評価にも使える）
+    @staticmethod
+    def decide_aircon_setting(
+        pmvCalculation: PMVCalculation,
+        floor_temperature: float,
+        study_temperature: float,
+        outdoor_temperature: float,
+        absolute_humidity: float,
+        dew_point: float,
+    ) -> Tuple[AirconSetting, List[str]]:
+        # 設定を決めた理由（set_airconでログに出力する）
+        reasons = []
         # 初期値の設定
         setting = AirconSetting("", "", constants.AirconFanSpeed.AUTO, constants.AirconPower.ON)
         pmv = pmvCalculation.pmv
@@ -96,7 +117,7 @@ class Aircon:
         if setting.mode_setting == constants.AirconMode.FAN:
             # 絶対湿度が12.5以上の場合は除湿運転
             if absolute_humidity > 12.5:
-                logger.info("絶対湿度が12.5以上")
+                reasons.append("絶対湿度が12.5以上")
                 setting.temp_setting = "26"
                 setting.mode_setting = constants.AirconMode.DRY
                 setting.fan_speed_setting = constants.AirconFanSpeed.HIGH
@@ -110,32 +131,30 @@ class Aircon:
         # 室内温度が露点温度より低い場合は送風
         if floor_temperature < dew_point - 1:
             if pmv > 0.4:
-                logger.info("室内温度が露点温度より低いが、暑すぎる場合は冷房")
+                reasons.append("室内温度が露点温度より低いが、暑すぎる場合は冷房")
                 setting.temp_setting = "26"
                 setting.mode_setting = constants.AirconMode.COOLING
                 setting.fan_speed_setting = constants.AirconFanSpeed.HIGH
                 setting.force_fan_below_dew_point = True
             else:
-                logger.info("室内温度が露点温度より低い場合は送風")
+                reasons.append("室内温度が露点温度より低い場合は送風")
                 setting.temp_setting = "28"
                 setting.mode_setting = constants.AirconMode.FAN
                 setting.fan_speed_setting = constants.AirconFanSpeed.HIGH
                 setting.force_fan_below_dew_point = True
         
-        return setting
+        return setting, reasons
 
     # エアコンの設定を更新するかどうかを判断
     @staticmethod
-    def should_update_aircon_settings(last_setting_time):
+    def should_update_aircon_settings(last_setting_time, clock: Optional[Clock] = None):
         # 3時間以上経過している場合は更新しない
-        return TimeUtil.get_current_time() - TimeUtil.parse_datetime_string(last_setting_time) > datetime.timedelta(
-            hours=3
-        )
+        return current_time(clock) - TimeUtil.parse_datetime_string(last_setting_time) > datetime.timedelta(hours=3)
 
     # エアコンの設定を変更
     @staticmethod
-    def update_aircon_settings(aircon_setting):
-        switchbot_api.aircon(aircon_setting)
+    def update_aircon_settings(aircon_setting, clock: Optional[Clock] = None):
+        switchbot_api.aircon(aircon_setting, clock)
 
     # エアコンの設定を更新するかどうかを判断
     @staticmethod
@@ -143,18 +162,19 @@ class Aircon:
         aircon_setting: AirconSetting,
         current_aircon_setting: AirconSetting,
         last_setting_time: str,
+        clock: Optional[Clock] = None,
     ):
         #露点温度に近い場合は強制的に送風
         if aircon_setting.force_fan_below_dew_point:
-            Aircon.update_aircon_settings(aircon_setting)
+            Aircon.update_aircon_settings(aircon_setting, clock)
             return True
 
         # エアコンの設定を最後に変更した時間と現在の時間を比較して、
         # 1時間以上経過しているかどうかをチェックします。
-        if Aircon.should_update_aircon_settings(last_setting_time):
+        if Aircon.should_update_aircon_settings(last_setting_time, clock):
             # もし3時間以上経過していれば、新しい設定を適用します。
             logger.info("3時間経過したので、設定を変更します")
-            Aircon.update_aircon_settings(aircon_setting)
+            Aircon.update_aircon_settings(aircon_setting, clock)
             return True
         else:
             # もし1時間以内であれば、現在のエアコンのモードを確認します。
@@ -171,7 +191,7 @@ class Aircon:
                         constants.AirconMode.POWERFUL_COOLING.id,
                     ]:
                         logger.info("冷房を継続しつつ、設定を変更します")
-                        Aircon.update_aircon_settings(aircon_setting)
+                        Aircon.update_aircon_settings(aircon_setting, clock)
                         return False
                     else:
                         logger.info("冷房を継続しつつ、最弱の設定にします")
@@ -179,7 +199,7 @@ class Aircon:
                         aircon_setting.mode_setting = constants.AirconMode.COOLING
                         #aircon_setting.fan_speed_setting = constants.AirconFanSpeed.HIGH
                         aircon_setting.fan_speed_setting = constants.AirconFanSpeed.AUTO
-                        Aircon.update_aircon_settings(aircon_setting)
+                        Aircon.update_aircon_settings(aircon_setting, clock)
                         return False
                 # モードが同じ場合でも、温度、ファン速度、電源のいずれかが異なる場合、
                 # 設定を更新します。
@@ -189,15 +209,15 @@ class Aircon:
                     or current_aircon_setting.power_setting.id != aircon_setting.power_setting.id
                 ):
                     logger.info("現在のモードを継続しつつ、設定を変更します")
-                    Aircon.update_aircon_settings(aircon_setting)
+                    Aircon.update_aircon_settings(aircon_setting, clock)
                     return False
             else:
                 # 現在のモードが冷房モードでない場合、
                 # 新しい設定を適用します。
-                Aircon.update_aircon_settings(aircon_setting)
+                Aircon.update_aircon_settings(aircon_setting, clock)
                 return True
         
         # 設定を変更しない場合、Falseを返します。
         logger.info("false")
-        Aircon.update_aircon_settings(aircon_setting)
+        Aircon.update_aircon_settings(aircon_setting, clock)
         return False
@@ -1,14 +1,107 @@
-from typing import Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import datetime
 from api.jma_forecast import WeatherData
 from common.data_types import AirconSetting, CO2SensorData, TemperatureHumidity
 import common.constants as constants
 from util.aircon_intensity_calculator import AirconIntensityCalculator
+from util.clock import Clock, current_time as get_current_time
+from util.device_shadow import DeviceShadow
+from util.intensity_aggregator import IntensityAggregator, score_day
+from util.local_state import load_json, save_json
+from util.outbox import Outbox
+from util.rollup import Rollup
 from util.supabase_client import SupabaseClient
+from util.table_reader import iter_chunks, iter_rows
 from util.time import TimeUtil
+from util.write_behind import WriteBehindQueue
 from collections import defaultdict
 
 
+# 複数行をまとめてデータベースに挿入
+def insert_rows(table: str, rows: List[Dict]):
+    """
+    複数行を1回のリクエストでデータベースに挿入します。
+
+    Args:
+        table (str): 挿入先のテーブル名。
+        rows (List[Dict]): 挿入する行のリスト。
+
+    Returns:
+        APIResponse: 挿入結果の情報が含まれる。
+    """
+    return SupabaseClient.get_supabase().from_(table).insert(rows).execute()
+
+
+def _fetch_existing_rows(table: str, column: str, values: List[str]) -> List[Dict]:
+    """
+    指定した列の値が一致する行をデータベースから取得します。アウトボックスの再送時の重複確認に使います。
+
+    Args:
+        table (str): テーブル名。
+        column (str): 列名（created_at、または作成日時のないテーブルでは行を特定できる列）。
+        values (List[str]): 値のリスト。
+
+    Returns:
+        List[Dict]: 登録済みの行のリスト。
+    """
+    return SupabaseClient.get_supabase().table(table).select("*").in_(column, values).execute().data
+
+
+def stage_rows(table: str, rows: List[Dict]) -> None:
+    """
+    行をアウトボックスに追加し、時間ごと・日ごとの集計に加えます。データベースへの送信はsync_outboxで行います。
+
+    Args:
+        table (str): 挿入先のテーブル名。
+        rows (List[Dict]): 挿入する行のリスト。
+    """
+    Outbox.get_outbox().enqueue(table, rows)
+    Rollup.get_rollup().record(table, rows)
+
+
+def sync_outbox() -> Dict[str, float]:
+    """
+    アウトボックスに溜まった行をテーブルごとにまとめてデータベースへ送信します。
+    データベースに接続できない場合、行はアウトボックスに残り、次回の同期で送信されます。
+
+    Returns:
+        Dict[str, float]: テーブルごとの送信の所要時間（秒）。
+    """
+    return Outbox.get_outbox().sync(insert_rows, _fetch_existing_rows)
+
+
+def _pending_rows(table: str, column: str, value: str) -> List[Dict]:
+    """
+    アウトボックスに残っている未同期の行のうち、指定した列の値が一致するものを取得します。
+
+    Args:
+        table (str): テーブル名。
+        column (str): 列名。
+        value (str): 値。
+
+    Returns:
+        List[Dict]: 未同期の行のリスト。
+    """
+    return [row for row in Outbox.get_outbox().pending(table) if row.get(column) == value]
+
+
+def _write(table: str, rows: List[Dict], queue: Optional[WriteBehindQueue]) -> None:
+    """
+    行を書き込みます。行は必ずアウトボックスを経由してデータベースへ送信されます。
+    キューが指定された場合はキューに追加し、ティックの最後にまとめて書き込みます。
+    アウトボックスに追加するだけで、データベースへの送信はティックの最後のsync_outboxで行います。
+
+    Args:
+        table (str): 挿入先のテーブル名。
+        rows (List[Dict]): 挿入する行のリスト。
+        queue (Optional[WriteBehindQueue]): 書き込みを遅延させるキュー。
+    """
+    if queue is not None:
+        queue.add(table, rows)
+        return
+    stage_rows(table, rows)
+
+
 # 温度情報をデータベースに挿入
 def insert_temperature(location_id: int, temperature: float, created_at: datetime):
     """
@@ -18,17 +111,9 @@ def insert_temperature(location_id: int, temperature: float, created_at: datetim
         location_id (int): 温度情報の位置ID。
         temperature (float): 温度情報。
         created_at (datetime): 温度情報の作成日時。
-
-    Returns:
-        APIResponse: 挿入結果の情報が含まれる。
     """
-    result = (
-        SupabaseClient.get_supabase()
-        .from_("temperatures")
-        .insert([{"location_id": location_id, "temperature": temperature, "created_at": created_at.isoformat()}])
-        .execute()
-    )
-    return result
+    row = {"location_id": location_id, "temperature": temperature, "created_at": created_at.isoformat()}
+    _write("temperatures", [row], None)
 
 
 # 湿度情報をデータベースに挿入
@@ -40,17 +125,9 @@ def insert_humidity(location_id: int, humidity: float, created_at: datetime):
         location_id (int): 湿度情報の位置ID。
         humidity (float): 湿度情報。
         created_at (datetime): 湿度情報の作成日時。
-
-    Returns:
-        APIResponse: 挿入結果の情報が含まれる。
     """
-    result = (
-        SupabaseClient.get_supabase()
-        .from_("humidities")
-        .insert([{"location_id": location_id, "humidity": humidity, "created_at": created_at.isoformat()}])
-        .execute()
-    )
-    return result
+    row = {"location_id": location_id, "humidity": humidity, "created_at": created_at.isoformat()}
+    _write("humidities", [row], None)
 
 
 def insert_co2_level(location_id: int, co2: int, created_at: datetime):
@@ -61,21 +138,19 @@ def insert_co2_level(location_id: int, co2: int, created_at: datetime):
         location_id (int): CO2濃度情報の位置ID。
         co2_level (int): CO2濃度情報（ppm）。
         created_at (datetime): CO2濃度情報の作成日時。
-
-    Returns:
-        APIResponse: 挿入結果の情報が含まれる。
     """
-    result = (
-        SupabaseClient.get_supabase()
-        .from_("co2_levels")  # CO2濃度を格納するテーブル名
-        .insert([{"location_id": location_id, "co2_level": co2, "created_at": created_at.isoformat()}])
-        .execute()
-    )
-    return result
+    row = {"location_id": location_id, "co2_level": co2, "created_at": created_at.isoformat()}
+    _write("co2_levels", [row], None)  # CO2濃度を格納するテーブル名
 
 
 # 表面温度情報をデータベースに挿入
-def insert_surface_temperature(wall_temp: float, ceiling_temp: float, floor_temp: float):
+def insert_surface_temperature(
+    wall_temp: float,
+    ceiling_temp: float,
+    floor_temp: float,
+    queue: Optional[WriteBehindQueue] = None,
+    clock: Optional[Clock] = None,
+):
     """
     表面温度情報をデータベースに挿入します。
 
@@ -83,30 +158,27 @@ def insert_surface_temperature(wall_temp: float, ceiling_temp: float, floor_temp
         wall_temp (float): 壁の表面温度情報。
         ceiling_temp (float): 天井の表面温度情報。
         floor_temp (float): 床の表面温度情報。
-
-    Returns:
-        APIResponse: 挿入結果の情報が含まれる。
-    """
-    result = (
-        SupabaseClient.get_supabase()
-        .from_("surface_temperatures")
-        .insert(
-            [
-                {
-                    "wall": wall_temp,
-                    "ceiling": ceiling_temp,
-                    "floor": floor_temp,
-                    "created_at": TimeUtil.get_current_time().isoformat(),
-                }
-            ]
-        )
-        .execute()
-    )
-    return result
+        queue (Optional[WriteBehindQueue]): 書き込みを遅延させるキュー。
+        clock (Optional[Clock]): 記録日時を取得する時計。Noneの場合はTimeUtilの現在時刻。
+    """
+    row = {
+        "wall": wall_temp,
+        "ceiling": ceiling_temp,
+        "floor": floor_temp,
+        "created_at": get_current_time(clock).isoformat(),
+    }
+    _write("surface_temperatures", [row], queue)
 
 
 # PMV情報をデータベースに挿入
-def insert_pmv(pmv: float, met: float, clo: float, air: float):
+def insert_pmv(
+    pmv: float,
+    met: float,
+    clo: float,
+    air: float,
+    queue: Optional[WriteBehindQueue] = None,
+    clock: Optional[Clock] = None,
+):
     """
     PMV情報をデータベースに挿入します。
 
@@ -115,36 +187,33 @@ def insert_pmv(pmv: float, met: float, clo: float, air: float):
         met (float): MET値。
         clo (float): CLO値。
         air (float): 空気速度値。
-
-    Returns:
-        APIResponse: 挿入結果の情報が含まれる。
+        queue (Optional[WriteBehindQueue]): 書き込みを遅延させるキュー。
+        clock (Optional[Clock]): 記録日時を取得する時計。Noneの場合はTimeUtilの現在時刻。
     """
-    result = (
-        SupabaseClient.get_supabase()
-        .from_("pmvs")
-        .insert(
-            [{"pmv": pmv, "met": met, "clo": clo, "air": air, "created_at": TimeUtil.get_current_time().isoformat()}]
-        )
-        .execute()
-    )
-    return result
+    row = {"pmv": pmv, "met": met, "clo": clo, "air": air, "created_at": get_current_time(clock).isoformat()}
+    _write("pmvs", [row], queue)
 
 
 # エアコン設定情報をデータベースに挿入
-def insert_aircon_setting(aircon_setting: AirconSetting, current_time: Optional[datetime.datetime] = None):
+def insert_aircon_setting(
+    aircon_setting: AirconSetting,
+    current_time: Optional[datetime.datetime] = None,
+    queue: Optional[WriteBehindQueue] = None,
+    clock: Optional[Clock] = None,
+):
     """
     エアコン設定をデータベースに挿入します。
 
     Args:
         aircon_setting (AirconSetting): エアコンの設定情報。
-
-    Returns:
-        APIResponse: 挿入結果の情報が含まれる。
+        current_time (Optional[datetime.datetime]): 設定日時。Noneの場合は現在の日時。
+        queue (Optional[WriteBehindQueue]): 書き込みを遅延させるキュー。
+        clock (Optional[Clock]): 現在の日時を取得する時計。Noneの場合はTimeUtilの現在時刻。
     """
-    supabase = SupabaseClient.get_supabase()
+    now = get_current_time(clock)
     # current_timeの設定がNoneの場合は現在の日時を設定
     if current_time is None:
-        current_time = TimeUtil.get_current_time().isoformat()
+        current_time = now.isoformat(timespec="microseconds")
 
     data = {
         "temperature": aircon_setting.temp_setting,
@@ -154,7 +223,9 @@ def insert_aircon_setting(aircon_setting: AirconSetting, current_time: Optional[
         "created_at": current_time,
     }
 
-    return supabase.from_("aircon_settings").insert([data]).execute()
+    _write("aircon_settings", [data], queue)
+    IntensityAggregator.record(data)
+    DeviceShadow.update_aircon(aircon_setting, current_time, now)
 
 
 # 最新のエアコン設定情報を取得
@@ -184,12 +255,85 @@ def get_latest_aircon_setting() -> Tuple[AirconSetting, datetime.datetime]:
     return aircon_setting, created_at
 
 
+def _latest_pending_row(table: str) -> Optional[Dict]:
+    """
+    アウトボックスに残っている未同期の行のうち、最も新しいものを取得します。
+    """
+    rows = Outbox.get_outbox().pending(table)
+    return rows[-1] if rows else None
+
+
+# エアコンの現在の設定を取得
+def get_current_aircon_setting(clock: Optional[Clock] = None) -> Tuple[AirconSetting, str]:
+    """
+    エアコンの現在の設定を取得します。
+
+    通常はデバイスシャドウの値を使い、シャドウが無いか古い場合のみデータベースと照合します。
+    照合時はアウトボックスに残っている未同期の設定を優先します。
+
+    Args:
+        clock (Optional[Clock]): シャドウの鮮度の判定に使う時計。Noneの場合はTimeUtilの現在時刻。
+
+    Returns:
+        Tuple[AirconSetting, str]: エアコンの設定と設定日時のタプル。
+    """
+    now = get_current_time(clock)
+    shadow = DeviceShadow.get_aircon(now)
+    if shadow is not None:
+        return shadow
+
+    pending = _latest_pending_row("aircon_settings")
+    if pending is not None:
+        aircon_setting = AirconSetting(
+            temp_setting=str(pending["temperature"]),
+            mode_setting=constants.AirconMode.get_by_id(pending["mode"]),
+            fan_speed_setting=constants.AirconFanSpeed.get_by_id(str(pending["fan_speed"])),
+            power_setting=constants.AirconPower.get_by_id(pending["power"]),
+        )
+        created_at = pending["created_at"]
+    else:
+        aircon_setting, created_at = get_latest_aircon_setting()
+    DeviceShadow.update_aircon(aircon_setting, created_at, now)
+    return aircon_setting, created_at
+
+
+# サーキュレーターの現在の設定を取得
+def get_current_circulator_setting(clock: Optional[Clock] = None) -> Tuple[str, str]:
+    """
+    サーキュレーターの現在の電源設定と風速設定を取得します。
+
+    通常はデバイスシャドウの値を使い、シャドウが無いか古い場合のみデータベースと照合します。
+    照合時はアウトボックスに残っている未同期の設定を優先します。
+
+    Args:
+        clock (Optional[Clock]): シャドウの鮮度の判定に使う時計。Noneの場合はTimeUtilの現在時刻。
+
+    Returns:
+        Tuple[str, str]: 電源設定と風速設定のタプル。
+    """
+    now = get_current_time(clock)
+    shadow = DeviceShadow.get_circulator(now)
+    if shadow is not None:
+        return shadow
+
+    pending = _latest_pending_row("circulator_settings")
+    if pending is not None:
+        power, fan_speed = pending["power"], pending["fan_speed"]
+    else:
+        power, fan_speed = get_latest_circulator_setting()
+    DeviceShadow.update_circulator(power, fan_speed, now)
+    return power, fan_speed
+
+
 def insert_temperature_humidity(
     ceiling: TemperatureHumidity,
     floor: TemperatureHumidity,
     outdoor: TemperatureHumidity,
     study: TemperatureHumidity,
     bedroom: TemperatureHumidity,
+    queue: Optional[WriteBehindQueue] = None,
+    clock: Optional[Clock] = None,
+    degraded: Iterable[str] = (),
 ):
     """
     天井、床、外部の温度と湿度データをデータベースに挿入します。
@@ -200,52 +344,80 @@ def insert_temperature_humidity(
         outdoor (TemperatureHumidity): 外部の温度と湿度データ
         study (TemperatureHumidity): 書斎の温度と湿度データ
         bedroom (TemperatureHumidity): 寝室の温度と湿度データ
-    """
-    now = TimeUtil.get_current_time()
-    insert_temperature(constants.Location.FLOOR.id, floor.temperature, now)
-    insert_temperature(constants.Location.CEILING.id, ceiling.temperature, now)
-    insert_temperature(constants.Location.OUTDOOR.id, outdoor.temperature, now)
-    insert_temperature(constants.Location.STUDY.id, study.temperature, now)
-    insert_temperature(constants.Location.BEDROOM.id, bedroom.temperature, now)
-    insert_humidity(constants.Location.FLOOR.id, floor.humidity, now)
-    insert_humidity(constants.Location.CEILING.id, ceiling.humidity, now)
-    insert_humidity(constants.Location.OUTDOOR.id, outdoor.humidity, now)
-    insert_humidity(constants.Location.STUDY.id, study.humidity, now)
-    insert_humidity(constants.Location.BEDROOM.id, bedroom.humidity, now)
+        queue (Optional[WriteBehindQueue]): 書き込みを遅延させるキュー
+        clock (Optional[Clock]): 記録日時を取得する時計。Noneの場合はTimeUtilの現在時刻
+        degraded (Iterable[str]): キャッシュの値で代用したセンサー名。過去の値を現在の日時で重複して記録しないよう挿入しない
+    """
+    created_at = get_current_time(clock).isoformat()
+    # センサー名は場所の名前の小文字と同じ
+    readings = [
+        (location, reading)
+        for location, reading in (
+            (constants.Location.FLOOR, floor),
+            (constants.Location.CEILING, ceiling),
+            (constants.Location.OUTDOOR, outdoor),
+            (constants.Location.STUDY, study),
+            (constants.Location.BEDROOM, bedroom),
+        )
+        if location.name.lower() not in degraded
+    ]
+    if not readings:
+        return
+
+    # テーブルごとに1回のリクエストで全ての場所の値を挿入
+    _write(
+        "temperatures",
+        [
+            {"location_id": location.id, "temperature": reading.temperature, "created_at": created_at}
+            for location, reading in readings
+        ],
+        queue,
+    )
+    _write(
+        "humidities",
+        [
+            {"location_id": location.id, "humidity": reading.humidity, "created_at": created_at}
+            for location, reading in readings
+        ],
+        queue,
+    )
 
 
-def insert_co2_sensor_data(bedroom: CO2SensorData):
+def insert_co2_sensor_data(
+    bedroom: CO2SensorData, queue: Optional[WriteBehindQueue] = None, clock: Optional[Clock] = None
+):
     """
     CO2センサーのデータをデータベースに挿入します。
 
     Args:
         bedroom (CO2SensorData): 寝室のCO2センサーのデータ
+        queue (Optional[WriteBehindQueue]): 書き込みを遅延させるキュー
+        clock (Optional[Clock]): 記録日時を取得する時計。Noneの場合はTimeUtilの現在時刻
     """
-    now = TimeUtil.get_current_time()
+    now = get_current_time(clock)
 
     # CO2濃度を挿入
-    insert_co2_level(constants.Location.BEDROOM.id, bedroom.co2, now)
+    row = {"location_id": constants.Location.BEDROOM.id, "co2_level": bedroom.co2, "created_at": now.isoformat()}
+    _write("co2_levels", [row], queue)
 
 
 # サーキュレーター設定情報をデータベースに挿入
-def insert_circulator_setting(fan_speed: str, power: str):
+def insert_circulator_setting(
+    fan_speed: str, power: str, queue: Optional[WriteBehindQueue] = None, clock: Optional[Clock] = None
+):
     """
     サーキュレーターの風速と電源設定をデータベースに挿入します。
 
     Args:
         fan_speed (str): サーキュレーターの風速設定
         power (str): サーキュレーターの電源設定
-
-    Returns:
-        APIResponse: 挿入結果の情報が含まれる。
+        queue (Optional[WriteBehindQueue]): 書き込みを遅延させるキュー
+        clock (Optional[Clock]): 記録日時を取得する時計。Noneの場合はTimeUtilの現在時刻
     """
-    result = (
-        SupabaseClient.get_supabase()
-        .from_("circulator_settings")
-        .insert([{"fan_speed": fan_speed, "power": power, "created_at": TimeUtil.get_current_time().isoformat()}])
-        .execute()
-    )
-    return result
+    now = get_current_time(clock)
+    row = {"fan_speed": fan_speed, "power": power, "created_at": now.isoformat()}
+    _write("circulator_settings", [row], queue)
+    DeviceShadow.update_circulator(power, fan_speed, now)
 
 
 # 最新のサーキュレーター設定情報を取得
@@ -268,32 +440,22 @@ def get_latest_circulator_setting() -> Tuple[str, str]:
 
 
 # 日毎の最高気温をデータベースに挿入
-def insert_max_temperature(max_temperature: float):
+def insert_max_temperature(max_temperature: float, clock: Optional[Clock] = None):
     """
     日毎の最高気温をデータベースに挿入します。
 
     Args:
         recorded_date (str): 温度が記録された日付（YYYY-MM-DD形式）
         max_temperature (float): 最高気温（摂氏度）
-
-    Returns:
-        APIResponse: 挿入結果の情報が含まれる。
+        clock (Optional[Clock]): 記録日時を取得する時計。Noneの場合はTimeUtilの現在時刻
     """
-    result = (
-        SupabaseClient.get_supabase()
-        .from_("daily_max_temperatures")
-        .insert(
-            [
-                {
-                    "recorded_date": TimeUtil.get_current_time().date().isoformat(),
-                    "max_temperature": max_temperature,
-                    "created_at": TimeUtil.get_current_time().isoformat(),
-                }
-            ]
-        )
-        .execute()
-    )
-    return result
+    now = get_current_time(clock)
+    row = {
+        "recorded_date": now.date().isoformat(),
+        "max_temperature": max_temperature,
+        "created_at": now.isoformat(),
+    }
+    _write("daily_max_temperatures", [row], None)
 
 
 # 指定した日付の最高気温を取得
@@ -315,20 +477,25 @@ def get_max_temperature_by_date(recorded_date: str) -> Optional[Tuple[str, float
         .execute()
     )
 
-    if data.data:
-        return data.data[0]["recorded_date"], data.data[0]["max_temperature"]
+    # 未同期の行がアウトボックスに残っている場合はその値を使う
+    rows = data.data or _pending_rows("daily_max_temperatures", "recorded_date", recorded_date)
+    if rows:
+        return rows[0]["recorded_date"], rows[0]["max_temperature"]
     return None
 
 
-def get_or_insert_max_temperature() -> float:
+def get_or_insert_max_temperature(clock: Optional[Clock] = None) -> float:
     """
     現在の日付の最高気温を取得し、存在しない場合は新たに挿入します。
 
+    Args:
+        clock (Optional[Clock]): 現在の日付を取得する時計。Noneの場合はTimeUtilの現在時刻
+
     Returns:
         float: 最高気温の値
     """
     # 現在の日付を取得
-    recorded_date = TimeUtil.get_current_time().date().isoformat()
+    recorded_date = get_current_time(clock).date().isoformat()
 
     # 現在の日付の最高気温を取得
     result = get_max_temperature_by_date(recorded_date)
@@ -336,13 +503,80 @@ def get_or_insert_max_temperature() -> float:
     # 取得できなかった場合は挿入
     if result is None:
         max_temperature = WeatherData.get_max_temperature_by_date(recorded_date)
-        insert_max_temperature(max_temperature)
+        insert_max_temperature(max_temperature, clock)
         return max_temperature
 
     # 取得できた場合は、その値を返す
     return result[1]  # 最高気温の値を返す
 
 
+def _fetch_daily_aircon_settings(date: str) -> Iterator[Dict]:
+    """
+    指定した日付のエアコン設定を、設定日時の順にデータベースからページ単位で取得します。
+
+    Args:
+        date (str): YYYY-MM-DD形式の日付。
+
+    Yields:
+        Dict: aircon_settingsの行。
+    """
+    return iter_rows("aircon_settings", start=f"{date} 00:00:00", end=f"{date} 23:59:59")
+
+
+def _daily_aircon_settings_with_pending(date: str) -> List[Dict]:
+    """
+    指定した日付のエアコン設定を、データベースの行とアウトボックスの同期待ちの行を合わせて設定日時の順に取得します。
+    同期の途中で中断し、両方に存在する行は1件として扱います。
+
+    Args:
+        date (str): YYYY-MM-DD形式の日付。
+
+    Returns:
+        List[Dict]: aircon_settingsの行のリスト。
+    """
+    rows = {}
+    for row in [*_fetch_daily_aircon_settings(date), *Outbox.get_outbox().pending("aircon_settings")]:
+        created_at = datetime.datetime.fromisoformat(row["created_at"])
+        if score_day(created_at) == date:
+            rows.setdefault(created_at, row)
+    return [rows[created_at] for created_at in sorted(rows)]
+
+
+# 当日のエアコン設定の強度を取得
+def get_today_aircon_intensity(date: str, clock: Optional[Clock] = None) -> float:
+    """
+    指定した日付の、最後の設定の持続時間を含まない強度スコアを逐次集計から取得します。
+    集計していない日付の場合のみ、データベースとアウトボックスの同期待ちの行から1日分の設定を取得して集計します。
+
+    Args:
+        date (str): YYYY-MM-DD形式の日付。
+        clock (Optional[Clock]): 集計の開始日時を取得する時計。Noneの場合はTimeUtilの現在時刻。
+
+    Returns:
+        float: 指定日付の強度スコア。
+    """
+    score = IntensityAggregator.score(date)
+    if score is None:
+        IntensityAggregator.rebuild(date, _daily_aircon_settings_with_pending(date), get_current_time(clock))
+        score = IntensityAggregator.score(date)
+    return score
+
+
+def _end_of_day(date: str) -> datetime.datetime:
+    """
+    強度スコアの計算で、その日の最後の設定が続く終わりの日時を取得します。
+
+    Args:
+        date (str): YYYY-MM-DD形式の日付。
+
+    Returns:
+        datetime.datetime: 日の終わりの日時。
+    """
+    # タイムゾーンの定義（日本時間の例）
+    JST = TimeUtil.timezone()
+    return datetime.datetime.strptime(f"{date} 23:59:59", "%Y-%m-%d %H:%M:%S").replace(tzinfo=JST)
+
+
 # 指定した日付のエアコン設定の強度を取得
 def get_daily_aircon_intensity(date: str, calculate_last_duration: bool = True) -> int:
     """
@@ -355,22 +589,10 @@ def get_daily_aircon_intensity(date: str, calculate_last_duration: bool = True)
     Returns:
         int: 指定日付の強度スコア。
     """
-    data = (
-        SupabaseClient.get_supabase()
-        .table("aircon_settings")
-        .select("*")
-        .filter("created_at", "gte", f"{date} 00:00:00")
-        .filter("created_at", "lt", f"{date} 23:59:59")
-        .execute()
-    )
-
     intensity_by_mode = defaultdict(float)  # 各モードの強度スコアを格納
     last_setting = None
 
-    # タイムゾーンの定義（日本時間の例）
-    JST = TimeUtil.timezone()
-
-    for setting in data.data:
+    for setting in _fetch_daily_aircon_settings(date):
         aircon_setting = AirconSetting(
             temp_setting=str(setting["temperature"]),
             mode_setting=constants.AirconMode.get_by_id(setting["mode"]),
@@ -404,7 +626,7 @@ def get_daily_aircon_intensity(date: str, calculate_last_duration: bool = True)
 
     # 最後の設定の持続時間を計算するかどうか
     if calculate_last_duration and last_setting is not None:
-        end_of_day = datetime.datetime.strptime(f"{date} 23:59:59", "%Y-%m-%d %H:%M:%S").replace(tzinfo=JST)
+        end_of_day = _end_of_day(date)
         time_difference = (end_of_day - last_setting["created_at"]).total_seconds()
         intensity_score = AirconIntensityCalculator.calculate_intensity(
             temperature=float(last_setting["temperature"]),
@@ -428,16 +650,19 @@ def _save_intensity_score(date: str, score: int) -> None:
         date (str): YYYY-MM-DD形式の日付。
         score (int): エアコン設定の強度スコア。
     """
-    SupabaseClient.get_supabase().table("aircon_intensity_scores").insert(
-        {"record_date": date, "intensity_score": score}
-    ).execute()
+    _write("aircon_intensity_scores", [{"record_date": date, "intensity_score": score}], None)
+    # スコアが増えたので、キャッシュしている期間のスコアを取得し直す
+    save_json(INTENSITY_SCORES_CACHE_FILE_NAME, {})
 
 
-def register_yesterday_intensity_score() -> None:
+def register_yesterday_intensity_score(clock: Optional[Clock] = None) -> None:
     """
     昨日のエアコン強度スコアを計算し、DBに保存します。
+
+    Args:
+        clock (Optional[Clock]): 今日の日付を取得する時計。Noneの場合はTimeUtilの現在時刻。
     """
-    yesterday = (TimeUtil.get_current_time() - datetime.timedelta(days=1)).date()
+    yesterday = (get_current_time(clock) - datetime.timedelta(days=1)).date()
     date_str = yesterday.strftime("%Y-%m-%d")
 
     # 昨日のスコアをDBで確認
@@ -449,8 +674,8 @@ def register_yesterday_intensity_score() -> None:
         .execute()
     )
 
-    # スコアが既に登録されている場合、計算をスキップ
-    if existing_score.data:
+    # スコアが既に登録されている（または同期待ちの）場合、計算をスキップ
+    if existing_score.data or _pending_rows("aircon_intensity_scores", "record_date", date_str):
         print(f"{date_str} のスコアは既に登録されています。")
         return
 
@@ -463,35 +688,67 @@ def register_yesterday_intensity_score() -> None:
     # エアコンの強度スコアを取得する関数
 
 
-def get_aircon_intensity_scores(today: datetime.date) -> Tuple[int, int, int, int, int]:
+# 強度スコアのキャッシュのファイル名
+INTENSITY_SCORES_CACHE_FILE_NAME = "intensity_scores_cache.json"
+
+
+def _get_intensity_score_window(start_date: datetime.date, end_date: datetime.date, today: str) -> List[Dict]:
     """
-    先々週、先週、今週、昨日、今日のエアコンの強度スコアを取得します。
+    指定した期間の強度スコアを1回のクエリで取得します。過去のスコアは変化しないため、結果は当日中キャッシュします。
+    アウトボックスに同期待ちのスコアがある場合はそれを加え、同期されるまではキャッシュしません。
 
     Args:
-        today (datetime.date): 今日の日付。
+        start_date (datetime.date): 期間の開始日（この日を含む）。
+        end_date (datetime.date): 期間の終了日（この日を含まない）。
+        today (str): キャッシュの有効日（YYYY-MM-DD形式）。
 
     Returns:
-        Tuple[int, int, int, int, int]: 先々週、先週、今週、昨日、今日のスコア。
-    """
-
-    def calculate_average_score(start_date, end_date):
-        # スコア計算処理
-        data = (
+        List[Dict]: record_dateとintensity_scoreを含む行のリスト。
+    """
+    # 同期待ちのスコアはデータベースにまだ無いため、アウトボックスから補う
+    pending = [
+        {"record_date": row["record_date"], "intensity_score": row["intensity_score"]}
+        for row in Outbox.get_outbox().pending("aircon_intensity_scores")
+        if str(start_date) <= row["record_date"] < str(end_date)
+    ]
+    window = {"date": today, "start": str(start_date), "end": str(end_date)}
+    cache = load_json(INTENSITY_SCORES_CACHE_FILE_NAME, {})
+    if cache.get("window") == window:
+        rows = cache["rows"]
+    else:
+        rows = (
             SupabaseClient.get_supabase()
             .table("aircon_intensity_scores")
-            .select("intensity_score")
+            .select("record_date, intensity_score")
             .filter("record_date", "gte", str(start_date))
             .filter("record_date", "lt", str(end_date))
             .execute()
+            .data
         )
+        # 同期待ちのスコアがある間はキャッシュせず、同期された後に取得し直す
+        if not pending:
+            save_json(INTENSITY_SCORES_CACHE_FILE_NAME, {"window": window, "rows": rows})
+    registered = {row["record_date"] for row in rows}
+    return rows + [row for row in pending if row["record_date"] not in registered]
 
-        total_score = sum(item["intensity_score"] for item in data.data)
-        count = len(data.data)
 
-        # 平均スコアを小数点以下切り捨てで計算
-        if count > 0:
-            return int(total_score // count)  # 小数点以下切り捨て
-        return 0
+def get_aircon_intensity_scores(
+    today: datetime.date, clock: Optional[Clock] = None
+) -> Tuple[int, int, int, int, int]:
+    """
+    先々週、先週、今週、昨日、今日のエアコンの強度スコアを取得します。
+
+    先々週の初めから今日までのスコアを1回のクエリで取得し、各期間の平均はメモリ上で計算します。
+
+    Args:
+        today (datetime.date): 今日の日付。
+        clock (Optional[Clock]): 今日のスコアの集計に使う時計。Noneの場合はTimeUtilの現在時刻。
+
+    Returns:
+        Tuple[int, int, int, int, int]: 先々週、先週、今週、昨日、今日のスコア。
+    """
+    if isinstance(today, datetime.datetime):
+        today = today.date()
 
     # 日付の計算
     yesterday = today - datetime.timedelta(days=1)
@@ -502,55 +759,110 @@ def get_aircon_intensity_scores(today: datetime.date) -> Tuple[int, int, int, in
     this_week_start = today - datetime.timedelta(days=today.weekday())
     this_week_end = today + datetime.timedelta(days=1)
 
+    rows = _get_intensity_score_window(two_weeks_ago_start, this_week_end, str(today))
+
+    def calculate_average_score(start_date, end_date):
+        # スコア計算処理
+        scores = [
+            item["intensity_score"] for item in rows if str(start_date) <= item["record_date"] < str(end_date)
+        ]
+
+        # 平均スコアを小数点以下切り捨てで計算
+        if scores:
+            return int(sum(scores) // len(scores))  # 小数点以下切り捨て
+        return 0
+
     # スコアの計算
     last_two_weeks_score = calculate_average_score(two_weeks_ago_start, two_weeks_ago_end)
     last_week_score = calculate_average_score(last_week_start, last_week_end)
     this_week_score = calculate_average_score(this_week_start, this_week_end)
 
-    # 昨日のスコアをDBから取得
-    yesterday_score_data = (
-        SupabaseClient.get_supabase()
-        .table("aircon_intensity_scores")
-        .select("intensity_score")
-        .filter("record_date", "eq", str(yesterday))
-        .execute()
-    )
-    yesterday_score = int(yesterday_score_data.data[0]["intensity_score"]) if yesterday_score_data.data else 0
+    # 昨日のスコアを取得
+    yesterday_scores = [item["intensity_score"] for item in rows if item["record_date"] == str(yesterday)]
+    yesterday_score = int(yesterday_scores[0]) if yesterday_scores else 0
 
     # 今日のスコアを計算
-    today_score = int(get_daily_aircon_intensity(today.strftime("%Y-%m-%d"), False))
+    today_score = int(get_today_aircon_intensity(today.strftime("%Y-%m-%d"), clock))
 
     return last_two_weeks_score, last_week_score, this_week_score, yesterday_score, today_score
 
 
-def register_last_month_intensity_scores() -> None:
+def register_intensity_scores(start_date: datetime.date, end_date: datetime.date) -> Dict[str, float]:
     """
-    過去1ヶ月の各日付のエアコン強度スコアを計算し、DBに保存します。
-    """
-    current_date = TimeUtil.get_current_time().date()
-    start_date = current_date - datetime.timedelta(days=30)
+    指定した期間の各日付のエアコン強度スコアのうち、未登録のものをまとめて計算してDBに保存します。
 
-    for i in range(30):
-        target_date = start_date + datetime.timedelta(days=i)
-        date_str = target_date.strftime("%Y-%m-%d")
+    期間のエアコン設定をチャンク単位で順に取得し、日毎のスコアを配列演算でまとめて計算したうえで、
+    未登録の日付のスコアを1回の挿入で登録します。
 
-        # 指定日付のスコアをDBで確認
-        existing_score = (
-            SupabaseClient.get_supabase()
-            .table("aircon_intensity_scores")
-            .select("*")
-            .filter("record_date", "eq", date_str)
-            .execute()
+    Args:
+        start_date (datetime.date): 期間の初日（この日を含む）。
+        end_date (datetime.date): 期間の最終日（この日を含む）。
+
+    Returns:
+        Dict[str, float]: 登録した日付とスコアの辞書。
+    """
+    # 配列演算は一括登録でのみ使うため、制御ループの起動を遅くしないようここで読み込む
+    import numpy as np
+    from util.intensity_backfill import daily_intensity_totals, settings_to_arrays
+
+    days = [str(start_date + datetime.timedelta(days=i)) for i in range((end_date - start_date).days + 1)]
+
+    # 登録済み（または同期待ち）の日付を確認
+    existing = {
+        row["record_date"]
+        for row in iter_rows(
+            "aircon_intensity_scores",
+            "record_date",
+            key="record_date",
+            start=str(start_date),
+            end=str(end_date + datetime.timedelta(days=1)),
+        )
+    }
+    existing.update(row["record_date"] for row in Outbox.get_outbox().pending("aircon_intensity_scores"))
+    missing = [day for day in days if day not in existing]
+    if not missing:
+        return {}
+
+    # 未登録の日付を含む範囲のエアコン設定を設定日時の順に取得
+    first = datetime.date.fromisoformat(missing[0])
+    last = datetime.date.fromisoformat(missing[-1])
+    pages = [
+        settings_to_arrays(chunk)
+        for chunk in iter_chunks(
+            "aircon_settings",
+            "temperature, mode, fan_speed, power",
+            start=f"{first} 00:00:00",
+            end=f"{last + datetime.timedelta(days=1)} 00:00:00",
         )
+    ]
+    timestamps = np.concatenate([page[0] for page in pages]) if pages else np.zeros(0, dtype=np.int64)
+    intensities = np.concatenate([page[1] for page in pages]) if pages else np.zeros(0)
+    range_days = [str(first + datetime.timedelta(days=i)) for i in range((last - first).days + 1)]
+    end_of_day = np.asarray([int(_end_of_day(day).timestamp()) for day in range_days], dtype=np.int64)
+    totals = dict(zip(range_days, daily_intensity_totals(timestamps, intensities, first, end_of_day).tolist()))
+
+    scores = {day: totals[day] for day in missing}
+    _write(
+        "aircon_intensity_scores",
+        [{"record_date": day, "intensity_score": score} for day, score in scores.items()],
+        None,
+    )
+    # スコアが増えたので、キャッシュしている期間のスコアを取得し直す
+    save_json(INTENSITY_SCORES_CACHE_FILE_NAME, {})
+    return scores
+
 
-        # スコアが既に登録されている場合、計算をスキップ
-        if existing_score.data:
-            print(f"{date_str} のスコアは既に登録されています。")
-            continue
+def register_last_month_intensity_scores(clock: Optional[Clock] = None) -> None:
+    """
+    過去1ヶ月の各日付のエアコン強度スコアを計算し、DBに保存します。
 
-        # aircon_settingsから指定日付のデータを取得
-        intensity_score = get_daily_aircon_intensity(date_str)
+    Args:
+        clock (Optional[Clock]): 今日の日付を取得する時計。Noneの場合はTimeUtilの現在時刻。
+    """
+    current_date = get_current_time(clock).date()
+    start_date = current_date - datetime.timedelta(days=30)
 
-        # スコアをDBに保存
-        _save_intensity_score(date_str, intensity_score)
+    scores = register_intensity_scores(start_date, current_date - datetime.timedelta(days=1))
+    sync_outbox()
+    for date_str, intensity_score in scores.items():
         print(f"{date_str} のスコア {intensity_score} を登録しました。")
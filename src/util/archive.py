@@ -0,0 +1,226 @@
+import datetime
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from common.config import Config
+from util.table_reader import iter_chunks
+
+# 履歴アーカイブの保存先ディレクトリの既定値。SWITCHBOT_ARCHIVE_DIRで変更できる
+DEFAULT_ARCHIVE_DIR = ".archive"
+MANIFEST_FILE_NAME = "manifest.json"
+
+# 日時の列名。アーカイブではUTCのUNIX時刻（マイクロ秒）のint64で保持する
+TIME_COLUMN = "created_at"
+
+# アーカイブするテーブルと、列ごとの型
+TABLE_SCHEMAS: Dict[str, Dict[str, str]] = {
+    "temperatures": {"location_id": "int16", "temperature": "float64"},
+    "humidities": {"location_id": "int16", "humidity": "float64"},
+    "co2_levels": {"location_id": "int16", "co2_level": "float64"},
+    "surface_temperatures": {"wall": "float64", "ceiling": "float64", "floor": "float64"},
+    "pmvs": {"pmv": "float64", "met": "float64", "clo": "float64", "air": "float64"},
+    "aircon_settings": {"temperature": "float64", "mode": "U8", "fan_speed": "U8", "power": "U8"},
+    "circulator_settings": {"fan_speed": "U8", "power": "U8"},
+}
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def to_micros(value: datetime.datetime) -> int:
+    """
+    日時をUTCのUNIX時刻（マイクロ秒）に変換します。
+
+    Args:
+        value (datetime.datetime): タイムゾーン付きの日時
+
+    Returns:
+        int: UNIX時刻（マイクロ秒）
+    """
+    return (value - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _parse_micros(created_at: str) -> int:
+    return to_micros(datetime.datetime.fromisoformat(created_at))
+
+
+def _day_of(micros: int) -> str:
+    return str((_EPOCH + datetime.timedelta(microseconds=micros)).date())
+
+
+def _convert(value, dtype: str):
+    if dtype.startswith("U"):
+        return "" if value is None else str(value)
+    if dtype.startswith("float"):
+        return np.nan if value is None else float(value)
+    return int(value)
+
+
+class HistoryArchive:
+    """
+    Supabaseのセンサー・制御履歴を、テーブル・日付・列ごとの.npyファイルに複製するローカルアーカイブ。
+
+    ファイルは「<SWITCHBOT_ARCHIVE_DIR>/<テーブル>/<YYYY-MM-DD>/<列>.npy」に保存し、日付はUTCで区切ります。
+    各日のファイルは日時の昇順に並んでいるため、期間の読み出しはメモリマップした配列のスライスで済みます。
+    取り込み済みの位置はマニフェストに記録し、次回はその続きだけを取得します。
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Args:
+            root (Optional[str]): 保存先ディレクトリ。Noneの場合はSWITCHBOT_ARCHIVE_DIR（既定は.archive）
+        """
+        self.root = root if root is not None else Config.get("SWITCHBOT_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+        self._manifest_path = os.path.join(self.root, MANIFEST_FILE_NAME)
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(self._manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: Dict) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _day_dir(self, table: str, day: str) -> str:
+        return os.path.join(self.root, table, day)
+
+    def _append_day(self, table: str, day: str, committed: int, columns: Dict[str, np.ndarray]) -> None:
+        """
+        1日分の列に行を追加します。既存のファイルと連結してから一時ファイル経由で置き換えます。
+        マニフェストに記録される前に中断した書き込みは、記録済みの行数で切り捨てて上書きします。
+        """
+        day_dir = self._day_dir(table, day)
+        os.makedirs(day_dir, exist_ok=True)
+        for name, values in columns.items():
+            path = os.path.join(day_dir, f"{name}.npy")
+            if committed and os.path.exists(path):
+                values = np.concatenate([np.load(path)[:committed], values])
+            tmp_path = f"{path}.tmp.npy"
+            np.save(tmp_path, values)
+            os.replace(tmp_path, path)
+
+    def ingest(self, table: str) -> int:
+        """
+        前回の取り込み以降に追加された行をSupabaseから取得し、アーカイブに追加します。
+
+        チャンクを書き込むたびにマニフェストを更新するため、途中で中断しても次回は続きから取り込みます。
+
+        Args:
+            table (str): テーブル名（TABLE_SCHEMASのキー）
+
+        Returns:
+            int: 追加した行数
+        """
+        schema = TABLE_SCHEMAS[table]
+        manifest = self._load_manifest()
+        state = manifest.setdefault(table, {"last_created_at": None, "last_id": None, "days": {}})
+        last_key = None if state["last_created_at"] is None else _parse_micros(state["last_created_at"])
+
+        added = 0
+        for chunk in iter_chunks(table, ", ".join(schema), start=state["last_created_at"]):
+            # 前回の最後の行と同じ日時の行は再取得されるため、取り込み済みのものを除く
+            rows = [
+                row
+                for row in chunk
+                if last_key is None or (_parse_micros(row[TIME_COLUMN]), row["id"]) > (last_key, state["last_id"])
+            ]
+            if not rows:
+                continue
+
+            by_day: Dict[str, List[Dict]] = {}
+            for row in rows:
+                by_day.setdefault(_day_of(_parse_micros(row[TIME_COLUMN])), []).append(row)
+            for day, day_rows in by_day.items():
+                columns = {
+                    TIME_COLUMN: np.asarray([_parse_micros(row[TIME_COLUMN]) for row in day_rows], dtype="int64")
+                }
+                for name, dtype in schema.items():
+                    columns[name] = np.asarray([_convert(row[name], dtype) for row in day_rows], dtype=dtype)
+                self._append_day(table, day, state["days"].get(day, 0), columns)
+                state["days"][day] = state["days"].get(day, 0) + len(day_rows)
+
+            state["last_created_at"] = rows[-1][TIME_COLUMN]
+            state["last_id"] = rows[-1]["id"]
+            last_key = _parse_micros(state["last_created_at"])
+            self._save_manifest(manifest)
+            added += len(rows)
+        return added
+
+    def ingest_all(self) -> Dict[str, int]:
+        """
+        全てのテーブルを取り込みます。
+
+        Returns:
+            Dict[str, int]: テーブルごとの追加した行数
+        """
+        return {table: self.ingest(table) for table in TABLE_SCHEMAS}
+
+    def iter_days(
+        self, table: str, start: datetime.datetime, end: datetime.datetime
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        指定した期間の行を、日ごとの列の辞書として返します。
+
+        各列はメモリマップした配列のスライスなので、データのコピーは発生しません。
+
+        Args:
+            table (str): テーブル名
+            start (datetime.datetime): 期間の開始日時（この日時を含む）
+            end (datetime.datetime): 期間の終了日時（この日時を含まない）
+
+        Yields:
+            Dict[str, np.ndarray]: 列名と値の配列の辞書。日時の列はUNIX時刻（マイクロ秒）
+        """
+        days = self._load_manifest().get(table, {}).get("days", {})
+        lower, upper = to_micros(start), to_micros(end)
+        first = start.astimezone(datetime.timezone.utc).date()
+        last = end.astimezone(datetime.timezone.utc).date()
+        for offset in range((last - first).days + 1):
+            day = str(first + datetime.timedelta(days=offset))
+            if day not in days:
+                continue
+            day_dir = self._day_dir(table, day)
+            times = np.load(os.path.join(day_dir, f"{TIME_COLUMN}.npy"), mmap_mode="r")[: days[day]]
+            begin, stop = np.searchsorted(times, [lower, upper])
+            if begin == stop:
+                continue
+            columns = {TIME_COLUMN: times[begin:stop]}
+            for name in TABLE_SCHEMAS[table]:
+                columns[name] = np.load(os.path.join(day_dir, f"{name}.npy"), mmap_mode="r")[begin:stop]
+            yield columns
+
+    def query(
+        self, table: str, start: datetime.datetime, end: datetime.datetime, columns: Optional[List[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        指定した期間の行を、列ごとに1つの配列にまとめて取得します。
+
+        期間が1日に収まる場合はコピーせずにスライスを返し、複数日にまたがる場合のみ連結します。
+
+        Args:
+            table (str): テーブル名
+            start (datetime.datetime): 期間の開始日時（この日時を含む）
+            end (datetime.datetime): 期間の終了日時（この日時を含まない）
+            columns (Optional[List[str]]): 取得する列。Noneの場合は全ての列
+
+        Returns:
+            Dict[str, np.ndarray]: 列名と値の配列の辞書
+        """
+        schema = TABLE_SCHEMAS[table]
+        names = [TIME_COLUMN, *(schema if columns is None else columns)]
+        parts = list(self.iter_days(table, start, end))
+        if len(parts) == 1:
+            return {name: parts[0][name] for name in names}
+        dtypes = {TIME_COLUMN: "int64", **schema}
+        return {
+            name: np.concatenate([part[name] for part in parts]) if parts else np.zeros(0, dtype=dtypes[name])
+            for name in names
+        }
@@ -1,39 +1,45 @@
+from typing import Optional
 import api.switchbot_api as switchbot_api
 import common.constants as constants
+from util.clock import Clock
 
 class Circulator:
     @staticmethod
-    def adjust_fan_speed(current_speed, target_speed):
+    def adjust_fan_speed(current_speed, target_speed, clock: Optional[Clock] = None):
         while current_speed != target_speed:
             if target_speed > current_speed:
-                switchbot_api.increase_air_volume()
+                switchbot_api.increase_air_volume(clock)
                 current_speed += 1
             else:
-                switchbot_api.decrease_air_volume()
+                switchbot_api.decrease_air_volume(clock)
                 current_speed -= 1
         return current_speed
 
 
 
     @staticmethod
-    def set_circulator(current_power, current_fan_speed, target_fan_speed):
+    def set_circulator(current_power, current_fan_speed, target_fan_speed, clock: Optional[Clock] = None):
         power = current_power
         if target_fan_speed == 0:
             if current_power == constants.CirculatorPower.ON.description:
-                Circulator.adjust_fan_speed(current_fan_speed, target_fan_speed)
-                switchbot_api.power_on_off()
+                Circulator.adjust_fan_speed(current_fan_speed, target_fan_speed, clock)
+                switchbot_api.power_on_off(clock)
                 power = constants.CirculatorPower.OFF.description
         else:
             if current_power == constants.CirculatorPower.OFF.description:
-                switchbot_api.power_on_off()
+                switchbot_api.power_on_off(clock)
                 power = constants.CirculatorPower.ON.description
-            Circulator.adjust_fan_speed(current_fan_speed, target_fan_speed)
+            Circulator.adjust_fan_speed(current_fan_speed, target_fan_speed, clock)
 
         return power
     
     @staticmethod
     def set_fan_speed_based_on_temperature_diff(
-        outdoor_temperature: float, temperature_diff: float, current_power: str, current_fan_speed: str
+        outdoor_temperature: float,
+        temperature_diff: float,
+        current_power: str,
+        current_fan_speed: str,
+        clock: Optional[Clock] = None,
     ):
         high_temps = [(3.0, 2), (2.5, 1), (2.0, 1), (1.5, 0), (1.0, 0)]
         low_temps = [(3.0, 2), (2.5, 2), (2.0, 2), (1.5, 0), (1.0, 0)]
@@ -42,6 +48,6 @@ class Circulator:
 
         for threshold, speed in threshold_speeds:
             if temperature_diff >= threshold:
-                return Circulator.set_circulator(current_power, current_fan_speed, speed), speed
+                return Circulator.set_circulator(current_power, current_fan_speed, speed, clock), speed
 
-        return Circulator.set_circulator(current_power, current_fan_speed, 0), 0
+        return Circulator.set_circulator(current_power, current_fan_speed, 0, clock), 0
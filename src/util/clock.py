@@ -0,0 +1,83 @@
+import datetime
+from typing import Optional
+
+from util.time import TimeUtil
+
+
+class Clock:
+    """
+    現在時刻を提供するクラスの基底クラス。
+    """
+
+    def now(self) -> datetime.datetime:
+        """
+        現在の日時を取得します。
+
+        Returns:
+            datetime.datetime: タイムゾーン付きの現在の日時
+        """
+        raise NotImplementedError
+
+
+class SystemClock(Clock):
+    """
+    実際の現在時刻を返す時計。
+    """
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now(TimeUtil.timezone())
+
+
+class ManualClock(Clock):
+    """
+    明示的に進めるまで同じ時刻を返す時計。シミュレーションやバックテストで、実時間を待たずに
+    制御ループを繰り返し実行するために使います。
+
+    Attributes:
+        current (datetime.datetime): 現在の日時。
+    """
+
+    def __init__(self, start: datetime.datetime):
+        """
+        Args:
+            start (datetime.datetime): 開始時の日時（タイムゾーン付き）
+        """
+        self.current = start
+
+    def now(self) -> datetime.datetime:
+        return self.current
+
+    def advance(self, delta: datetime.timedelta) -> datetime.datetime:
+        """
+        時刻を進めます。
+
+        Args:
+            delta (datetime.timedelta): 進める時間
+
+        Returns:
+            datetime.datetime: 進めた後の日時
+        """
+        self.current = self.current + delta
+        return self.current
+
+    def set(self, value: datetime.datetime) -> None:
+        """
+        時刻を設定します。
+
+        Args:
+            value (datetime.datetime): 設定する日時（タイムゾーン付き）
+        """
+        self.current = value
+
+
+def current_time(clock: Optional[Clock] = None) -> datetime.datetime:
+    """
+    時計の現在時刻を取得します。時計が指定されていない場合はTimeUtilの現在時刻を使います。
+
+    Args:
+        clock (Optional[Clock]): 時計
+
+    Returns:
+        datetime.datetime: 現在の日時
+    """
+    return TimeUtil.get_current_time() if clock is None else clock.now()
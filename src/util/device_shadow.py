@@ -0,0 +1,115 @@
+import datetime
+from typing import Dict, Optional, Tuple
+
+import common.constants as constants
+from common.data_types import AirconSetting
+from util.local_state import load_json, save_json
+
+# シャドウのファイル名
+SHADOW_FILE_NAME = "device_shadow.json"
+# これより長く更新されていないシャドウは、実行漏れや他からの変更の可能性があるためSupabaseと照合する
+SHADOW_MAX_AGE = datetime.timedelta(minutes=30)
+
+
+class DeviceShadow:
+    """
+    エアコンとサーキュレーターの現在の設定をローカルに保持するクラス（デバイスシャドウ）。
+
+    毎ティックSupabaseに前回の設定を問い合わせる代わりに、ローカル状態ファイルの値を使います。
+    シャドウが存在しない場合（初回起動）や古すぎる場合はNoneを返し、呼び出し側でSupabaseと照合します。
+    """
+
+    @staticmethod
+    def _load(now: datetime.datetime) -> Optional[Dict]:
+        """
+        有効なシャドウを読み込みます。
+
+        Args:
+            now (datetime.datetime): 現在日時
+
+        Returns:
+            Optional[Dict]: シャドウ。存在しないか古すぎる場合はNone。
+        """
+        shadow = load_json(SHADOW_FILE_NAME)
+        if not shadow or "updated_at" not in shadow:
+            return None
+        if now - datetime.datetime.fromisoformat(shadow["updated_at"]) > SHADOW_MAX_AGE:
+            return None
+        return shadow
+
+    @staticmethod
+    def _update(key: str, value: Dict, now: datetime.datetime) -> None:
+        shadow = load_json(SHADOW_FILE_NAME, {})
+        shadow[key] = value
+        shadow["updated_at"] = now.isoformat()
+        save_json(SHADOW_FILE_NAME, shadow)
+
+    @staticmethod
+    def get_aircon(now: datetime.datetime) -> Optional[Tuple[AirconSetting, str]]:
+        """
+        エアコンの現在の設定を取得します。
+
+        Args:
+            now (datetime.datetime): 現在日時
+
+        Returns:
+            Optional[Tuple[AirconSetting, str]]: エアコンの設定と設定日時のタプル。照合が必要な場合はNone。
+        """
+        shadow = DeviceShadow._load(now)
+        if shadow is None or "aircon" not in shadow:
+            return None
+        aircon = shadow["aircon"]
+        setting = AirconSetting(
+            temp_setting=aircon["temperature"],
+            mode_setting=constants.AirconMode.get_by_id(aircon["mode"]),
+            fan_speed_setting=constants.AirconFanSpeed.get_by_id(aircon["fan_speed"]),
+            power_setting=constants.AirconPower.get_by_id(aircon["power"]),
+        )
+        return setting, aircon["created_at"]
+
+    @staticmethod
+    def get_circulator(now: datetime.datetime) -> Optional[Tuple[str, str]]:
+        """
+        サーキュレーターの現在の設定を取得します。
+
+        Args:
+            now (datetime.datetime): 現在日時
+
+        Returns:
+            Optional[Tuple[str, str]]: 電源設定と風速設定のタプル。照合が必要な場合はNone。
+        """
+        shadow = DeviceShadow._load(now)
+        if shadow is None or "circulator" not in shadow:
+            return None
+        return shadow["circulator"]["power"], shadow["circulator"]["fan_speed"]
+
+    @staticmethod
+    def update_aircon(setting: AirconSetting, created_at: str, now: datetime.datetime) -> None:
+        """
+        エアコンの設定をシャドウに記録します。
+
+        Args:
+            setting (AirconSetting): エアコンの設定
+            created_at (str): 設定日時（ISO形式）
+            now (datetime.datetime): 現在日時
+        """
+        aircon = {
+            "temperature": str(setting.temp_setting),
+            "mode": setting.mode_setting.id,
+            "fan_speed": setting.fan_speed_setting.id,
+            "power": setting.power_setting.id,
+            "created_at": created_at,
+        }
+        DeviceShadow._update("aircon", aircon, now)
+
+    @staticmethod
+    def update_circulator(power: str, fan_speed: str, now: datetime.datetime) -> None:
+        """
+        サーキュレーターの設定をシャドウに記録します。
+
+        Args:
+            power (str): 電源設定
+            fan_speed (str): 風速設定
+            now (datetime.datetime): 現在日時
+        """
+        DeviceShadow._update("circulator", {"power": power, "fan_speed": fan_speed}, now)
@@ -1,8 +1,10 @@
-from datetime import time
-from common.data_types import PMVCalculation, TemperatureHumidity
-from pythermalcomfort.models import pmv_ppd
-from pythermalcomfort.utilities import v_relative, clo_dynamic
+from datetime import datetime, time
+from typing import Optional
+import numpy as np
+from common.data_types import PMVBatch, PMVCalculation, TemperatureHumidity
+from util.clock import Clock, current_time
 from util.logger import logger
+from util.pmv_grid import PMVGrid
 from util.time import TimeUtil
 import math
 
@@ -36,9 +38,9 @@ WALL_SURFACE_TEMP_OVER_35 = 40
 WALL_SURFACE_TEMP_OVER_40 = 50
 
 
-def calculate_west_wall_temperature(outdoor_temperature):
+def calculate_west_wall_temperature(outdoor_temperature, clock: Optional[Clock] = None):
     """外気温と時間に基づき西側外壁の表面温度を計算する"""
-    if not (time(13, 0) <= TimeUtil.get_current_time().time() < time(18, 0)):
+    if not (time(13, 0) <= current_time(clock).time() < time(18, 0)):
         return outdoor_temperature
 
     if outdoor_temperature >= 40:
@@ -67,6 +69,271 @@ def calculate_roof_surface_temperature(outdoor_temperature):
         return outdoor_temperature
 
 
+# ISO 7730の適用範囲（この範囲外の入力ではPMVとPPDをNaNとする）
+ISO_LIMITS = {
+    "tdb": (10, 30),
+    "tr": (10, 40),
+    "vr": (0, 1),
+    "met": (0.8, 4),
+    "clo": (0, 2),
+    "pmv": (-2, 2),
+}
+# 着衣表面温度の反復計算の収束判定と最大反復回数
+CLOTHING_TEMPERATURE_TOLERANCE = 0.00015
+CLOTHING_TEMPERATURE_MAX_ITERATIONS = 150
+
+
+def v_relative(v, met):
+    """活動による体の動きを考慮した相対風速を計算する（ISO 7730、pythermalcomfortと同じ丸め）"""
+    v, met = np.asarray(v, dtype="float64"), np.asarray(met, dtype="float64")
+    return np.where(met > 1, np.around(v + 0.3 * (met - 1), 3), v)
+
+
+def clo_dynamic(clo, met):
+    """活動による体の動きを考慮した動的な衣服の断熱性を計算する（ASHRAE 55、pythermalcomfortと同じ丸め）"""
+    clo, met = np.asarray(clo, dtype="float64"), np.asarray(met, dtype="float64")
+    return np.where(met > 1.2, np.around(clo * (0.6 + 0.4 / met), 3), clo)
+
+
+def calculate_ppd(pmv):
+    """PMVからPPD[%]を計算する（ISO 7730）"""
+    return 100.0 - 95.0 * np.exp(-0.03353 * pmv**4.0 - 0.2179 * pmv**2.0)
+
+
+def _within(values, limits):
+    return (values >= limits[0]) & (values <= limits[1])
+
+
+def within_iso_limits(tdb, tr, vr, met, clo, pmv):
+    """入力と丸める前のPMVがISO 7730の適用範囲内かどうかを判定する"""
+    return (
+        _within(np.asarray(tdb), ISO_LIMITS["tdb"])
+        & _within(np.asarray(tr), ISO_LIMITS["tr"])
+        & _within(np.asarray(vr), ISO_LIMITS["vr"])
+        & _within(np.asarray(met), ISO_LIMITS["met"])
+        & _within(np.asarray(clo), ISO_LIMITS["clo"])
+        & _within(np.asarray(pmv), ISO_LIMITS["pmv"])
+    )
+
+
+def pmv_iso(tdb, tr, vr, rh, met, clo, wme=0.0):
+    """
+    ISO 7730に従ってPMVを計算する（丸めなし、適用範囲の判定なし）。スカラーと配列のどちらも受け付ける。
+
+    着衣表面温度の反復計算は配列のまま行い、収束した要素はそれ以上更新しない。
+    """
+    tdb, tr, vr, rh, met, clo, wme = np.broadcast_arrays(
+        *[np.asarray(x, dtype="float64") for x in (tdb, tr, vr, rh, met, clo, wme)]
+    )
+    pa = rh * 10 * np.exp(16.6536 - 4030.183 / (tdb + 235))  # 水蒸気分圧[Pa]
+    icl = 0.155 * clo  # 衣服の熱抵抗[m2 K/W]
+    m = met * 58.15  # 代謝量[W/m2]
+    mw = m - wme * 58.15  # 体内で熱になる量[W/m2]
+    f_cl = np.where(icl <= 0.078, 1 + 1.29 * icl, 1.05 + 0.645 * icl)  # 着衣面積係数
+
+    hcf = 12.1 * np.sqrt(vr)  # 強制対流熱伝達率
+    taa = tdb + 273
+    tra = tr + 273
+    t_cla = taa + (35.5 - tdb) / (3.5 * icl + 0.1)
+    p1 = icl * f_cl
+    p2 = p1 * 3.96
+    p3 = p1 * 100
+    p4 = p1 * taa
+    p5 = (308.7 - 0.028 * mw) + (p2 * (tra / 100.0) ** 4)
+    xn = t_cla / 100
+    xf = t_cla / 50
+    hc = hcf.copy()
+
+    # 着衣表面温度を反復計算で求める
+    active = np.abs(xn - xf) > CLOTHING_TEMPERATURE_TOLERANCE
+    iterations = 0
+    while active.any():
+        xf = np.where(active, (xf + xn) / 2, xf)
+        hcn = 2.38 * np.abs(100.0 * xf - taa) ** 0.25  # 自然対流熱伝達率
+        hc = np.where(active, np.maximum(hcf, hcn), hc)
+        xn = np.where(active, (p5 + p4 * hc - p2 * xf**4) / (100 + p3 * hc), xn)
+        iterations += 1
+        if iterations > CLOTHING_TEMPERATURE_MAX_ITERATIONS:
+            raise StopIteration("Max iterations exceeded")
+        active = np.abs(xn - xf) > CLOTHING_TEMPERATURE_TOLERANCE
+    tcl = 100 * xn - 273
+
+    # 熱損失の各成分
+    hl1 = 3.05 * 0.001 * (5733 - (6.99 * mw) - pa)  # 皮膚からの水分拡散
+    hl2 = np.where(mw > 58.15, 0.42 * (mw - 58.15), 0)  # 発汗
+    hl3 = 1.7 * 0.00001 * m * (5867 - pa)  # 呼吸による潜熱
+    hl4 = 0.0014 * m * (34 - tdb)  # 呼吸による顕熱
+    hl5 = 3.96 * f_cl * (xn**4 - (tra / 100.0) ** 4)  # 放射
+    hl6 = f_cl * hc * (tcl - tdb)  # 対流
+
+    ts = 0.303 * np.exp(-0.036 * m) + 0.028
+    return ts * (mw - hl1 - hl2 - hl3 - hl4 - hl5 - hl6)
+
+
+def pmv_ppd_iso(tdb, tr, vr, rh, met, clo, wme=0.0):
+    """
+    ISO 7730に従ってPMVとPPDを計算する。pythermalcomfortのpmv_ppd(standard="ISO")と同じく、
+    PMVは小数第2位、PPDは小数第1位に丸め、適用範囲外の入力ではNaNを返す。
+    """
+    pmv = pmv_iso(tdb, tr, vr, rh, met, clo, wme)
+    ppd = calculate_ppd(pmv)
+    valid = within_iso_limits(tdb, tr, vr, met, clo, pmv)
+    return np.where(valid, np.around(pmv, 2), np.nan), np.where(valid, np.around(ppd, 1), np.nan)
+
+
+def calculate_pmv_ppd(tdb, tr, vr, rh, met, clo):
+    """
+    ISO 7730に従ってPMVとPPDを計算する。スカラーと配列のどちらも受け付ける。
+
+    PMV_GRID_PATHに格子が設定されている場合、格子の範囲内の入力は補間で求め、範囲外の入力のみ
+    pmv_ppd_isoで厳密に計算する。補間の誤差の上限は格子の作成時に測定したmax_errorの値となり、
+    PMV_GRID_MAX_ERRORを超える格子は使わない。
+    """
+    grid = PMVGrid.get_grid()
+    if grid is None:
+        return pmv_ppd_iso(tdb=tdb, tr=tr, vr=vr, rh=rh, met=met, clo=clo)
+
+    points = np.stack(np.broadcast_arrays(*[np.asarray(x, dtype="float64") for x in (tdb, tr, rh, vr, met, clo)]), -1)
+    # スカラーの入力でも要素を代入できるよう1次元の配列にして計算し、最後に入力の形に戻す
+    shape = points.shape[:-1]
+    points = points.reshape(-1, points.shape[-1])
+    pmv = np.full(len(points), np.nan)
+    inside = grid.contains(points)
+    pmv[inside] = grid.interpolate(points[inside])
+    # pmv_ppd_isoと同じく、PPDは丸める前のPMVから計算してから両方を丸める
+    ppd = np.round(calculate_ppd(pmv), 1)
+    pmv = np.round(pmv, 2)
+    # 格子の範囲外か、補間に適用範囲外の格子点を含む入力は厳密に計算する
+    exact = np.isnan(pmv)
+    if exact.any():
+        pmv[exact], ppd[exact] = pmv_ppd_iso(
+            tdb=points[exact, 0],
+            tr=points[exact, 1],
+            vr=points[exact, 3],
+            rh=points[exact, 2],
+            met=points[exact, 4],
+            clo=points[exact, 5],
+        )
+    return pmv.reshape(shape), ppd.reshape(shape)
+
+
+def _seconds_of_day(timestamps: np.ndarray) -> np.ndarray:
+    """UTCの日時の配列を、現地時刻の0時からの秒数の配列に変換する"""
+    offset = TimeUtil.timezone().utcoffset(datetime(2000, 1, 1)).total_seconds()
+    epoch_seconds = np.asarray(timestamps, dtype="datetime64[s]").astype("int64")
+    return (epoch_seconds + int(offset)) % 86400
+
+
+def calculate_west_wall_temperatures(outdoor_temperatures: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+    """外気温と日時（UTCのdatetime64）の配列に基づき西側外壁の表面温度を計算する"""
+    outdoor_temperatures = np.asarray(outdoor_temperatures, dtype="float64")
+    seconds = _seconds_of_day(timestamps)
+    afternoon = (seconds >= 13 * 3600) & (seconds < 18 * 3600)
+    wall_temperatures = np.select(
+        [outdoor_temperatures >= threshold for threshold in (40, 35, 30, 25)],
+        [WALL_SURFACE_TEMP_OVER_40, WALL_SURFACE_TEMP_OVER_35, WALL_SURFACE_TEMP_OVER_30, WALL_SURFACE_TEMP_OVER_25],
+        outdoor_temperatures,
+    )
+    return np.where(afternoon, wall_temperatures, outdoor_temperatures)
+
+
+def calculate_roof_surface_temperatures(outdoor_temperatures: np.ndarray) -> np.ndarray:
+    """外気温の配列に基づき屋根の表面温度を計算する"""
+    outdoor_temperatures = np.asarray(outdoor_temperatures, dtype="float64")
+    return np.select(
+        [outdoor_temperatures >= threshold for threshold in (40, 35, 30, 25)],
+        [ROOF_SURFACE_TEMP_OVER_40, ROOF_SURFACE_TEMP_OVER_35, ROOF_SURFACE_TEMP_OVER_30, ROOF_SURFACE_TEMP_OVER_25],
+        outdoor_temperatures,
+    )
+
+
+def calculate_pmv_batch(
+    ceiling_temperature: np.ndarray,
+    ceiling_humidity: np.ndarray,
+    floor_temperature: np.ndarray,
+    floor_humidity: np.ndarray,
+    outdoor_temperature: np.ndarray,
+    study_temperature: np.ndarray,
+    met: np.ndarray,
+    icl: np.ndarray,
+    timestamps: np.ndarray,
+    wind_speed=0.15,
+) -> PMVBatch:
+    """
+    calculate_pmvと同じ計算を、複数の時点の計測値の配列に対して一度に行う。
+
+    表面温度、平均放射温度、PMV/PPDを配列演算でまとめて計算するため、定数を調整した後に
+    過去の計測値の全件を再計算する用途に使う。定数は呼び出し時点のモジュールの値を使う。
+
+    Args:
+        ceiling_temperature (np.ndarray): 天井付近の温度
+        ceiling_humidity (np.ndarray): 天井付近の湿度
+        floor_temperature (np.ndarray): 床付近の温度
+        floor_humidity (np.ndarray): 床付近の湿度
+        outdoor_temperature (np.ndarray): 外気温
+        study_temperature (np.ndarray): 書斎の温度
+        met (np.ndarray): MET値
+        icl (np.ndarray): 衣服の断熱性
+        timestamps (np.ndarray): 計測日時（UTCのdatetime64）。西日の影響の判定に使う
+        wind_speed (float or np.ndarray): 風速
+
+    Returns:
+        PMVBatch: 時点ごとの計算結果
+    """
+    ceiling_temperature = np.asarray(ceiling_temperature, dtype="float64")
+    floor_temperature = np.asarray(floor_temperature, dtype="float64")
+    outdoor_temperature = np.asarray(outdoor_temperature, dtype="float64")
+    met = np.broadcast_to(np.asarray(met, dtype="float64"), floor_temperature.shape)
+
+    roof_surface_temp = calculate_roof_surface_temperatures(outdoor_temperature)
+    west_wall_temp = calculate_west_wall_temperatures(outdoor_temperature, timestamps)
+    # 内部表面温度の計算は四則演算のみなので、スカラー用の関数をそのまま配列に適用できる
+    wall_temp = calculate_wall_surface_temperature(
+        west_wall_temp,
+        floor_temperature,
+        WALL_THERMAL_CONDUCTIVITY,
+        WINDOW_THERMAL_CONDUCTIVITY,
+        WINDOW_TO_WALL_RATIO,
+        WALL_SURFACE_HEAT_TRANSFER_RESISTANCE,
+    )
+    ceiling_temp = calculate_interior_surface_temperature(
+        roof_surface_temp, ceiling_temperature, CEILING_THERMAL_CONDUCTIVITY, CEILING_SURFACE_HEAT_TRANSFER_RESISTANCE
+    )
+    floor_temp = calculate_interior_surface_temperature(
+        (floor_temperature + outdoor_temperature) * (1 - TEMP_DIFF_COEFFICIENT_UNDER_FLOOR),
+        floor_temperature,
+        FLOOR_THERMAL_CONDUCTIVITY,
+        FLOOR_SURFACE_HEAT_TRANSFER_RESISTANCE,
+    )
+    mean_radiant_temp = (wall_temp + ceiling_temp + floor_temp) / 3
+    dry_bulb_temp = (floor_temperature + np.asarray(study_temperature, dtype="float64")) / 2
+    humidity = (np.asarray(ceiling_humidity, dtype="float64") + np.asarray(floor_humidity, dtype="float64")) / 2
+
+    relative_air_speed = v_relative(v=np.broadcast_to(wind_speed, met.shape), met=met)
+    dynamic_clothing_insulation = clo_dynamic(clo=np.asarray(icl, dtype="float64"), met=met)
+    pmv, ppd = calculate_pmv_ppd(
+        tdb=dry_bulb_temp,
+        tr=mean_radiant_temp,
+        vr=relative_air_speed,
+        rh=humidity,
+        met=met,
+        clo=dynamic_clothing_insulation,
+    )
+
+    return PMVBatch(
+        pmv=np.asarray(pmv, dtype="float64"),
+        ppd=np.asarray(ppd, dtype="float64"),
+        clo=np.asarray(dynamic_clothing_insulation, dtype="float64"),
+        air=np.asarray(relative_air_speed, dtype="float64"),
+        met=met,
+        wall=wall_temp,
+        ceiling=ceiling_temp,
+        floor=floor_temp,
+        mean_radiant_temperature=mean_radiant_temp,
+        dry_bulb_temperature=dry_bulb_temp,
+    )
+
+
 def calculate_pmv(
     ceiling: TemperatureHumidity,
     floor: TemperatureHumidity,
@@ -75,11 +342,12 @@ def calculate_pmv(
     met: float,
     icl: float,
     wind_speed: float = 0.15,
+    clock: Optional[Clock] = None,
 ) -> PMVCalculation:
     # 屋根の表面温度を取得
     roof_surface_temp = calculate_roof_surface_temperature(outdoor.temperature)
     # 夏の西日の影響を考慮する
-    west_wall_temp = calculate_west_wall_temperature(outdoor.temperature)
+    west_wall_temp = calculate_west_wall_temperature(outdoor.temperature, clock)
     # 壁、天井、床の内部表面温度を計算
     wall_temp = calculate_wall_surface_temperature(
         west_wall_temp,
@@ -114,20 +382,19 @@ def calculate_pmv(
     dynamic_clothing_insulation = clo_dynamic(clo=icl, met=met)
 
     # ISOに従ってPMVを計算
-    results = pmv_ppd(
+    pmv, ppd = calculate_pmv_ppd(
         tdb=dry_bulb_temp,
         tr=mean_radiant_temp,
         vr=relative_air_speed,
         rh=humidity,
         met=met,
         clo=dynamic_clothing_insulation,
-        standard="ISO",
     )
 
     # namedtupleを返す
     return PMVCalculation(
-        pmv=float(results["pmv"]),
-        ppd=float(results["ppd"]),
+        pmv=float(pmv),
+        ppd=float(ppd),
         clo=dynamic_clothing_insulation.item(0),
         air=relative_air_speed.item(0),
         met=met,
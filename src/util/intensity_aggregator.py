@@ -0,0 +1,136 @@
+import datetime
+from typing import Dict, Iterable, Optional
+
+from util.aircon_intensity_calculator import AirconIntensityCalculator
+from util.local_state import load_json, save_json
+
+# 集計状態のファイル名
+AGGREGATE_FILE_NAME = "intensity_aggregate.json"
+# 保持する日数
+RETAINED_DAYS = 3
+
+
+def score_day(created_at: datetime.datetime) -> str:
+    """
+    エアコン設定が集計される日付を取得します。
+
+    get_daily_aircon_intensityはcreated_atをタイムゾーン指定なしの日付文字列で絞り込むため、
+    データベースのタイムゾーン（UTC）での日付で集計されます。それに合わせてUTCの日付を返します。
+
+    Args:
+        created_at (datetime.datetime): 設定日時
+
+    Returns:
+        str: YYYY-MM-DD形式の日付
+    """
+    return created_at.astimezone(datetime.timezone.utc).date().isoformat()
+
+
+def _parse_created_at(created_at: str) -> datetime.datetime:
+    # get_daily_aircon_intensityと同じく秒未満を切り捨てる
+    return datetime.datetime.fromisoformat(created_at).replace(microsecond=0)
+
+
+def _apply(entry: Dict, row: Dict) -> None:
+    """
+    1件のエアコン設定を日毎の集計に反映します。直前の設定の持続時間分の強度を加算し、
+    この設定を新たな直前の設定として記録します。
+    """
+    created_at = _parse_created_at(row["created_at"])
+    last = entry["last_setting"]
+    if last is not None:
+        time_difference = (created_at - _parse_created_at(last["created_at"])).total_seconds()
+        intensity_score = AirconIntensityCalculator.calculate_intensity(
+            temperature=float(last["temperature"]),
+            mode=last["mode"],
+            fan_speed=last["fan_speed"],
+            power=last["power"],
+        )
+        by_mode = entry["intensity_by_mode"]
+        by_mode[last["mode"]] = by_mode.get(last["mode"], 0.0) + intensity_score * time_difference
+    entry["last_setting"] = {
+        "temperature": str(row["temperature"]),
+        "mode": str(row["mode"]),
+        "fan_speed": str(row["fan_speed"]),
+        "power": str(row["power"]),
+        "created_at": row["created_at"],
+    }
+
+
+class IntensityAggregator:
+    """
+    エアコン設定の強度スコアを日毎に逐次集計するクラス。
+
+    設定が挿入されるたびに直前の設定の持続時間分だけ強度を加算するため、
+    当日のスコアを求める際に1日分の設定を取得し直す必要がありません。
+    集計状態はローカル状態ファイルに保存され、実行をまたいで引き継がれます。
+    """
+
+    @staticmethod
+    def _load() -> Dict:
+        return load_json(AGGREGATE_FILE_NAME, {"initialized_at": None, "days": {}})
+
+    @staticmethod
+    def _save(state: Dict) -> None:
+        for day in sorted(state["days"])[:-RETAINED_DAYS]:
+            del state["days"][day]
+        save_json(AGGREGATE_FILE_NAME, state)
+
+    @staticmethod
+    def record(row: Dict) -> None:
+        """
+        挿入されたエアコン設定を集計に反映します。
+
+        集計を始める前に始まった日の設定は、それ以前の設定が分からないため集計しません
+        （その日のスコアはscoreでNoneとなり、データベースから再集計されます）。
+
+        Args:
+            row (Dict): aircon_settingsに挿入した行
+        """
+        state = IntensityAggregator._load()
+        if state["initialized_at"] is None:
+            return
+        created_at = _parse_created_at(row["created_at"])
+        day = score_day(created_at)
+        entry = state["days"].get(day)
+        if entry is None:
+            start_of_day = datetime.datetime.fromisoformat(day).replace(tzinfo=datetime.timezone.utc)
+            if start_of_day < datetime.datetime.fromisoformat(state["initialized_at"]):
+                return
+            entry = state["days"][day] = {"intensity_by_mode": {}, "last_setting": None}
+        _apply(entry, row)
+        IntensityAggregator._save(state)
+
+    @staticmethod
+    def rebuild(day: str, rows: Iterable[Dict], now: datetime.datetime) -> None:
+        """
+        データベースとアウトボックスの同期待ちの行から取得した1日分の設定で、その日の集計を作り直します。
+
+        Args:
+            day (str): YYYY-MM-DD形式の日付
+            rows (Iterable[Dict]): その日のaircon_settingsの行
+            now (datetime.datetime): 現在日時（集計の開始日時として記録）
+        """
+        state = IntensityAggregator._load()
+        if state["initialized_at"] is None:
+            state["initialized_at"] = now.isoformat()
+        entry = state["days"][day] = {"intensity_by_mode": {}, "last_setting": None}
+        for row in rows:
+            _apply(entry, row)
+        IntensityAggregator._save(state)
+
+    @staticmethod
+    def score(day: str) -> Optional[float]:
+        """
+        指定した日付の、直前の設定の持続時間を含まない強度スコアを取得します。
+
+        Args:
+            day (str): YYYY-MM-DD形式の日付
+
+        Returns:
+            Optional[float]: 強度スコア。集計していない日付の場合はNone。
+        """
+        entry = IntensityAggregator._load()["days"].get(day)
+        if entry is None:
+            return None
+        return sum(entry["intensity_by_mode"].values())
@@ -0,0 +1,76 @@
+import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+import common.constants as constants
+from util.aircon_intensity_calculator import AirconIntensityCalculator
+
+SECONDS_PER_DAY = 86400
+# get_daily_aircon_intensityはcreated_atを「23:59:59より前」で絞り込むため、日の最後の1秒は集計しない
+LAST_SECOND_OF_DAY = SECONDS_PER_DAY - 1
+
+
+def settings_to_arrays(rows: Iterable[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    エアコン設定の行を、設定日時（UNIX秒）と強度の配列に変換します。
+
+    強度は温度・モード・風量・電源の組み合わせごとに1回だけ計算します。
+
+    Args:
+        rows (Iterable[Dict]): aircon_settingsの行
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: 設定日時（秒未満切り捨て）と強度の配列
+    """
+    intensity_by_setting: Dict[tuple, int] = {}
+    timestamps: List[int] = []
+    intensities: List[int] = []
+    for row in rows:
+        key = (
+            float(str(row["temperature"])),
+            constants.AirconMode.get_by_id(row["mode"]).id,
+            constants.AirconFanSpeed.get_by_id(str(row["fan_speed"])).id,
+            constants.AirconPower.get_by_id(row["power"]).id,
+        )
+        if key not in intensity_by_setting:
+            intensity_by_setting[key] = AirconIntensityCalculator.calculate_intensity(*key)
+        timestamps.append(int(datetime.datetime.fromisoformat(row["created_at"]).timestamp()))
+        intensities.append(intensity_by_setting[key])
+    return np.asarray(timestamps, dtype=np.int64), np.asarray(intensities, dtype=np.float64)
+
+
+def daily_intensity_totals(
+    timestamps: np.ndarray,
+    intensities: np.ndarray,
+    start_date: datetime.date,
+    end_of_day: np.ndarray,
+) -> np.ndarray:
+    """
+    設定の切り替わり時刻の配列から、日毎の強度スコアを一度に計算します。
+
+    各設定は同じ日の次の設定まで、その日の最後の設定は日の終わり（end_of_day）まで続いたものとして、
+    強度×持続時間を日ごとに合計します。日付はget_daily_aircon_intensityと同じくUTCで区切ります。
+
+    Args:
+        timestamps (np.ndarray): 挿入順に並んだ設定日時（UNIX秒）
+        intensities (np.ndarray): 各設定の強度
+        start_date (datetime.date): 集計期間の初日
+        end_of_day (np.ndarray): 集計期間の各日について、最後の設定が続く終わりの日時（UNIX秒）
+
+    Returns:
+        np.ndarray: 集計期間の各日の強度スコア
+    """
+    days = len(end_of_day)
+    start = int(datetime.datetime.combine(start_date, datetime.time(), datetime.timezone.utc).timestamp())
+    day_index, second_of_day = np.divmod(timestamps - start, SECONDS_PER_DAY)
+    mask = (day_index >= 0) & (day_index < days) & (second_of_day < LAST_SECOND_OF_DAY)
+    timestamps, intensities, day_index = timestamps[mask], intensities[mask], day_index[mask]
+    if len(timestamps) == 0:
+        return np.zeros(days)
+
+    # 次の設定が同じ日ならその時刻まで、そうでなければ日の終わりまでを持続時間とする
+    segment_end = end_of_day[day_index]
+    same_day = day_index[1:] == day_index[:-1]
+    segment_end[:-1] = np.where(same_day, timestamps[1:], segment_end[:-1])
+    return np.bincount(day_index, weights=intensities * (segment_end - timestamps), minlength=days)
@@ -0,0 +1,67 @@
+import json
+import os
+from typing import Any
+
+from common.config import Config
+
+# 実行をまたいで保持するローカル状態の保存先ディレクトリの既定値。SWITCHBOT_STATE_DIRで変更できる
+DEFAULT_STATE_DIR = ".state"
+
+
+def state_dir() -> str:
+    """
+    ローカル状態の保存先ディレクトリを取得します。
+
+    Returns:
+        str: ディレクトリのパス
+    """
+    return Config.get("SWITCHBOT_STATE_DIR", DEFAULT_STATE_DIR)
+
+
+def state_path(name: str) -> str:
+    """
+    ローカル状態ファイルのパスを取得します。保存先ディレクトリが存在しない場合は作成します。
+
+    Args:
+        name (str): ファイル名
+
+    Returns:
+        str: ファイルのパス
+    """
+    directory = state_dir()
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+def load_json(name: str, default: Any = None) -> Any:
+    """
+    ローカル状態ファイルからJSONを読み込みます。
+
+    Args:
+        name (str): ファイル名
+        default (Any, optional): ファイルが存在しないか壊れている場合に返す値
+
+    Returns:
+        Any: 読み込んだ値
+    """
+    try:
+        with open(state_path(name), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(name: str, data: Any) -> None:
+    """
+    ローカル状態ファイルにJSONを書き込みます。書き込み途中で中断してもファイルが壊れないよう、
+    一時ファイルに書いてから置き換えます。
+
+    Args:
+        name (str): ファイル名
+        data (Any): 書き込む値
+    """
+    path = state_path(name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
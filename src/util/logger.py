@@ -1,6 +1,6 @@
 import datetime
 import logging
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 from common.data_types import AirconSetting, CO2SensorData, PMVCalculation, TemperatureHumidity
 
@@ -35,6 +35,19 @@ class LoggerUtil:
         logger.info(f"外部:温度{outdoor.temperature}°, 湿度{outdoor.humidity}%, 絶対湿度{outdoor_absolute_humidity:.2f}g/㎥, 露点温度{dew_point}°")
         logger.info(f"相対湿度{(ceiling.humidity + floor.humidity) / 2}°, 絶対湿度{absolute_humidity:.2f}g/㎥")
 
+    @staticmethod
+    def log_skipped_tick():
+        logger.info("API使用量が上限に近いため、今回の制御をスキップします")
+
+    @staticmethod
+    def log_locked_tick():
+        logger.warning("他のプロセスがティックを実行中のため、今回の制御をスキップします")
+
+    @staticmethod
+    def log_degraded_sensors(degraded: Dict[str, float]):
+        for sensor, age in degraded.items():
+            logger.warning(f"縮退運転: {sensor}は{age / 60:.0f}分前の値を使用")
+
     @staticmethod
     def log_pmv_results(pmv: PMVCalculation, met: float, icl: float):
         logger.info(f"壁表面温度: {pmv.wall:.1f}°")
@@ -70,4 +83,23 @@ class LoggerUtil:
         logger.info(f"先週のスコア平均: {scores[1]}")
         logger.info(f"今週のスコア平均: {scores[2]}")
         logger.info(f"昨日のスコア: {scores[3]}")
-        logger.info(f"今日のスコア予想: {scores[4]}")
\ No newline at end of file
+        logger.info(f"今日のスコア予想: {scores[4]}")
+
+    @staticmethod
+    def log_scenario_choice(count: int, circulator_speed: int, intensity: int) -> None:
+        logger.info(f"{count}件の候補から、サーキュレーターの風量{circulator_speed}（エアコンの強度{intensity}）を選択")
+
+    @staticmethod
+    def log_aircon_reasons(reasons: List[str]) -> None:
+        for reason in reasons:
+            logger.info(reason)
+
+    @staticmethod
+    def log_write_latencies(latencies: Dict[str, float]) -> None:
+        for table, latency in latencies.items():
+            logger.info(f"{table}への書き込み: {latency * 1000:.0f}ms")
+
+    @staticmethod
+    def log_staging_latencies(latencies: Dict[str, float]) -> None:
+        for table, latency in latencies.items():
+            logger.info(f"{table}のアウトボックスへの追加: {latency * 1000:.0f}ms")
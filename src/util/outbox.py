@@ -0,0 +1,332 @@
+import datetime
+import json
+import math
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from util.local_state import state_path
+from util.logger import logger
+
+# アウトボックスのファイル名
+OUTBOX_FILE_NAME = "outbox.sqlite3"
+# 1回のリクエストで送信する最大行数
+SYNC_BATCH_SIZE = 500
+# 同期の同時実行数
+SYNC_WORKERS = 4
+# 1行ずつ送信しても失敗した回数がこの値に達した行は、他の行の同期を妨げないようデッドレターに移す
+MAX_SYNC_ATTEMPTS = 3
+
+# 登録済みの行を探す列。created_atを持たないテーブルは、行を一意に特定できる列で探す
+DEFAULT_LOOKUP_COLUMN = "created_at"
+LOOKUP_COLUMNS = {"aircon_intensity_scores": "record_date"}
+# 数値を比較する有効桁数（float4の列は約7桁に丸められて返る）
+NUMERIC_SIGNIFICANT_DIGITS = 6
+
+InsertFunction = Callable[[str, List[Dict]], object]
+FetchFunction = Callable[[str, str, List[str]], List[Dict]]
+
+
+def _normalize(column: str, value) -> str:
+    """
+    行を比較するために値を正規化します。日時は同じ時刻を表していれば表記が違っても同じ値に、
+    数値は25と25.0や、float4に丸められた値が同じ値になるようにします。
+    """
+    if value is None or isinstance(value, bool):
+        return str(value)
+    if column == "created_at":
+        return str(datetime.datetime.fromisoformat(str(value)).timestamp())
+    try:
+        return f"{float(value):.{NUMERIC_SIGNIFICANT_DIGITS}g}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _sanitize(row: Dict) -> Dict:
+    """
+    JSONの規格外でSupabaseに拒否される有限でない数値（NaNや無限大）をNoneに置き換えます。
+    """
+    return {
+        column: None if isinstance(value, float) and not math.isfinite(value) else value
+        for column, value in row.items()
+    }
+
+
+def _row_key(row: Dict, columns: List[str]) -> tuple:
+    """
+    行を比較するためのキーを生成します。
+    """
+    return tuple(_normalize(column, row.get(column)) for column in columns)
+
+
+class Outbox:
+    """
+    Supabaseへ送る行を一旦ローカルのSQLiteに書き込み、まとめて同期するクラス（アウトボックス）。
+
+    書き込みはローカルで完結するため、制御ループの所要時間がSupabaseの応答に左右されません。
+    同期は送信前に行を送信中として記録し、成功したら削除します。送信中のまま中断した行は、
+    次回の同期でSupabaseに既に存在するかを確認してから再送するため、同じ行が二重に登録されません。
+    Supabaseに拒否され続ける行は、同じテーブルの後続の行を妨げないようデッドレターに移します。
+
+    Attributes:
+        path (str): SQLiteファイルのパス。
+    """
+
+    _instance = None
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or state_path(OUTBOX_FILE_NAME)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                in_flight INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # attempts列を追加する前に作成したファイルは列を追加する
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(outbox)")}
+        if "attempts" not in columns:
+            self._connection.execute("ALTER TABLE outbox ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                id INTEGER PRIMARY KEY,
+                table_name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                error TEXT NOT NULL,
+                failed_at TEXT NOT NULL
+            )
+            """
+        )
+
+    @staticmethod
+    def get_outbox() -> "Outbox":
+        """
+        アウトボックスのインスタンスを取得します。存在しない場合は新たに生成します。
+
+        Returns:
+            Outbox: アウトボックスのインスタンス。
+        """
+        if Outbox._instance is None:
+            Outbox._instance = Outbox()
+        return Outbox._instance
+
+    def enqueue(self, table: str, rows: List[Dict]) -> None:
+        """
+        送信する行をアウトボックスに追加します。有限でない数値はNoneに置き換えます。
+
+        Args:
+            table (str): 挿入先のテーブル名
+            rows (List[Dict]): 挿入する行のリスト
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.executemany(
+                    "INSERT INTO outbox (table_name, payload) VALUES (?, ?)",
+                    [(table, json.dumps(_sanitize(row), ensure_ascii=False)) for row in rows],
+                )
+
+    def pending(self, table: str) -> List[Dict]:
+        """
+        まだ同期されていない行を取得します。
+
+        Args:
+            table (str): テーブル名
+
+        Returns:
+            List[Dict]: 未同期の行のリスト
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT payload FROM outbox WHERE table_name = ? ORDER BY id", (table,)
+            )
+            return [json.loads(payload) for (payload,) in cursor.fetchall()]
+
+    def dead_letters(self) -> List[Dict]:
+        """
+        同期を諦めてデッドレターに移した行を取得します。
+
+        Returns:
+            List[Dict]: table_name、payload、error、failed_atを含む行のリスト
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT table_name, payload, error, failed_at FROM dead_letter ORDER BY id"
+            )
+            return [
+                {"table_name": table, "payload": json.loads(payload), "error": error, "failed_at": failed_at}
+                for table, payload, error, failed_at in cursor.fetchall()
+            ]
+
+    def pending_count(self) -> int:
+        """
+        まだ同期されていない行数を取得します。
+
+        Returns:
+            int: 未同期の行数
+        """
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def _take_batches(self, in_flight: bool, batch_size: int) -> Dict[str, List[tuple]]:
+        """
+        送信する行をテーブルごとに取り出し、送信中として記録します。
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                rows = self._connection.execute(
+                    "SELECT id, table_name, payload FROM outbox WHERE in_flight = ? ORDER BY id LIMIT ?",
+                    (int(in_flight), batch_size),
+                ).fetchall()
+                self._connection.executemany(
+                    "UPDATE outbox SET in_flight = 1 WHERE id = ?", [(row_id,) for row_id, _, _ in rows]
+                )
+        batches: Dict[str, List[tuple]] = {}
+        for row_id, table, payload in rows:
+            # 有限でない数値を置き換える前に追加された行も送信できるようにする
+            batches.setdefault(table, []).append((row_id, _sanitize(json.loads(payload))))
+        return batches
+
+    def _delete(self, row_ids: List[int]) -> None:
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in row_ids])
+
+    def _record_failure(self, table: str, row_id: int, payload: Dict, error: Exception) -> None:
+        """
+        1行ずつ送信して失敗した行の失敗回数を数え、上限に達した場合はデッドレターに移します。
+        上限に達していない行は送信中のまま残し、次回の同期で登録済みかを確認してから再送します。
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.execute("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", (row_id,))
+                (attempts,) = self._connection.execute(
+                    "SELECT attempts FROM outbox WHERE id = ?", (row_id,)
+                ).fetchone()
+                if attempts < MAX_SYNC_ATTEMPTS:
+                    return
+                self._connection.execute(
+                    "INSERT INTO dead_letter (id, table_name, payload, error, failed_at) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        row_id,
+                        table,
+                        json.dumps(payload, ensure_ascii=False),
+                        str(error),
+                        datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    ),
+                )
+                self._connection.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+        logger.error(f"{table}の行を{attempts}回送信できなかったため、デッドレターに移しました: {payload}")
+
+    def _reconcile_in_flight(self, fetch_existing: FetchFunction, batch_size: int) -> None:
+        """
+        前回の同期で送信中のまま中断した行のうち、既にSupabaseに登録されている行を削除し、
+        残りを未送信に戻します。
+        """
+        for table, rows in self._take_batches(True, batch_size * 100).items():
+            payloads = [payload for _, payload in rows]
+            lookup_column = LOOKUP_COLUMNS.get(table, DEFAULT_LOOKUP_COLUMN)
+            values = sorted({payload[lookup_column] for payload in payloads if lookup_column in payload})
+            existing_rows = fetch_existing(table, lookup_column, values) if values else []
+            # 行ごとに持つ列が異なる場合があるため、比較する列の組ごとに登録済みの行のキーを作成する
+            existing: Dict[tuple, set] = {}
+            synced = set()
+            for row_id, payload in rows:
+                columns = tuple(sorted(payload))
+                if columns not in existing:
+                    existing[columns] = {_row_key(row, list(columns)) for row in existing_rows}
+                # 内容と日時が全て同じ行は区別できないが、重複して登録する意味もないため登録済みとして扱う
+                if _row_key(payload, list(columns)) in existing[columns]:
+                    synced.add(row_id)
+            self._delete(list(synced))
+            with self._lock:
+                with self._connection:
+                    self._connection.execute("BEGIN")
+                    self._connection.executemany(
+                        "UPDATE outbox SET in_flight = 0 WHERE id = ?",
+                        [(row_id,) for row_id, _ in rows if row_id not in synced],
+                    )
+
+    def sync(
+        self,
+        insert: InsertFunction,
+        fetch_existing: FetchFunction,
+        batch_size: int = SYNC_BATCH_SIZE,
+    ) -> Dict[str, float]:
+        """
+        未同期の行をテーブルごとにまとめてSupabaseへ送信します。
+
+        全てのテーブルの送信に失敗した場合は接続の問題とみなして同期を打ち切り、残りの行は次回の同期で
+        送信します。他のテーブルの送信が成功したのに失敗したテーブルは、行の内容が拒否された可能性が
+        あるため1行ずつ送信し直し、MAX_SYNC_ATTEMPTS回失敗した行はデッドレターに移します。
+
+        Args:
+            insert (InsertFunction): テーブル名と行のリストを受け取ってSupabaseに挿入する関数
+            fetch_existing (FetchFunction): テーブル名、列名と値のリストを受け取り、Supabaseに登録済みの行を返す関数
+            batch_size (int, optional): 1回のリクエストで送信する最大行数
+
+        Returns:
+            Dict[str, float]: テーブルごとの送信の所要時間の合計（秒）
+        """
+        # 同時に同期すると、他方が送信中の行を中断したものとして扱ってしまうため直列化する
+        with self._sync_lock:
+            return self._sync(insert, fetch_existing, batch_size)
+
+    def _sync(self, insert: InsertFunction, fetch_existing: FetchFunction, batch_size: int) -> Dict[str, float]:
+        latencies: Dict[str, float] = {}
+        try:
+            self._reconcile_in_flight(fetch_existing, batch_size)
+        except Exception as e:
+            logger.warning(f"アウトボックスの送信中の行を確認できませんでした: {e}")
+            return latencies
+
+        def send(table, rows):
+            start = time.perf_counter()
+            insert(table, [payload for _, payload in rows])
+            return time.perf_counter() - start
+
+        while True:
+            batches = self._take_batches(False, batch_size)
+            if not batches:
+                break
+            with ThreadPoolExecutor(max_workers=min(SYNC_WORKERS, len(batches)), thread_name_prefix="outbox") as executor:
+                futures = {table: executor.submit(send, table, rows) for table, rows in batches.items()}
+            failed = []
+            for table, future in futures.items():
+                try:
+                    latencies[table] = latencies.get(table, 0.0) + future.result()
+                    self._delete([row_id for row_id, _ in batches[table]])
+                except Exception as e:
+                    # 送信中のまま残し、次回の同期で登録済みかを確認する
+                    logger.warning(f"{table}の同期に失敗しました。次回再送します: {e}")
+                    failed.append(table)
+            if failed and len(failed) == len(futures):
+                break
+            # 他のテーブルは送信できたため、失敗したテーブルは拒否される行を特定するよう1行ずつ送信する
+            for table in failed:
+                for row_id, payload in batches[table]:
+                    try:
+                        latencies[table] = latencies.get(table, 0.0) + send(table, [(row_id, payload)])
+                        self._delete([row_id])
+                    except Exception as e:
+                        self._record_failure(table, row_id, payload, e)
+
+        remaining = self.pending_count()
+        if remaining:
+            logger.warning(f"アウトボックスに未同期の行が{remaining}行残っています")
+        return latencies
@@ -0,0 +1,254 @@
+import itertools
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from common.config import Config
+from util.logger import logger
+
+# PMVの格子を保存したディレクトリを指定する環境変数。設定されていない場合は格子を使わず、常に厳密に計算する
+PMV_GRID_PATH_ENV = "PMV_GRID_PATH"
+
+# 格子の補間の許容誤差（PMVの絶対値）。PMV_GRID_MAX_ERRORで変更できる
+# Airconが設定を切り替えるPMVの区間（0.02〜0.1）より小さくし、格子を使っても設定が変わりにくいようにする
+DEFAULT_MAX_ERROR = 0.015
+
+VALUES_FILE_NAME = "pmv.npy"
+META_FILE_NAME = "grid.json"
+# grid.jsonの形式。格子点の値を軸ごとに記録する
+FORMAT_VERSION = 2
+
+# 格子の軸（pmv_ppd_isoの引数名と、最小値・最大値・刻みの区間）。区間ごとに刻みを変えられる
+DEFAULT_AXES: Dict[str, Tuple[Tuple[float, float, float], ...]] = {
+    "tdb": ((10.0, 30.0, 1.0),),
+    "tr": ((10.0, 40.0, 2.0),),
+    # PMVは相対湿度について線形なため、両端の格子点だけで誤差なく補間できる
+    "rh": ((0.0, 100.0, 100.0),),
+    # 強制対流と自然対流が切り替わる0.1前後で曲がり方が大きいため、細かく刻む
+    "vr": ((0.05, 0.08, 0.01), (0.08, 0.2, 0.005), (0.2, 0.3, 0.01), (0.3, 1.0, 0.05)),
+    "met": ((0.8, 2.0, 0.05),),
+    "clo": ((0.4, 2.0, 0.05),),
+}
+AXIS_NAMES = tuple(DEFAULT_AXES)
+
+# 誤差の測定に使う点の数
+ERROR_SAMPLES = 100000
+
+
+def max_error_tolerance() -> float:
+    """
+    格子の補間の許容誤差を取得します。
+
+    Returns:
+        float: 許容誤差（PMVの絶対値）
+    """
+    return Config.get_float("PMV_GRID_MAX_ERROR", DEFAULT_MAX_ERROR)
+
+
+def _axis_values(segments: Tuple[Tuple[float, float, float], ...]) -> np.ndarray:
+    """刻みの異なる区間を連結して、軸の格子点の値を作成する"""
+    return np.unique(
+        np.concatenate([np.round(np.arange(start, stop + step / 2, step), 6) for start, stop, step in segments])
+    )
+
+
+def _exact_pmv(points: np.ndarray) -> np.ndarray:
+    """
+    格子の軸の順に並んだ入力の配列から、丸める前のPMVを計算する。ISO 7730の適用範囲外はNaNとする。
+
+    pmv_ppd_isoの値は小数第2位に丸めてあり、格子点に使うと丸めの誤差が補間の誤差に加わるため使わない。
+    """
+    # heat_comfort_calculatorはこのモジュールを読み込むため、循環しないよう呼び出し時に読み込む
+    import util.heat_comfort_calculator as heat_comfort_calculator
+
+    inputs = {name: points[..., i] for i, name in enumerate(AXIS_NAMES)}
+    pmv = heat_comfort_calculator.pmv_iso(**inputs)
+    valid = heat_comfort_calculator.within_iso_limits(
+        inputs["tdb"], inputs["tr"], inputs["vr"], inputs["met"], inputs["clo"], pmv
+    )
+    return np.where(valid, pmv, np.nan)
+
+
+class PMVGrid:
+    """
+    PMVを事前に計算した6次元の格子（乾球温度、平均放射温度、相対湿度、相対風速、MET値、衣服の断熱性）。
+
+    格子の範囲内の入力は多重線形補間でPMVを求め、pmv_ppd_isoの反復計算を省きます。
+    補間の誤差は格子の作成時に格子点以外の点で厳密な値と比較して測定し、grid.jsonに記録します。
+
+    Attributes:
+        axes (Dict[str, np.ndarray]): 軸ごとの格子点の値。
+        values (np.ndarray): 格子点のPMV値（メモリマップ）。
+        max_error (float): 測定した補間の最大誤差（PMVの絶対値）。
+        p99_error (float): 測定した補間の誤差の99パーセンタイル。
+    """
+
+    _instance = None
+    _loaded = False
+
+    def __init__(self, axes: Dict[str, np.ndarray], values: np.ndarray, max_error: float = 0.0, p99_error: float = 0.0):
+        self.axes = axes
+        self.values = values
+        self.max_error = max_error
+        self.p99_error = p99_error
+
+    @staticmethod
+    def load(path: str) -> "PMVGrid":
+        """
+        ディレクトリに保存した格子を読み込みます。
+
+        Args:
+            path (str): 格子を保存したディレクトリ
+
+        Returns:
+            PMVGrid: 格子のインスタンス。
+
+        Raises:
+            ValueError: grid.jsonの形式が異なる場合
+        """
+        with open(os.path.join(path, META_FILE_NAME), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"格子の形式が古いため、build_pmv_grid.pyで作成し直してください: {path}")
+        axes = {name: np.asarray(meta["axes"][name], dtype="float64") for name in AXIS_NAMES}
+        values = np.load(os.path.join(path, VALUES_FILE_NAME), mmap_mode="r")
+        return PMVGrid(axes, values, meta["max_error"], meta["p99_error"])
+
+    @staticmethod
+    def get_grid() -> Optional["PMVGrid"]:
+        """
+        PMV_GRID_PATHの格子を取得します。設定されていないか読み込めない場合、または測定した最大誤差が
+        許容誤差を超える場合はNoneを返します。
+
+        Returns:
+            Optional[PMVGrid]: 格子のインスタンス。
+        """
+        if not PMVGrid._loaded:
+            PMVGrid._loaded = True
+            path = Config.get(PMV_GRID_PATH_ENV, "")
+            if path:
+                try:
+                    grid = PMVGrid.load(path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"PMVの格子を読み込めないため、厳密に計算します: {e}")
+                else:
+                    tolerance = max_error_tolerance()
+                    if grid.max_error > tolerance:
+                        logger.warning(
+                            f"PMVの格子の最大誤差（{grid.max_error:.4f}）が許容誤差（{tolerance:.4f}）を超えるため、"
+                            "厳密に計算します"
+                        )
+                    else:
+                        PMVGrid._instance = grid
+                        logger.info(f"PMVの格子を使用します（最大誤差: {grid.max_error:.4f}）")
+        return PMVGrid._instance
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """
+        入力が格子の範囲内かどうかを判定します。
+
+        Args:
+            points (np.ndarray): 格子の軸の順に並んだ入力（最後の次元が6）
+
+        Returns:
+            np.ndarray: 範囲内かどうかの真偽値の配列
+        """
+        inside = np.ones(points.shape[:-1], dtype=bool)
+        for i, name in enumerate(AXIS_NAMES):
+            axis = self.axes[name]
+            inside &= (points[..., i] >= axis[0]) & (points[..., i] <= axis[-1])
+        return inside
+
+    def interpolate(self, points: np.ndarray) -> np.ndarray:
+        """
+        格子の範囲内の入力のPMVを多重線形補間で求めます。
+
+        Args:
+            points (np.ndarray): 格子の軸の順に並んだ入力（最後の次元が6、格子の範囲内）
+
+        Returns:
+            np.ndarray: 補間したPMV値。周囲にISO 7730の適用範囲外（NaN）の格子点がある場合はNaN
+        """
+        lower_indices = []
+        fractions = []
+        for i, name in enumerate(AXIS_NAMES):
+            axis = self.axes[name]
+            index = np.clip(np.searchsorted(axis, points[..., i], side="right") - 1, 0, len(axis) - 2)
+            lower_indices.append(index)
+            fractions.append((points[..., i] - axis[index]) / (axis[index + 1] - axis[index]))
+
+        # 周囲の2^6個の格子点を、各軸の距離に応じた重みで足し合わせる
+        result = np.zeros(points.shape[:-1])
+        for corner in itertools.product((0, 1), repeat=len(AXIS_NAMES)):
+            weight = np.ones(points.shape[:-1])
+            for fraction, upper in zip(fractions, corner):
+                weight = weight * (fraction if upper else 1 - fraction)
+            index = tuple(lower + upper for lower, upper in zip(lower_indices, corner))
+            result += weight * self.values[index]
+        return result
+
+
+def build_grid(
+    path: str,
+    axes: Dict[str, Tuple[Tuple[float, float, float], ...]] = DEFAULT_AXES,
+    seed: int = 0,
+    tolerance: Optional[float] = None,
+) -> Dict:
+    """
+    PMVの格子を計算し、補間の誤差を測定してからディレクトリに保存します。
+
+    誤差は格子の範囲内の一様な乱数の点で、補間値と丸める前の厳密な値の差として測定します。
+    最大誤差が許容誤差を超える場合は格子を保存しません。
+
+    Args:
+        path (str): 保存先のディレクトリ
+        axes (Dict[str, Tuple[Tuple[float, float, float], ...]]): 軸ごとの最小値・最大値・刻みの区間
+        seed (int): 誤差の測定に使う乱数のシード
+        tolerance (Optional[float]): 許容誤差。Noneの場合はPMV_GRID_MAX_ERRORの値
+
+    Returns:
+        Dict: grid.jsonに書き込んだ内容
+
+    Raises:
+        ValueError: 測定した最大誤差が許容誤差を超える場合
+    """
+    if tolerance is None:
+        tolerance = max_error_tolerance()
+    os.makedirs(path, exist_ok=True)
+    axis_values = {name: _axis_values(axes[name]) for name in AXIS_NAMES}
+    columns = [axis_values[name] for name in AXIS_NAMES]
+    # 誤差を確認するまでは一時ファイルに書き込み、既存の格子を置き換えない
+    values_path = os.path.join(path, VALUES_FILE_NAME)
+    temporary_path = values_path + ".tmp"
+    values = np.lib.format.open_memmap(
+        temporary_path, mode="w+", dtype="float32", shape=tuple(len(axis) for axis in columns)
+    )
+    # 乾球温度ごとに計算して、一度に確保するメモリを抑える
+    rest = np.stack(np.meshgrid(*columns[1:], indexing="ij"), axis=-1)
+    for i, tdb in enumerate(columns[0]):
+        points = np.concatenate([np.full(rest.shape[:-1] + (1,), tdb), rest], axis=-1)
+        values[i] = _exact_pmv(points)
+    values.flush()
+
+    rng = np.random.default_rng(seed)
+    samples = np.stack([rng.uniform(axis[0], axis[-1], ERROR_SAMPLES) for axis in columns], axis=-1)
+    errors = np.abs(PMVGrid(axis_values, values).interpolate(samples) - _exact_pmv(samples))
+    errors = errors[~np.isnan(errors)]
+    del values
+    max_error = float(errors.max())
+    if max_error > tolerance:
+        os.remove(temporary_path)
+        raise ValueError(f"補間の最大誤差（{max_error:.4f}）が許容誤差（{tolerance:.4f}）を超えるため、格子を保存しません")
+
+    os.replace(temporary_path, values_path)
+    meta = {
+        "version": FORMAT_VERSION,
+        "axes": {name: axis_values[name].tolist() for name in AXIS_NAMES},
+        "max_error": max_error,
+        "p99_error": float(np.percentile(errors, 99)),
+    }
+    with open(os.path.join(path, META_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
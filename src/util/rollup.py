@@ -0,0 +1,250 @@
+import datetime
+import math
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import common.constants as constants
+from util.local_state import state_path
+from util.time import TimeUtil
+
+if TYPE_CHECKING:
+    from util.archive import HistoryArchive
+
+# 集計値を保存するファイル名
+ROLLUP_FILE_NAME = "rollups.sqlite3"
+
+# 集計の単位
+HOUR = "hour"
+DAY = "day"
+PERIODS = (HOUR, DAY)
+
+# 集計するテーブルと、(指標名, 値の列, 場所の列) の対応。場所のない指標は場所ID 0 で集計する
+ROLLUP_SOURCES: Dict[str, Tuple[str, str, Optional[str]]] = {
+    "temperatures": ("temperature", "temperature", "location_id"),
+    "humidities": ("humidity", "humidity", "location_id"),
+    "co2_levels": ("co2", "co2_level", "location_id"),
+    "pmvs": ("pmv", "pmv", None),
+}
+NO_LOCATION = 0
+
+
+def bucket_of(period: str, local_time: datetime.datetime) -> str:
+    """
+    日時が属する集計単位のキーを取得します。キーは現地時刻の「YYYY-MM-DD HH:00」または「YYYY-MM-DD」です。
+
+    Args:
+        period (str): 集計の単位（HOURまたはDAY）
+        local_time (datetime.datetime): 現地時刻の日時
+
+    Returns:
+        str: 集計単位のキー
+    """
+    return local_time.strftime("%Y-%m-%d %H:00" if period == HOUR else "%Y-%m-%d")
+
+
+class Rollup:
+    """
+    温度・湿度・CO2濃度（場所ごと）とPMVの、1時間ごと・1日ごとの件数、合計、最小値、最大値を
+    ローカルのSQLiteで保持するクラス。
+
+    行がアウトボックスに追加されるたびに該当する集計単位を更新するため、集計値を読むだけで
+    生の10分ごとの行を走査せずに済みます。平均は合計と件数から求めます。
+    """
+
+    _instance = None
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or state_path(ROLLUP_FILE_NAME)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rollups (
+                period TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                location_id INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                sum REAL NOT NULL,
+                min REAL NOT NULL,
+                max REAL NOT NULL,
+                PRIMARY KEY (period, bucket, metric, location_id)
+            )
+            """
+        )
+
+    @staticmethod
+    def get_rollup() -> "Rollup":
+        """
+        集計のインスタンスを取得します。存在しない場合は新たに生成します。
+
+        Returns:
+            Rollup: 集計のインスタンス。
+        """
+        if Rollup._instance is None:
+            Rollup._instance = Rollup()
+        return Rollup._instance
+
+    def _upsert(self, entries: Iterable[tuple]) -> None:
+        """
+        (period, bucket, metric, location_id, count, sum, min, max) の集計を既存の集計に加えます。
+        トランザクションとロックは呼び出し側で確保します。
+        """
+        self._connection.executemany(
+            """
+            INSERT INTO rollups (period, bucket, metric, location_id, count, sum, min, max)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (period, bucket, metric, location_id) DO UPDATE SET
+                count = count + excluded.count,
+                sum = sum + excluded.sum,
+                min = MIN(min, excluded.min),
+                max = MAX(max, excluded.max)
+            """,
+            list(entries),
+        )
+
+    def _merge(self, entries: Iterable[tuple]) -> None:
+        """
+        (period, bucket, metric, location_id, count, sum, min, max) の集計を既存の集計に加えます。
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._upsert(entries)
+
+    def record(self, table: str, rows: List[Dict]) -> None:
+        """
+        書き込まれた行を集計に加えます。集計の対象でないテーブルや、値がないか有限でない行は無視します。
+
+        Args:
+            table (str): テーブル名
+            rows (List[Dict]): 書き込まれた行のリスト
+        """
+        source = ROLLUP_SOURCES.get(table)
+        if source is None:
+            return
+        metric, value_column, location_column = source
+        entries = []
+        for row in rows:
+            if row.get(value_column) is None:
+                continue
+            value = float(row[value_column])
+            # 適用範囲外のPMVなどのNaNはNOT NULLの列に書き込めないため、rebuildと同じく集計しない
+            if not math.isfinite(value):
+                continue
+            local_time = datetime.datetime.fromisoformat(str(row["created_at"])).astimezone(TimeUtil.timezone())
+            location_id = NO_LOCATION if location_column is None else int(row[location_column])
+            for period in PERIODS:
+                entries.append((period, bucket_of(period, local_time), metric, location_id, 1, value, value, value))
+        if entries:
+            self._merge(entries)
+
+    def rebuild(self, archive: "HistoryArchive", start: datetime.date, end: datetime.date) -> None:
+        """
+        履歴アーカイブから、指定した期間（現地時刻の日付）の集計を作り直します。
+        集計を始める前の行や、集計が失われた期間を埋めるために使います。
+
+        Args:
+            archive (HistoryArchive): 履歴アーカイブ
+            start (datetime.date): 期間の初日（この日を含む）
+            end (datetime.date): 期間の最終日（この日を含まない）
+        """
+        # 集計を作り直す場合のみ必要なため、毎ティックの記録を遅くしないようここで読み込む
+        import numpy as np
+
+        tz = TimeUtil.timezone()
+        lower = tz.localize(datetime.datetime.combine(start, datetime.time()))
+        upper = tz.localize(datetime.datetime.combine(end, datetime.time()))
+        # 現地時刻への変換は期間の開始時点のUTCとの差で行う（日本時間は夏時間がないため一定）
+        offset = int(lower.utcoffset().total_seconds())
+
+        entries = []
+        for table, (metric, value_column, location_column) in ROLLUP_SOURCES.items():
+            for day in archive.iter_days(table, lower, upper):
+                values = np.asarray(day[value_column], dtype="float64")
+                seconds = np.asarray(day["created_at"]) // 1_000_000 + offset
+                locations = (
+                    np.full(len(values), NO_LOCATION, dtype="int64")
+                    if location_column is None
+                    else np.asarray(day[location_column], dtype="int64")
+                )
+                valid = ~np.isnan(values)
+                values, seconds, locations = values[valid], seconds[valid], locations[valid]
+                for period, size in ((HOUR, 3600), (DAY, 86400)):
+                    keys, inverse = np.unique(
+                        np.stack([seconds // size, locations], axis=1), axis=0, return_inverse=True
+                    )
+                    inverse = inverse.reshape(-1)
+                    counts = np.bincount(inverse, minlength=len(keys))
+                    sums = np.bincount(inverse, weights=values, minlength=len(keys))
+                    mins = np.full(len(keys), np.inf)
+                    maxs = np.full(len(keys), -np.inf)
+                    np.minimum.at(mins, inverse, values)
+                    np.maximum.at(maxs, inverse, values)
+                    for (index, location_id), count, total, low, high in zip(
+                        keys.tolist(), counts.tolist(), sums.tolist(), mins.tolist(), maxs.tolist()
+                    ):
+                        bucket_time = datetime.datetime.fromtimestamp(index * size, datetime.timezone.utc)
+                        entries.append(
+                            (period, bucket_of(period, bucket_time), metric, location_id, count, total, low, high)
+                        )
+
+        # 削除と書き込みを1つのトランザクションで行い、途中で中断しても期間の集計が失われないようにする
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.execute(
+                    "DELETE FROM rollups WHERE bucket >= ? AND bucket < ? AND metric IN ({})".format(
+                        ", ".join("?" * len(ROLLUP_SOURCES))
+                    ),
+                    (str(start), str(end), *[metric for metric, _, _ in ROLLUP_SOURCES.values()]),
+                )
+                # 現地時刻の1日はアーカイブのUTCの2日分にまたがるため、同じキーの集計は加算して書き込む
+                self._upsert(entries)
+
+    def query(
+        self,
+        metric: str,
+        period: str,
+        start: datetime.date,
+        end: datetime.date,
+        location: Optional[constants.Location] = None,
+    ) -> List[Dict]:
+        """
+        指定した期間（現地時刻の日付）の集計値を取得します。
+
+        Args:
+            metric (str): 指標名（temperature、humidity、co2、pmv）
+            period (str): 集計の単位（HOURまたはDAY）
+            start (datetime.date): 期間の初日（この日を含む）
+            end (datetime.date): 期間の最終日（この日を含まない）
+            location (Optional[constants.Location]): 場所。Noneの場合は全ての場所
+
+        Returns:
+            List[Dict]: bucket、location_id、count、mean、min、max、sumを含む行のリスト（bucketの昇順）
+        """
+        sql = (
+            "SELECT bucket, location_id, count, sum, min, max FROM rollups "
+            "WHERE metric = ? AND period = ? AND bucket >= ? AND bucket < ?"
+        )
+        params: list = [metric, period, str(start), str(end)]
+        if location is not None:
+            sql += " AND location_id = ?"
+            params.append(location.id)
+        with self._lock:
+            rows = self._connection.execute(sql + " ORDER BY bucket, location_id", params).fetchall()
+        return [
+            {
+                "bucket": bucket,
+                "location_id": location_id,
+                "count": count,
+                "mean": total / count,
+                "min": low,
+                "max": high,
+                "sum": total,
+            }
+            for bucket, location_id, count, total, low, high in rows
+        ]
@@ -0,0 +1,181 @@
+import dataclasses
+import datetime
+import itertools
+import math
+from typing import Iterable, List
+
+import numpy as np
+
+from common.data_types import AirconSetting, PMVCalculation, TemperatureHumidity
+from util.aircon import Aircon
+from util.aircon_intensity_calculator import AirconIntensityCalculator
+import util.heat_comfort_calculator as heat_comfort_calculator
+
+# 快適とみなすPMVの絶対値の上限（ISO 7730のカテゴリB）
+COMFORT_PMV_LIMIT = 0.5
+# サーキュレーターの風量ごとの、在室者の位置での風速[m/s]
+CIRCULATOR_WIND_SPEEDS = {0: 0.15, 2: 0.3}
+
+@dataclasses.dataclass
+class Scenario:
+    """
+    評価する操作の候補を表すデータクラス。
+
+    Attributes:
+        wind_speed (float): 風速[m/s]。
+        circulator_speed (int): サーキュレーターの風量。
+        met (float): MET値。
+        icl (float): 衣服の断熱性。
+    """
+
+    wind_speed: float
+    circulator_speed: int
+    met: float
+    icl: float
+
+
+@dataclasses.dataclass
+class ScenarioResult:
+    """
+    操作の候補の評価結果を表すデータクラス。
+
+    Attributes:
+        scenario (Scenario): 評価した候補。
+        pmv (PMVCalculation): 候補の条件でのPMVの計算結果。
+        aircon_setting (AirconSetting): 候補のPMVに対してAircon.set_airconが選ぶエアコンの設定。
+        intensity (int): エアコンの設定の強度。
+        reasons (List[str]): エアコンの設定を決めた理由。候補を適用する場合にログに出力する。
+    """
+
+    scenario: Scenario
+    pmv: PMVCalculation
+    aircon_setting: AirconSetting
+    intensity: int
+    reasons: List[str] = dataclasses.field(default_factory=list)
+
+
+def build_scenarios(
+    met: float,
+    icl: float,
+    circulator_speeds: Iterable[int] = (0,),
+    met_offsets: Iterable[float] = (0.0,),
+    icl_offsets: Iterable[float] = (0.0,),
+) -> List[Scenario]:
+    """
+    サーキュレーターの風量、METと衣服の断熱性の変化量の全ての組み合わせの候補を作成します。
+    風速はサーキュレーターの風量からCIRCULATOR_WIND_SPEEDSで求めます。
+
+    Args:
+        met (float): 基準のMET値
+        icl (float): 基準の衣服の断熱性
+        circulator_speeds (Iterable[int]): サーキュレーターの風量の候補（CIRCULATOR_WIND_SPEEDSのキー）
+        met_offsets (Iterable[float]): MET値の変化量の候補
+        icl_offsets (Iterable[float]): 衣服の断熱性の変化量の候補
+
+    Returns:
+        List[Scenario]: 候補のリスト
+    """
+    return [
+        Scenario(CIRCULATOR_WIND_SPEEDS[circulator_speed], circulator_speed, met + met_offset, icl + icl_offset)
+        for circulator_speed, met_offset, icl_offset in itertools.product(circulator_speeds, met_offsets, icl_offsets)
+    ]
+
+
+def evaluate_scenarios(
+    scenarios: List[Scenario],
+    ceiling: TemperatureHumidity,
+    floor: TemperatureHumidity,
+    outdoor: TemperatureHumidity,
+    study: TemperatureHumidity,
+    now: datetime.datetime,
+    absolute_humidity: float,
+    dew_point: float,
+) -> List[ScenarioResult]:
+    """
+    同じ計測値に対する複数の操作の候補を、1回の配列演算でまとめて評価します。
+
+    各候補のPMV/PPDを計算し、そのPMVに対してAircon.set_airconが選ぶ設定と強度を求めます。
+    評価はログの出力などの副作用を伴わないため、適用しない候補を含めても構いません。
+
+    Args:
+        scenarios (List[Scenario]): 評価する候補のリスト
+        ceiling (TemperatureHumidity): 天井付近の温度と湿度
+        floor (TemperatureHumidity): 床付近の温度と湿度
+        outdoor (TemperatureHumidity): 外の温度と湿度
+        study (TemperatureHumidity): 書斎の温度と湿度
+        now (datetime.datetime): 計測日時（西日の影響の判定に使う）
+        absolute_humidity (float): 室内の絶対湿度
+        dew_point (float): 外気の露点温度
+
+    Returns:
+        List[ScenarioResult]: 候補と同じ順の評価結果のリスト
+    """
+    count = len(scenarios)
+    timestamp = np.datetime64(now.astimezone(datetime.timezone.utc).replace(tzinfo=None), "s")
+    batch = heat_comfort_calculator.calculate_pmv_batch(
+        ceiling_temperature=np.full(count, ceiling.temperature),
+        ceiling_humidity=np.full(count, ceiling.humidity),
+        floor_temperature=np.full(count, floor.temperature),
+        floor_humidity=np.full(count, floor.humidity),
+        outdoor_temperature=np.full(count, outdoor.temperature),
+        study_temperature=np.full(count, study.temperature),
+        met=np.array([scenario.met for scenario in scenarios], dtype="float64"),
+        icl=np.array([scenario.icl for scenario in scenarios], dtype="float64"),
+        timestamps=np.full(count, timestamp),
+        wind_speed=np.array([scenario.wind_speed for scenario in scenarios], dtype="float64"),
+    )
+
+    results = []
+    for i, scenario in enumerate(scenarios):
+        pmv = PMVCalculation(
+            pmv=float(batch.pmv[i]),
+            ppd=float(batch.ppd[i]),
+            clo=float(batch.clo[i]),
+            air=float(batch.air[i]),
+            met=scenario.met,
+            wall=float(batch.wall[i]),
+            ceiling=float(batch.ceiling[i]),
+            floor=float(batch.floor[i]),
+            mean_radiant_temperature=float(batch.mean_radiant_temperature[i]),
+            dry_bulb_temperature=float(batch.dry_bulb_temperature[i]),
+            relative_air_speed=float(batch.air[i]),
+            dynamic_clothing_insulation=float(batch.clo[i]),
+        )
+        aircon_setting, reasons = Aircon.decide_aircon_setting(
+            pmv, floor.temperature, study.temperature, outdoor.temperature, absolute_humidity, dew_point
+        )
+        intensity = AirconIntensityCalculator.calculate_intensity(
+            temperature=float(aircon_setting.temp_setting),
+            mode=aircon_setting.mode_setting.id,
+            fan_speed=aircon_setting.fan_speed_setting.id,
+            power=aircon_setting.power_setting.id,
+        )
+        results.append(ScenarioResult(scenario, pmv, aircon_setting, intensity, reasons))
+    return results
+
+
+def choose_lowest_intensity(results: List[ScenarioResult], pmv_limit: float = COMFORT_PMV_LIMIT) -> ScenarioResult:
+    """
+    PMVの絶対値が快適の範囲内の候補のうち、エアコンの設定の強度が最も低いものを選びます。
+
+    強度が同じ場合はPMVが0に近い候補を、それも同じ場合はサーキュレーターの風量が小さい候補を選びます。
+    快適の範囲内の候補が無い場合は、PMVが最も0に近い候補を選びます。
+
+    Args:
+        results (List[ScenarioResult]): evaluate_scenariosの評価結果
+        pmv_limit (float): 快適とみなすPMVの絶対値の上限
+
+    Returns:
+        ScenarioResult: 選んだ候補の評価結果
+    """
+
+    def distance(result: ScenarioResult) -> float:
+        # 適用範囲外でPMVがNaNの候補は最も遠いものとして扱う
+        return abs(result.pmv.pmv) if math.isfinite(result.pmv.pmv) else math.inf
+
+    comfortable = [result for result in results if distance(result) <= pmv_limit]
+    if not comfortable:
+        return min(results, key=lambda result: (distance(result), result.intensity))
+    return min(
+        comfortable, key=lambda result: (result.intensity, distance(result), result.scenario.circulator_speed)
+    )
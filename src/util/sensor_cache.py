@@ -0,0 +1,82 @@
+import datetime
+from typing import Dict, Tuple, Union
+
+import common.constants as constants
+from common.data_types import CO2SensorData, TemperatureHumidity
+from util.local_state import load_json, save_json
+
+SensorReading = Union[TemperatureHumidity, CO2SensorData]
+
+# 場所ごとに最後に取得できた値を使ってよい最大経過時間
+MAX_STALENESS = {
+    constants.Location.FLOOR: datetime.timedelta(minutes=30),
+    constants.Location.CEILING: datetime.timedelta(minutes=30),
+    constants.Location.OUTDOOR: datetime.timedelta(minutes=60),
+    constants.Location.STUDY: datetime.timedelta(minutes=60),
+    constants.Location.BEDROOM: datetime.timedelta(minutes=60),
+}
+
+
+class SensorCache:
+    """
+    センサーごとに最後に取得できた値（last-known-good）を保持するクラス。
+
+    値は取得日時とともにローカル状態ファイルに保存され、実行をまたいで利用できます。
+    センサー名はSensorSnapshotのフィールド名（constants.Locationの名前の小文字）です。
+    """
+
+    FILE_NAME = "sensor_cache.json"
+
+    @staticmethod
+    def _serialize(reading: SensorReading) -> Dict:
+        if isinstance(reading, CO2SensorData):
+            return {
+                "temperature": reading.temperature_humidity.temperature,
+                "humidity": reading.temperature_humidity.humidity,
+                "co2": reading.co2,
+            }
+        return {"temperature": reading.temperature, "humidity": reading.humidity}
+
+    @staticmethod
+    def _deserialize(data: Dict) -> SensorReading:
+        temperature_humidity = TemperatureHumidity(temperature=data["temperature"], humidity=data["humidity"])
+        if "co2" in data:
+            return CO2SensorData(temperature_humidity=temperature_humidity, co2=data["co2"])
+        return temperature_humidity
+
+    @staticmethod
+    def store(readings: Dict[str, SensorReading], now: datetime.datetime) -> None:
+        """
+        取得できたセンサーの値をキャッシュに保存します。
+
+        Args:
+            readings (Dict[str, SensorReading]): センサー名と値の辞書
+            now (datetime.datetime): 取得日時
+        """
+        if not readings:
+            return
+        cache = load_json(SensorCache.FILE_NAME, {})
+        for sensor, reading in readings.items():
+            cache[sensor] = {"reading": SensorCache._serialize(reading), "recorded_at": now.isoformat()}
+        save_json(SensorCache.FILE_NAME, cache)
+
+    @staticmethod
+    def load_fresh(now: datetime.datetime) -> Dict[str, Tuple[SensorReading, float]]:
+        """
+        最大経過時間を超えていないキャッシュの値を取得します。
+
+        Args:
+            now (datetime.datetime): 現在日時
+
+        Returns:
+            Dict[str, Tuple[SensorReading, float]]: センサー名と、値および経過秒数のタプルの辞書
+        """
+        fresh = {}
+        for sensor, entry in load_json(SensorCache.FILE_NAME, {}).items():
+            location = constants.Location.__members__.get(sensor.upper())
+            if location is None:
+                continue
+            age = now - datetime.datetime.fromisoformat(entry["recorded_at"])
+            if datetime.timedelta(0) <= age <= MAX_STALENESS[location]:
+                fresh[sensor] = (SensorCache._deserialize(entry["reading"]), age.total_seconds())
+        return fresh
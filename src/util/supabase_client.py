@@ -1,13 +1,8 @@
-import os
-from supabase import Client
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING
+from common.config import Config
 
-# .envファイルから環境変数を読み込みます
-load_dotenv(".env")
-
-# SupabaseのプロジェクトURLとAPIキーを環境変数から取得します
-PROJECT_URL = os.environ["SUPABASE_PROJECT_URL"]
-API_KEY = os.environ["SUPABASE_API_KEY"]
+if TYPE_CHECKING:
+    from supabase import Client
 
 class SupabaseClient:
     """
@@ -20,13 +15,17 @@ class SupabaseClient:
     _supabase = None
 
     @staticmethod
-    def get_supabase() -> Client:
+    def get_supabase() -> "Client":
         """
         Supabaseクライアントのインスタンスを取得します。存在しない場合は新たに生成します。
+        supabaseのライブラリは読み込みに時間がかかるため、初めてクライアントを使う時点で読み込みます。
 
         Returns:
             Client: Supabaseクライアントのインスタンス。
         """
         if SupabaseClient._supabase is None:
-            SupabaseClient._supabase = Client(PROJECT_URL, API_KEY)
+            from supabase import Client
+
+            # SupabaseのプロジェクトURLとAPIキーを環境変数から取得します
+            SupabaseClient._supabase = Client(Config.get("SUPABASE_PROJECT_URL"), Config.get("SUPABASE_API_KEY"))
         return SupabaseClient._supabase
@@ -0,0 +1,101 @@
+from typing import Dict, Iterator, List, Optional
+
+from util.supabase_client import SupabaseClient
+
+# 1回のクエリで取得する行数（Supabaseの行数上限以下にする）
+PAGE_SIZE = 1000
+
+
+def _select(table: str, columns: str, key: str):
+    """
+    キーとidを含む列を選択するクエリを生成します。
+    """
+    names = [name.strip() for name in columns.split(",")]
+    if "*" not in names:
+        names += [name for name in (key, "id") if name not in names]
+    return SupabaseClient.get_supabase().table(table).select(", ".join(names))
+
+
+def _iter_tied_rows(table: str, columns: str, key: str, value: str, page_size: int) -> Iterator[List[Dict]]:
+    """
+    キーの値が同じ行が1ページに収まらない場合に、その値の行をidの順にページ単位で取得します。
+    """
+    last_id = None
+    while True:
+        query = _select(table, columns, key).filter(key, "eq", value)
+        if last_id is not None:
+            query = query.filter("id", "gt", last_id)
+        rows = query.order("id").limit(page_size).execute().data
+        if rows:
+            yield rows
+            last_id = rows[-1]["id"]
+        if len(rows) < page_size:
+            return
+
+
+def iter_chunks(
+    table: str,
+    columns: str = "*",
+    key: str = "created_at",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[List[Dict]]:
+    """
+    テーブルの行をキーの昇順（同じ値の中ではidの昇順）に、一定の行数以下のチャンクで取得します。
+
+    オフセットではなく直前のチャンクの最後のキーから次のページを取得するため、行数が多くても
+    各クエリの負荷は変わらず、呼び出し側はチャンクを順に処理すれば一定のメモリで全行を扱えます。
+
+    Args:
+        table (str): テーブル名
+        columns (str): 取得する列（カンマ区切り）。キーとidは自動的に含めます。
+        key (str): 並び順とページ送りに使う列
+        start (Optional[str]): キーの下限（この値を含む）
+        end (Optional[str]): キーの上限（この値を含まない）
+        page_size (int): 1回のクエリで取得する行数
+
+    Yields:
+        List[Dict]: キーの昇順に並んだ、page_size行以下のチャンク
+    """
+    lower, inclusive = start, True
+    while True:
+        query = _select(table, columns, key)
+        if lower is not None:
+            query = query.filter(key, "gte" if inclusive else "gt", lower)
+        if end is not None:
+            query = query.filter(key, "lt", end)
+        rows = query.order(key).limit(page_size).execute().data
+        if len(rows) < page_size:
+            if rows:
+                yield sorted(rows, key=lambda row: (row[key], row["id"]))
+            return
+
+        # 最後のキーと同じ値の行は次のページに含まれる可能性があるため、次のページでまとめて取得する
+        last = rows[-1][key]
+        chunk = sorted((row for row in rows if row[key] != last), key=lambda row: (row[key], row["id"]))
+        if chunk:
+            yield chunk
+            lower, inclusive = last, True
+        else:
+            # ページ全体が同じキーの値の場合は、その値の行をidでページ送りしてから次の値に進む
+            yield from _iter_tied_rows(table, columns, key, last, page_size)
+            lower, inclusive = last, False
+
+
+def iter_rows(
+    table: str,
+    columns: str = "*",
+    key: str = "created_at",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[Dict]:
+    """
+    iter_chunksで取得した行を1行ずつ返します。引数はiter_chunksと同じです。
+
+    Yields:
+        Dict: キーの昇順に並んだ行
+    """
+    for chunk in iter_chunks(table, columns, key, start, end, page_size):
+        yield from chunk
@@ -0,0 +1,118 @@
+import contextlib
+import fcntl
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from util.local_state import state_path
+from util.logger import logger
+
+# ティックの実行中に保持するロックファイル
+TICK_LOCK_FILE_NAME = "tick.lock"
+
+
+@contextlib.contextmanager
+def tick_lock() -> Iterator[bool]:
+    """
+    ティックの実行中に保持するロックファイルを取得します。常駐実行と単発実行（cronやGitHub Actions）が
+    同じローカル状態を共有するため、どちらもティックの実行前にこのロックを取得します。
+
+    Yields:
+        bool: ロックを取得できた場合はTrue、他のプロセスがティックを実行中の場合はFalse
+    """
+    with open(state_path(TICK_LOCK_FILE_NAME), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class TickScheduler:
+    """
+    制御ループを一定の間隔で実行するスケジューラー。
+
+    ティックは1つのスレッドで順に実行するため重なりません。さらにティックの実行中はロックファイルを
+    保持し、別のプロセス（cronの単発実行など）が同時にティックを実行している場合はそのティックを見送ります。
+    ティックが間隔を超えた場合は超過として記録し、過ぎてしまった予定は実行せずに次の予定から再開します。
+
+    Attributes:
+        interval (float): ティックの間隔（秒）。
+        overruns (int): 間隔を超えたティックの数。
+        skipped (int): 超過や他のプロセスの実行により見送った予定の数。
+    """
+
+    def __init__(self, tick: Callable[[], object], interval: float, align: bool = True):
+        """
+        Args:
+            tick (Callable[[], object]): 1回のティックで実行する関数
+            interval (float): ティックの間隔（秒）
+            align (bool): 予定を時刻の区切り（間隔の倍数）に揃えるかどうか。cronの「*/10」と同じ時刻に実行する
+        """
+        self.tick = tick
+        self.interval = interval
+        self.align = align
+        self.overruns = 0
+        self.skipped = 0
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        """
+        スケジューラーを停止します。実行中のティックは最後まで実行されます。
+        """
+        self._stop.set()
+
+    def _first_run_at(self) -> float:
+        if not self.align:
+            return time.time()
+        return (time.time() // self.interval + 1) * self.interval
+
+    def _run_tick(self) -> bool:
+        """
+        ロックファイルを保持してティックを1回実行します。他のプロセスが実行中の場合は実行しません。
+        """
+        with tick_lock() as acquired:
+            if not acquired:
+                logger.warning("他のプロセスがティックを実行中のため、このティックを見送ります")
+                return False
+            try:
+                self.tick()
+            except Exception:
+                # 常駐を続けるため、ティックの失敗は記録して次のティックへ進む
+                logger.exception("ティックの実行に失敗しました")
+        return True
+
+    def run(self, max_ticks: Optional[int] = None) -> None:
+        """
+        stopが呼ばれるまで（またはmax_ticks回実行するまで）ティックを実行します。
+
+        Args:
+            max_ticks (Optional[int]): 実行するティックの最大数。Noneの場合は無制限
+        """
+        next_run = self._first_run_at()
+        ticks = 0
+        while not self._stop.is_set() and (max_ticks is None or ticks < max_ticks):
+            if self._stop.wait(max(0.0, next_run - time.time())):
+                break
+
+            started = time.monotonic()
+            if not self._run_tick():
+                self.skipped += 1
+            ticks += 1
+            elapsed = time.monotonic() - started
+
+            next_run += self.interval
+            if next_run <= time.time():
+                missed = int((time.time() - next_run) // self.interval) + 1
+                next_run += missed * self.interval
+                self.overruns += 1
+                self.skipped += missed
+                logger.warning(
+                    f"ティックが{elapsed:.1f}秒かかり、間隔{self.interval:.0f}秒を超えました（{missed}回分の予定を見送ります）"
+                )
+            else:
+                logger.info(f"ティックの所要時間: {elapsed:.1f}秒")
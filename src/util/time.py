@@ -1,5 +1,9 @@
 import pytz
 from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from util.clock import Clock
 
 class TimeUtil:
     """
@@ -40,12 +44,16 @@ class TimeUtil:
 
 
     @staticmethod
-    def calculate_elapsed_time(last_setting_time_str):
+    def calculate_elapsed_time(last_setting_time_str: str, clock: Optional["Clock"] = None):
         # 文字列からdatetimeオブジェクトへの変換
         last_setting_time = TimeUtil.parse_datetime_string(last_setting_time_str)
 
         # 経過時間の計算
-        elapsed_time = TimeUtil.get_current_time() - last_setting_time
+        # util.clockはこのモジュールを読み込むため、循環しないよう呼び出し時に読み込む
+        from util.clock import current_time
+
+        now = current_time(clock)
+        elapsed_time = now - last_setting_time
 
         # 時間と分への分割
         hours, remainder = divmod(elapsed_time.seconds, 3600)
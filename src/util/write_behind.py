@@ -0,0 +1,75 @@
+import time
+from typing import Callable, Dict, List
+
+from util.logger import logger
+
+
+class WriteBehindQueue:
+    """
+    1回の制御ティックで生成された行をテーブルごとに集め、ティックの最後にまとめて書き込むクラス。
+
+    デバイスの操作がデータベースへの書き込みを待たないよう、書き込みはflushを呼ぶまで行いません。
+    flushではテーブルごとに1回で書き込みます。書き込み先はローカルのアウトボックスで、
+    SQLiteのロックで直列化されるため、テーブル同士を並行して書き込むことはしません。
+    """
+
+    def __init__(self):
+        self._rows: Dict[str, List[Dict]] = {}
+        self._tasks: Dict[str, Callable[[], object]] = {}
+
+    def add(self, table: str, rows: List[Dict]) -> None:
+        """
+        書き込む行を追加します。
+
+        Args:
+            table (str): 挿入先のテーブル名
+            rows (List[Dict]): 挿入する行のリスト
+        """
+        self._rows.setdefault(table, []).extend(rows)
+
+    def defer(self, name: str, task: Callable[[], object]) -> None:
+        """
+        行の挿入以外の書き込み処理を、flushの時に実行するよう登録します。
+
+        Args:
+            name (str): 処理の名前（レイテンシの報告に使用）
+            task (Callable[[], object]): 実行する処理
+        """
+        self._tasks[name] = task
+
+    def flush(self, insert: Callable[[str, List[Dict]], object]) -> Dict[str, float]:
+        """
+        集めた行と登録された処理をまとめて実行します。
+
+        一部の書き込みが失敗しても残りの書き込みは実行し、最後に最初の例外を再送出します。
+
+        Args:
+            insert (Callable[[str, List[Dict]], object]): テーブル名と行のリストを受け取って書き込む関数
+
+        Returns:
+            Dict[str, float]: テーブル名（または処理の名前）ごとの所要時間（秒）
+        """
+        jobs = {table: (lambda table=table, rows=rows: insert(table, rows)) for table, rows in self._rows.items()}
+        jobs.update(self._tasks)
+        self._rows, self._tasks = {}, {}
+        if not jobs:
+            return {}
+
+        def timed(job):
+            start = time.perf_counter()
+            try:
+                job()
+                return time.perf_counter() - start, None
+            except Exception as e:
+                return time.perf_counter() - start, e
+
+        results = {name: timed(job) for name, job in jobs.items()}
+
+        errors = []
+        for name, (_, error) in results.items():
+            if error is not None:
+                logger.error(f"{name}への書き込みに失敗しました: {error}")
+                errors.append(error)
+        if errors:
+            raise errors[0]
+        return {name: latency for name, (latency, _) in results.items()}
@@ -1,22 +1,19 @@
 import pandas as pd
 import plotly.graph_objects as go
-from util.supabase_client import SupabaseClient
+from util.table_reader import iter_chunks
 
 
 class AirconIntensityScores:
     @staticmethod
     def fetch_data():
-        supabase = SupabaseClient.get_supabase()
-        response = (
-            supabase.table("aircon_intensity_scores")
-            .select("record_date, intensity_score")
-            .order("record_date")
-            .execute()
-        )
-
-        data = response.data
-        df = pd.DataFrame(data)
-        return df
+        # チャンクごとにDataFrameにして連結し、全行を1つのリストに溜めないようにする
+        frames = [
+            pd.DataFrame(chunk, columns=["record_date", "intensity_score"])
+            for chunk in iter_chunks("aircon_intensity_scores", "record_date, intensity_score", key="record_date")
+        ]
+        if not frames:
+            return pd.DataFrame(columns=["record_date", "intensity_score"])
+        return pd.concat(frames, ignore_index=True)
 
 
 # データを取得してグラフを作成